@@ -20,12 +20,48 @@ def create_app(config_name='default'):
     app.config.from_object(config[config_name])
     config[config_name].init_app(app) # Call static init_app if defined in Config
 
+    # Optional profiler around the whole WSGI app (PROFILING_ENABLED); captures are listed at /admin/profiles
+    from .profiling import init_profiling
+    init_profiling(app)
+
+    # gzip/brotli for HTML, JSON and other text responses (COMPRESSION_ENABLED); outermost, so
+    # everything below, including the profiler, sees uncompressed bodies
+    from .compression import init_compression
+    init_compression(app)
+
     # Initialize extensions
     db.init_app(app)
+    from .database import init_database
+    init_database(app) # SQLite pragmas (WAL etc.) on every connection, if SQLITE_PRAGMAS is set
+    from .metrics import init_metrics
+    init_metrics(app) # Request/DB/cache/upload metrics for /admin/metrics, if METRICS_ENABLED is set
+    from .instrumentation import init_instrumentation
+    init_instrumentation(app) # Server-Timing header and slow-query log, if SQL_INSTRUMENTATION is set
     migrate.init_app(app, db) # Initialize Flask-Migrate
     csrf.init_app(app) # Initialize CSRF protection
     login_manager.init_app(app) # If using Flask-Login
 
+    # Optional full-page cache for anonymous visitors (disabled unless PAGE_CACHE_ENABLED)
+    from .page_cache import init_page_cache
+    init_page_cache(app)
+
+    # Derivative cache for resized images and the responsive_images template filter
+    from .media import init_media
+    init_media(app)
+
+    # Content-hashed static URLs with far-future caching, once `flask build-assets` has run
+    from .assets import init_assets
+    init_assets(app)
+
+    # Registers the ORM events that keep the full-text search index in sync
+    from . import search  # noqa: F401
+
+    # Re-exports affected pages of the static export after commits, if STATIC_EXPORT_ON_SAVE is set
+    from . import static_export  # noqa: F401
+
+    # Registers the ORM events that record which uploads each post references
+    from . import media_library  # noqa: F401
+
     # Register Blueprints
     from .main import main as main_blueprint
     app.register_blueprint(main_blueprint)
@@ -37,12 +73,12 @@ def create_app(config_name='default'):
     # Context Processor for Footer Data
     @app.context_processor
     def inject_footer_data():
-        # It's crucial to import models *inside* the function or ensure the app context
-        # is fully active, especially if models themselves might import things that need the app.
-        # For simplicity and to avoid circular import issues, importing here is often safest.
-        from .models import FooterIcon, SiteConfiguration
+        # Footer data changes rarely, so it comes from a per-worker snapshot (see app/cache.py)
+        # instead of querying FooterIcon/SiteConfiguration on every render_template call.
+        from .cache import get_footer_snapshot
 
         footer_icons_list = []
+        footer_sprite = None
         copyright_message_text = None
         current_year_val = datetime.utcnow().year
 
@@ -50,10 +86,10 @@ def create_app(config_name='default'):
             # These database queries require an active application context and
             # for the database to be initialized. This is generally fine when requests
             # are being processed, but be mindful during initial `flask db init` or similar commands.
-            footer_icons_list = FooterIcon.query.order_by(FooterIcon.order).all()
-            copyright_config = SiteConfiguration.query.filter_by(key='copyright_message').first()
-            if copyright_config:
-                copyright_message_text = copyright_config.value
+            footer_snapshot = get_footer_snapshot()
+            footer_icons_list = footer_snapshot.icons
+            footer_sprite = footer_snapshot.sprite
+            copyright_message_text = footer_snapshot.copyright_message
         except Exception as e:
             # Log a warning if data can't be fetched, which might happen during initial setup
             # before the database tables are created, or if the DB is temporarily unavailable.
@@ -69,6 +105,7 @@ def create_app(config_name='default'):
 
         return dict(
             footer_icons=footer_icons_list,
+            footer_sprite=footer_sprite,
             copyright_message=copyright_message_text,
             current_year=current_year_val # You already have a current_year block, so this might be redundant
                                           # or you can rename it to avoid conflict, e.g., `footer_current_year`
@@ -1,14 +1,28 @@
+import hashlib
+import hmac
 import os
-from flask import render_template, redirect, url_for, flash, request, current_app, jsonify  # Added current_app, jsonify
+import tempfile
+from flask import render_template, redirect, url_for, flash, request, current_app, jsonify, abort, send_from_directory  # Added current_app, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename  # For securing filenames
 from . import admin  # Import the blueprint
 from .forms import LoginForm, PostForm, FooterIconForm, CopyrightForm
 from app.models import User, Post, db, FooterIcon, SiteConfiguration
 from app import db, csrf  # Import csrf
-from PIL import Image # For thumbnail generation
-from bs4 import BeautifulSoup # For parsing HTML content
 from urllib.parse import urlparse # For robust URL parsing
+from app.content import analyze_content, EXCERPT_SENTENCES
+from app.batch import BatchError, apply_batch, reorder_icons
+from app.cache import bump_footer_version, bump_content_version
+from app.footer_icons import save_uploaded_icon
+from app.home_post import get_home_post, set_home_post, ensure_home_post
+from app.media_library import KIND_FOOTER_ICON, KIND_UPLOAD, THUMBNAIL_VARIANT, find_upload, footer_icon_filenames, \
+    record_file
+from app.page_cache import page_cache_stats
+from app.media import media_cache_stats
+from app.metrics import inc_counter, observe, get_registry, render_metrics
+from app.pagination import paginate_listing
+from app.thumbnails import enqueue_thumbnail, thumbnail_job_status, check_image, peak_rss_kb, MAX_IMAGE_PIXELS
 
 import logging
 # if not current_app.debug: # Only configure basicConfig if not in debug mode (Flask might do it)
@@ -16,6 +30,7 @@ import logging
 
 # Helper function to check allowed file extensions (optional, but good practice)
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+UPLOAD_CHUNK_SIZE = 64 * 1024
 
 
 def allowed_file(filename):
@@ -23,44 +38,20 @@ def allowed_file(filename):
         filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def create_thumbnail(image_path, thumbnail_path, height):
-    # current_app.logger.debug(f"create_thumbnail: Attempting for {image_path} -> {thumbnail_path} with height {height}")
-    try:
-        if not os.path.exists(image_path):
-            # current_app.logger.error(f"create_thumbnail: Original image file not found at {image_path}")
-            return False
-        img = Image.open(image_path)
-        # current_app.logger.debug(f"create_thumbnail: Image opened: {image_path}")
-
-        aspect_ratio = img.width / img.height
-        new_width = int(aspect_ratio * height)
-
-        img.thumbnail((new_width, height))
-        img.save(thumbnail_path)  # This will overwrite if thumb_path already exists from a previous attempt
-        # current_app.logger.debug(f"create_thumbnail: Thumbnail saved: {thumbnail_path}")
-        return True
-    except FileNotFoundError:  # Should be caught by os.path.exists above, but good to keep
-        current_app.logger.error(f"create_thumbnail: Original image file not found (again?) at {image_path}")
-        return False
-    except Exception as e:
-        current_app.logger.error(f"create_thumbnail: Error creating thumbnail for {image_path}: {e}")
-        return False
-
-
 # Modified: extract_first_image_and_generate_thumbnail - NOW EXPECTS THUMBNAIL TO EXIST
-def extract_first_image_and_get_urls(post_content, post_id_for_logging):
+def extract_first_image_and_get_urls(post_content, post_id_for_logging, analysis=None):
     # current_app.logger.debug(f"extract_first_image_and_get_urls: Called for post_id (context): {post_id_for_logging}")
     # current_app.logger.debug(f"extract_first_image_and_get_urls: Raw post_content: {post_content[:500]}...")
 
-    soup = BeautifulSoup(post_content, 'html.parser')
-    first_img_tag = soup.find('img')
+    # Same single parse that produces the excerpt; add_post/edit_post pass it in (see app/content.py)
+    if analysis is None:
+        analysis = analyze_content(post_content, EXCERPT_SENTENCES)
 
     original_image_url_from_content = None  # URL as found in HTML content
     derived_thumbnail_url = None  # URL for the pre-generated thumbnail
 
-    if first_img_tag:
-        # current_app.logger.debug(f"extract_first_image_and_get_urls: Found <img> tag: {first_img_tag}")
-        original_image_url_from_content = first_img_tag.get('src')
+    if analysis.images or analysis.first_image_src:
+        original_image_url_from_content = analysis.first_image_src
         # current_app.logger.debug(f"extract_first_image_and_get_urls: Extracted src: {original_image_url_from_content}")
 
         if original_image_url_from_content:
@@ -80,31 +71,28 @@ def extract_first_image_and_get_urls(post_content, post_id_for_logging):
                 original_image_filename_from_url = os.path.basename(path_from_url)
                 # original_image_filename_secure = secure_filename(original_image_filename_from_url) # Already secured on upload
 
-                upload_folder = current_app.config['UPLOAD_FOLDER']
-                # Path to the original file on disk (already secured name)
-                # original_filepath_on_disk = os.path.join(upload_folder, original_image_filename_secure)
-
-                # Derive thumbnail filename and path
+                # Derive thumbnail filename
                 base, ext = os.path.splitext(original_image_filename_from_url)
                 thumb_filename = f"{base}_thumb{ext}"
-                thumb_filepath_on_disk = os.path.join(upload_folder, thumb_filename)
-                # current_app.logger.debug(
-                #     f"extract_first_image_and_get_urls: Expected thumbnail filepath: {thumb_filepath_on_disk}")
 
-                if os.path.exists(thumb_filepath_on_disk):
+                # The media index records thumbnails as they are written (see app/media_library.py)
+                asset = find_upload(original_image_filename_from_url)
+                if asset is not None and asset.variants.get(THUMBNAIL_VARIANT) == thumb_filename:
                     derived_thumbnail_url = url_for('static', filename=f'media_files/{thumb_filename}',
                                                     _external=False)  # Or True if needed
                     current_app.logger.info(
                         f"extract_first_image_and_get_urls: Pre-generated thumbnail FOUND. URL: {derived_thumbnail_url}")
+                elif thumbnail_job_status(original_image_filename_from_url) in ('pending', 'done'):
+                    # Still being generated in the background (or finished since the check above).
+                    # Use the URL it is being written to; a failed job clears it from the post again.
+                    derived_thumbnail_url = url_for('static', filename=f'media_files/{thumb_filename}',
+                                                    _external=False)
+                    current_app.logger.info(
+                        f"extract_first_image_and_get_urls: Thumbnail for {original_image_filename_from_url} is being generated. URL: {derived_thumbnail_url}")
                 else:
                     current_app.logger.warning(
-                        f"extract_first_image_and_get_urls: Pre-generated thumbnail NOT FOUND at {thumb_filepath_on_disk}. This is unexpected in the new workflow.")
-                    # As a fallback, you *could* try to generate it here, but it indicates an issue with the upload_trix_attachment step
-                    # if create_thumbnail(original_filepath_on_disk, thumb_filepath_on_disk, 100):
-                    #    derived_thumbnail_url = url_for('static', filename=f'media_files/{thumb_filename}', _external=False)
-                    #    current_app.logger.info(f"extract_first_image_and_get_urls: Fallback thumbnail created. URL: {derived_thumbnail_url}")
-                    # else:
-                    #    current_app.logger.error(f"extract_first_image_and_get_urls: Fallback thumbnail creation FAILED.")
+                        f"extract_first_image_and_get_urls: Pre-generated thumbnail {thumb_filename} NOT FOUND. "
+                        "Run `flask regenerate-thumbnails` to create missing thumbnails.")
             else:
                 current_app.logger.warning(
                     f"extract_first_image_and_get_urls: Image URL '{original_image_url_from_content}' (path: '{path_from_url}') does not match expected media path or path_from_url is None.")
@@ -145,11 +133,10 @@ def logout():
 @admin.route('/dashboard') # A simple dashboard page
 @login_required
 def dashboard():
-    page = request.args.get('page', 1, type=int)
-    # Fetch posts, ordered by most recent, and paginate them
-    posts_pagination = Post.query.order_by(Post.created_at.desc()).paginate(
-        page=page, per_page=10 # Adjust per_page as needed
-    )
+    # Fetch posts, ordered by most recent, and paginate them (offset or keyset, see DASHBOARD_PAGINATION)
+    # The table shows titles, dates and categories only, so the post bodies are never read
+    posts_pagination = paginate_listing(Post.query.options(Post.summary_only()), Post, 'dashboard',
+                                        per_page=10) # Adjust per_page as needed
     return render_template('admin/dashboard.html', title='Admin Dashboard', posts=posts_pagination)
 
 
@@ -162,16 +149,23 @@ def add_post():
         # current_app.logger.debug("add_post: Form validated.")
         new_post = Post(title=form.title.data, content=form.content.data)
 
-        # Use the modified function name
-        first_img_url_in_content, actual_thumb_url = extract_first_image_and_get_urls(new_post.content, 'new_post')
+        # Parsed once; the excerpt, the thumbnail lookup and the search index all use it
+        analysis = analyze_content(new_post.content, EXCERPT_SENTENCES)
+        first_img_url_in_content, actual_thumb_url = extract_first_image_and_get_urls(new_post.content, 'new_post',
+                                                                                      analysis)
 
         new_post.first_image_url = first_img_url_in_content  # This is the URL from the <img> src
         new_post.thumbnail_url = actual_thumb_url  # This is the URL for the _thumb.jpg
+        new_post.excerpt = analysis.excerpt  # Stored so listings don't re-parse HTML
 
         # current_app.logger.debug(
         #     f"add_post: To be saved: first_image_url='{new_post.first_image_url}', thumbnail_url='{new_post.thumbnail_url}'")
 
+        if get_home_post(with_content=False) is None:
+            new_post.category = 'home'  # The first post (or first after all were re-categorised) is featured on /
+
         db.session.add(new_post)
+        bump_content_version()
         db.session.commit()
         # current_app.logger.debug("add_post: Post committed to DB.")
         flash('Blog post created successfully!', 'success')
@@ -190,15 +184,18 @@ def edit_post(post_id):
         post.title = form.title.data
         post.content = form.content.data
 
-        # Use the modified function name
-        first_img_url_in_content, actual_thumb_url = extract_first_image_and_get_urls(post.content, post.id)
+        # Parsed once; the excerpt, the thumbnail lookup and the search index all use it
+        analysis = analyze_content(post.content, EXCERPT_SENTENCES)
+        first_img_url_in_content, actual_thumb_url = extract_first_image_and_get_urls(post.content, post.id, analysis)
 
         post.first_image_url = first_img_url_in_content
         post.thumbnail_url = actual_thumb_url
+        post.excerpt = analysis.excerpt
 
         # current_app.logger.debug(
         #     f"edit_post ({post_id}): To be saved: first_image_url='{post.first_image_url}', thumbnail_url='{post.thumbnail_url}'")
 
+        bump_content_version()
         db.session.commit()
         # current_app.logger.debug(f"edit_post ({post_id}): Post committed to DB.")
         flash('Blog post updated successfully!', 'success')
@@ -206,27 +203,6 @@ def edit_post(post_id):
     return render_template('admin/edit_post.html', title=f'Edit Post: "{post.title}"', form=form, post_id=post.id)
 
 
-def _get_current_home_post():
-    return Post.query.filter_by(category='home').first()
-
-
-def _set_new_home_post(new_home_post):
-    if not new_home_post:
-        return None, None
-
-    old_home_post = _get_current_home_post()
-    old_home_post_id_for_js = None
-
-    if old_home_post and old_home_post.id != new_home_post.id:
-        old_home_post.category = 'blog'  # Revert old home post to 'blog'
-        db.session.add(old_home_post)
-        old_home_post_id_for_js = old_home_post.id
-
-    new_home_post.category = 'home'
-    db.session.add(new_home_post)
-    return new_home_post, old_home_post_id_for_js
-
-
 @admin.route('/set_post_category', methods=['POST'])
 @login_required
 # @csrf.exempt # If you are sending CSRF token via X-CSRFToken header with AJAX
@@ -247,56 +223,53 @@ def set_post_category():
         return jsonify({'success': False, 'error': 'Invalid category'}), 400
 
     old_home_post_id_for_js = None  # For JS to update UI
+    new_home_post_id_for_js = None
 
     try:
         if new_category == 'home':
-            _, old_home_post_id_for_js = _set_new_home_post(post)
+            old_home_post_id_for_js = set_home_post(post)
         else:
-            # If this post was 'home' and is now changing, ensure a new home post is designated
-            if post.category == 'home':
-                post.category = new_category  # Change it first
-                # Designate the most recent overall post as the new home post if no other is 'home'
-                # This logic will be more robustly handled by ensure_home_post_exists
-            else:
-                post.category = new_category
-            db.session.add(post)
-
+            was_home_post = (post.category == 'home')
+            post.category = new_category
+            if was_home_post:
+                # Hand the home slot to the most recent other post in the same transaction
+                new_home_post = ensure_home_post(excluded_post_id=post.id)
+                new_home_post_id_for_js = new_home_post.id if new_home_post else None
+
+        bump_content_version()
         db.session.commit()
-        # Ensure there's always a home post after any change
-        ensure_home_post_exists(excluded_post_id=post.id if new_category != 'home' else None)
 
-        return jsonify({'success': True, 'new_category': post.category, 'old_home_post_id': old_home_post_id_for_js})
+        return jsonify({'success': True, 'new_category': post.category, 'old_home_post_id': old_home_post_id_for_js,
+                        'new_home_post_id': new_home_post_id_for_js})
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error updating category for post {post_id}: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-# Helper function to ensure a home post exists
-def ensure_home_post_exists(excluded_post_id=None):
+@admin.route('/batch', methods=['POST'])
+@login_required
+def batch():
     """
-    Ensures that at least one post is marked as 'home'.
-    If no 'home' post exists, it marks the most recent post as 'home'.
-    If excluded_post_id is provided (e.g., a post just changed from 'home' to something else),
-    it avoids selecting that one as the new 'home' post in the same transaction if possible.
+    Runs several post/icon operations in one transaction (see app/batch.py), e.g.
+    {"operations": [{"action": "set_category", "post_ids": [1, 2], "category": "blog"},
+                    {"action": "delete_posts", "post_ids": [3]}]}
     """
-    current_home = Post.query.filter_by(category='home').first()
-    if not current_home:
-        query = Post.query.order_by(Post.created_at.desc())
-        if excluded_post_id:
-            # Try to find a post that isn't the one just changed from home
-            new_home_candidate = query.filter(Post.id != excluded_post_id).first()
-            if not new_home_candidate: # If only one post exists and it was the one changed
-                 new_home_candidate = query.first() # Fallback to it
-        else:
-            new_home_candidate = query.first()
+    data = request.get_json(silent=True)
+    try:
+        if not isinstance(data, dict):
+            raise BatchError("The request body must be a JSON object with an 'operations' list.")
+        outcome = apply_batch(data.get('operations'))
+        db.session.commit()
+    except BatchError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error applying batch: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    return jsonify({'success': True, **outcome})
 
-        if new_home_candidate:
-            # No need to call _set_new_home_post as this is a fallback
-            new_home_candidate.category = 'home'
-            db.session.add(new_home_candidate)
-            db.session.commit()
-            current_app.logger.info(f"No home post found. Designated post ID {new_home_candidate.id} as new home post.")
 
 @admin.route('/delete_post/<int:post_id>', methods=['POST'])  # Only allow POST requests
 @login_required
@@ -305,10 +278,11 @@ def delete_post(post_id):
     was_home_post = (post_to_delete.category == 'home')
     try:
         db.session.delete(post_to_delete)
+        if was_home_post:
+            ensure_home_post()  # Select a new home post in the same transaction
+        bump_content_version()
         db.session.commit()
         flash(f'Post "{post_to_delete.title}" has been deleted successfully.', 'success')
-        if was_home_post:
-            ensure_home_post_exists() # Ensure a new home post is selected
     except Exception as e:
         db.session.rollback()  # Rollback in case of error
         flash(f'Error deleting post: {str(e)}', 'danger')
@@ -317,10 +291,62 @@ def delete_post(post_id):
     return redirect(url_for('admin.dashboard'))
 
 
-# Modified: upload_trix_attachment - NOW CREATES THUMBNAIL
+@admin.route('/cache_stats')
+@login_required
+def cache_stats():
+    """Page and image cache counters for the worker that serves this request."""
+    return jsonify({'page_cache': page_cache_stats(), 'media_cache': media_cache_stats()})
+
+
+@admin.route('/metrics')
+@csrf.exempt
+def metrics():
+    """
+    Prometheus text exposition of the metrics of every worker (see app/metrics.py).
+    Scrapers authenticate with "Authorization: Bearer <METRICS_TOKEN>"; admins can just be logged in.
+    """
+    registry = get_registry()
+    if registry is None:
+        abort(404)
+    token = current_app.config.get('METRICS_TOKEN')
+    bearer = request.headers.get('Authorization', '')
+    token_ok = bool(token) and bearer.startswith('Bearer ') and hmac.compare_digest(bearer[7:], token)
+    if not (token_ok or current_user.is_authenticated):
+        return current_app.response_class('Unauthorized\n', status=401, mimetype='text/plain',
+                                          headers={'WWW-Authenticate': 'Bearer'})
+    response = current_app.response_class(render_metrics(registry), mimetype='text/plain')
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    response.cache_control.no_store = True
+    return response
+
+
+@admin.route('/profiles')
+@login_required
+def profiles():
+    """Slowest recent profiler captures, grouped by endpoint (see app/profiling.py)."""
+    store = current_app.extensions.get('profile_store')
+    if store is None:
+        flash('Profiling is disabled. Set PROFILING_ENABLED=1 to capture request profiles.', 'info')
+        return redirect(url_for('admin.dashboard'))
+    return render_template('admin/profiles.html', title='Request Profiles',
+                           captures_by_endpoint=store.worst_by_endpoint())
+
+
+@admin.route('/profiles/<filename>')
+@login_required
+def profile_file(filename):
+    store = current_app.extensions.get('profile_store')
+    if store is None or not filename.endswith(('.pstats', '.collapsed')):
+        abort(404)
+    return send_from_directory(store.directory, filename, as_attachment=True)
+
+
+# Modified: upload_trix_attachment - NOW QUEUES THUMBNAIL GENERATION
 @admin.route('/upload_trix_attachment', methods=['POST'])
 @login_required
 def upload_trix_attachment():
+    # Werkzeug spools the multipart body to a temporary file as it parses, and stops
+    # reading (413, handled below) once MAX_CONTENT_LENGTH is exceeded
     file = request.files.get('file')
     if not file:
         return jsonify({'error': 'No file part in the request.'}), 400
@@ -334,33 +360,47 @@ def upload_trix_attachment():
         # Path for the original file
         potential_filepath = os.path.join(upload_folder, original_filename_secure)
 
-        # Handle existing file logic (same name, different size, etc.) - This is simplified here
-        # For robustness, the original logic for checking existing file size and renaming should be kept.
-        # For this example, we'll assume we save with original_filename_secure or a uniquely generated one.
-        # Let's assume a simple save for now, ensure your original renaming logic is in place if needed.
-
-        # Save the original file
+        # Copy the upload to a temp file in chunks and check its header before it
+        # becomes visible under its real name, so a rejected image never replaces an existing one
+        fd, tmp_path = tempfile.mkstemp(dir=upload_folder, suffix='.upload')
+        digest = hashlib.sha256()  # For the media index, computed while the upload is copied
         try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                for chunk in iter(lambda: file.stream.read(UPLOAD_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    tmp_file.write(chunk)
+            upload_size = os.path.getsize(tmp_path)
+            inc_counter('upload_bytes_total', upload_size, kind='trix')
+            observe('upload_size_bytes', upload_size, kind='trix')
+            image_error = check_image(tmp_path, current_app.config.get('UPLOAD_MAX_PIXELS', MAX_IMAGE_PIXELS))
+            if image_error:
+                os.remove(tmp_path)
+                current_app.logger.warning(
+                    f"upload_trix_attachment: Rejected {original_filename_secure}: {image_error}")
+                return jsonify({'error': image_error}), 400
             # If file exists, you might want to generate a unique name before saving
             # For simplicity, we'll overwrite here, but in production, unique names are better.
-            file.save(potential_filepath)
-            current_app.logger.info(f"upload_trix_attachment: Saved original file: {potential_filepath}")
+            os.replace(tmp_path, potential_filepath)
+            current_app.logger.info(f"upload_trix_attachment: Saved original file: {potential_filepath} "
+                                    f"({upload_size} bytes, worker peak RSS {peak_rss_kb()} KiB)")
         except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
             current_app.logger.error(f"upload_trix_attachment: Error saving original file {potential_filepath}: {e}")
             return jsonify({'error': 'Server error during original file save.'}), 500
 
-        # --- IMMEDIATELY CREATE THUMBNAIL ---
-        base, ext = os.path.splitext(original_filename_secure)
-        thumb_filename = f"{base}_thumb{ext}"
-        thumb_filepath = os.path.join(upload_folder, thumb_filename)
-        THUMBNAIL_TARGET_HEIGHT = 100  # Or your desired height
-
-        if create_thumbnail(potential_filepath, thumb_filepath, THUMBNAIL_TARGET_HEIGHT):
-            current_app.logger.info(f"upload_trix_attachment: Thumbnail created successfully: {thumb_filepath}")
-        else:
-            current_app.logger.error(f"upload_trix_attachment: Failed to create thumbnail for {potential_filepath}")
+        # --- QUEUE THUMBNAIL GENERATION ---
+        # Pillow work runs in the background process pool so the request returns immediately.
+        # The upload's index entry is committed with the job; the job records the thumbnail on it.
+        try:
+            record_file(KIND_UPLOAD, original_filename_secure, content_hash=digest.hexdigest())
+            job_status = enqueue_thumbnail(original_filename_secure)
+            current_app.logger.info(f"upload_trix_attachment: Thumbnail job for {original_filename_secure}: {job_status}")
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"upload_trix_attachment: Failed to queue thumbnail for {potential_filepath}: {e}")
             # Not returning an error here as Trix only needs the original URL.
-            # The main image is saved, but thumbnail creation failed. This needs monitoring.
+            # The main image is saved; `flask regenerate-thumbnails` can create the thumbnail later.
 
         # URL for the original file (Trix needs this)
         file_url = url_for('static', filename=f'media_files/{original_filename_secure}', _external=True)
@@ -368,6 +408,15 @@ def upload_trix_attachment():
 
     return jsonify({'error': 'File type not allowed.'}), 400
 
+
+@admin.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    # Trix shows upload errors from the JSON body; other forms get the default error page
+    if request.endpoint == 'admin.upload_trix_attachment':
+        limit_mb = (current_app.config.get('MAX_CONTENT_LENGTH') or 0) // (1024 * 1024)
+        return jsonify({'error': f'File is too large (maximum {limit_mb} MB).'}), 413
+    return e
+
 # --- Footer Icon Management ---
 @admin.route('/manage_footer', methods=['GET', 'POST'])
 @login_required
@@ -383,6 +432,7 @@ def manage_footer():
             db.session.add(config_entry)
         config_entry.value = copyright_form.copyright_message.data
         try:
+            bump_footer_version()
             db.session.commit()
             flash('Copyright message updated successfully.', 'success')
         except Exception as e:
@@ -397,15 +447,8 @@ def manage_footer():
 
     icons = FooterIcon.query.order_by(FooterIcon.order).all()
 
-    # Logic to find unused icons in app/static/img/
-    img_folder = os.path.join(current_app.static_folder, 'img')
-    if not os.path.exists(img_folder):
-        os.makedirs(img_folder) # Create if it doesn't exist
-
-    try:
-        all_pngs_in_folder = [f for f in os.listdir(img_folder) if f.lower().endswith('_ico.png')]
-    except FileNotFoundError:
-        all_pngs_in_folder = []
+    # Unused icons: *_ico.png files in app/static/img/, as recorded in the media index
+    all_pngs_in_folder = footer_icon_filenames()
 
     used_icon_filenames = [icon.icon_filename for icon in icons]
     unused_icons = [f for f in all_pngs_in_folder if f not in used_icon_filenames]
@@ -435,7 +478,9 @@ def add_footer_icon():
                 img_folder = os.path.join(current_app.static_folder, 'img')
                 if not os.path.exists(img_folder): # Ensure img folder exists
                     os.makedirs(img_folder)
-                f.save(os.path.join(img_folder, filename))
+                # Downscaled to the display size (2x), metadata stripped, recompressed losslessly
+                save_uploaded_icon(f, os.path.join(img_folder, filename), current_app.config.get('FOOTER_ICON_SIZE', 48))
+                record_file(KIND_FOOTER_ICON, filename)  # Committed with the new icon below
             except Exception as e:
                 flash(f'Error uploading icon: {str(e)}', 'danger')
                 return redirect(url_for('admin.manage_footer'))
@@ -458,6 +503,7 @@ def add_footer_icon():
             )
             try:
                 db.session.add(new_icon)
+                bump_footer_version()
                 db.session.commit()
                 flash('Footer icon added successfully.', 'success')
             except Exception as e:
@@ -477,23 +523,17 @@ def edit_footer_icon(icon_id):
     icon = FooterIcon.query.get_or_404(icon_id)
     form = FooterIconForm(obj=icon) # Pre-populate form with existing icon data
 
-    # Logic to find unused icons in app/static/img/
-    img_folder = os.path.join(current_app.static_folder, 'img')
-    unused_icons_filenames = []
-    if os.path.exists(img_folder):
-        try:
-            all_pngs_in_folder = [f for f in os.listdir(img_folder) if f.lower().endswith('_ico.png')]
-            # Get all currently used icon filenames except the one being edited
-            # if we decide to change its icon_filename to an existing unused one.
-            used_icon_filenames = [
-                i.icon_filename for i in FooterIcon.query.filter(FooterIcon.id != icon_id).all()
-            ]
-            # An icon is unused if it's in the folder but not in the list of other used icons.
-            # The current icon for this item (icon.icon_filename) can also be in this list if the user
-            # wants to re-select it or if it's a candidate for another icon.
-            unused_icons_filenames = [f for f in all_pngs_in_folder if f not in used_icon_filenames]
-        except FileNotFoundError:
-            pass # Folder might not exist, unused_icons_filenames remains empty
+    # Unused icons: *_ico.png files in app/static/img/, as recorded in the media index
+    all_pngs_in_folder = footer_icon_filenames()
+    # Get all currently used icon filenames except the one being edited
+    # if we decide to change its icon_filename to an existing unused one.
+    used_icon_filenames = [
+        i.icon_filename for i in FooterIcon.query.filter(FooterIcon.id != icon_id).all()
+    ]
+    # An icon is unused if it's in the folder but not in the list of other used icons.
+    # The current icon for this item (icon.icon_filename) can also be in this list if the user
+    # wants to re-select it or if it's a candidate for another icon.
+    unused_icons_filenames = [f for f in all_pngs_in_folder if f not in used_icon_filenames]
 
     if form.validate_on_submit():
         icon.name = form.name.data
@@ -513,7 +553,8 @@ def edit_footer_icon(icon_id):
                     return render_template('admin/edit_footer_icon.html', title='Edit Footer Icon', form=form, icon_id=icon.id, current_icon_filename=icon.icon_filename, unused_icons=unused_icons_filenames)
 
                 img_path = os.path.join(current_app.static_folder, 'img', filename)
-                f.save(img_path)
+                save_uploaded_icon(f, img_path, current_app.config.get('FOOTER_ICON_SIZE', 48))
+                record_file(KIND_FOOTER_ICON, filename)
                 icon.icon_filename = filename # Update filename in DB
                 new_icon_filename_chosen = True
                 flash('New icon image uploaded and updated successfully.', 'info')
@@ -538,6 +579,7 @@ def edit_footer_icon(icon_id):
 
         # If no new file uploaded and no different existing icon selected, icon.icon_filename remains unchanged.
         try:
+            bump_footer_version()
             db.session.commit()
             flash('Footer icon updated successfully.', 'success')
         except Exception as e:
@@ -565,6 +607,7 @@ def delete_footer_icon(icon_id):
         #     os.remove(img_path)
 
         db.session.delete(icon)
+        bump_footer_version()
         db.session.commit()
         flash('Footer icon deleted successfully.', 'success')
     except Exception as e:
@@ -577,11 +620,9 @@ def delete_footer_icon(icon_id):
 def update_icon_order():
     order_data = request.form.getlist('icon_order[]') # Expecting a list of icon IDs in the new order
     try:
-        for index, icon_id_str in enumerate(order_data):
-            icon_id = int(icon_id_str)
-            icon = FooterIcon.query.get(icon_id)
-            if icon:
-                icon.order = index
+        # One UPDATE ... CASE for all icons (see app/batch.py)
+        reorder_icons(list(dict.fromkeys(int(icon_id_str) for icon_id_str in order_data)))
+        bump_footer_version()
         db.session.commit()
         flash('Icon order updated successfully.', 'success')
     except ValueError:
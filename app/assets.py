@@ -0,0 +1,184 @@
+# app/assets.py
+# Fingerprinted (content-hashed) copies of the static assets, for far-future caching.
+#
+# `flask build-assets` copies every file under ASSETS_PATHS (css/, js/, favicon.ico)
+# to static/dist/ with a hash of its contents in the name (css/style.css ->
+# dist/css/style.<hash>.css), writes precompressed .gz siblings (and .br ones when
+# the optional brotli package is installed), and records the mapping in
+# static/dist/manifest.json.
+#
+# With ASSETS_FINGERPRINT on, files under dist/ are served with
+# "Cache-Control: public, max-age=31536000, immutable" plus the best precompressed
+# variant the client accepts, and once a manifest exists url_for('static', filename=...)
+# returns the hashed URL. Changed content gets a new URL, so nothing can go stale.
+# Without a manifest, static URLs are unchanged; in development (ASSETS_FINGERPRINT off)
+# dist/ is served like any other static file. Workers read the manifest at startup;
+# restart them after a build.
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # Optional; only .gz variants are built without it
+    brotli = None
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# Subfolders of dist/ written at runtime by other modules (footer icon sprites); never pruned by builds
+RUNTIME_SUBDIRS = ('sprites',)
+IMMUTABLE_MAX_AGE = 31536000  # One year, the conventional maximum
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.map', '.json', '.svg', '.ico', '.txt', '.xml', '.html'}
+# (Content-Encoding, file suffix), in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _asset_files(static_folder, asset_paths):
+    """Yields paths relative to static_folder, '/'-separated, for the files and directories in asset_paths."""
+    for asset_path in asset_paths:
+        full_path = os.path.join(static_folder, asset_path)
+        if os.path.isfile(full_path):
+            yield asset_path.replace(os.sep, '/')
+            continue
+        for directory, _, filenames in os.walk(full_path):
+            for filename in sorted(filenames):
+                yield os.path.relpath(os.path.join(directory, filename), static_folder).replace(os.sep, '/')
+
+
+def build_assets(static_folder, asset_paths, compress=True, prune=False):
+    """
+    Writes the fingerprinted copies, their compressed variants and the manifest.
+    Files from earlier builds are kept (pages rendered by workers that haven't
+    restarted yet still reference them) unless prune is set.
+    Returns {'assets', 'written', 'compressed', 'pruned', 'brotli'}.
+    """
+    dist_folder = os.path.join(static_folder, DIST_DIR)
+    manifest = {}
+    written = compressed = 0
+    for relative_path in _asset_files(static_folder, asset_paths):
+        base, extension = os.path.splitext(relative_path)
+        hashed_path = f"{base}.{_content_hash(os.path.join(static_folder, relative_path))}{extension}"
+        manifest[relative_path] = hashed_path
+        destination = os.path.join(dist_folder, hashed_path)
+        # Same name means same content, so existing files (and variants) from earlier builds are reused
+        wanted_suffixes = []
+        if compress and extension.lower() in COMPRESSIBLE_EXTENSIONS:
+            wanted_suffixes = [suffix for encoding, suffix in ENCODINGS if encoding != 'br' or brotli is not None]
+            wanted_suffixes = [suffix for suffix in wanted_suffixes if not os.path.exists(destination + suffix)]
+        if os.path.exists(destination) and not wanted_suffixes:
+            continue
+
+        with open(os.path.join(static_folder, relative_path), 'rb') as f:
+            data = f.read()
+        if not os.path.exists(destination):
+            _write_atomic(destination, data)
+            written += 1
+        for suffix in wanted_suffixes:
+            variant = brotli.compress(data, quality=11) if suffix == '.br' else gzip.compress(data, 9, mtime=0)
+            if len(variant) < len(data):  # Otherwise the original is served
+                _write_atomic(destination + suffix, variant)
+                compressed += 1
+
+    _write_atomic(os.path.join(dist_folder, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode())
+
+    pruned = 0
+    if prune:
+        keep = {MANIFEST_NAME} | {variant for hashed_path in manifest.values()
+                                  for variant in (hashed_path, hashed_path + '.gz', hashed_path + '.br')}
+        for directory, subdirectories, filenames in os.walk(dist_folder):
+            if directory == dist_folder:
+                subdirectories[:] = [name for name in subdirectories if name not in RUNTIME_SUBDIRS]
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                if os.path.relpath(path, dist_folder).replace(os.sep, '/') not in keep:
+                    os.remove(path)
+                    pruned += 1
+    return {'assets': len(manifest), 'written': written, 'compressed': compressed, 'pruned': pruned,
+            'brotli': brotli is not None}
+
+
+def load_manifest(static_folder):
+    """{logical path: hashed path under dist/} from the last build, or {} if there is none."""
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def send_fingerprinted(static_folder, filename):
+    """Serves a dist/ file, precompressed if the client accepts it, with immutable caching."""
+    served_name, content_encoding = filename, None
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding]:
+            candidate = safe_join(static_folder, filename + suffix)
+            if candidate and os.path.isfile(candidate):
+                served_name, content_encoding = filename + suffix, encoding
+                break
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = send_from_directory(static_folder, served_name, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+    if content_encoding:
+        response.headers['Content-Encoding'] = content_encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_assets(app):
+    """
+    Serves dist/ with immutable caching, and rewrites static URLs to their fingerprinted
+    copies when a manifest exists. Both only when ASSETS_FINGERPRINT is on.
+    """
+    if not app.config.get('ASSETS_FINGERPRINT'):
+        app.extensions['assets_manifest'] = {}
+        return {}
+    manifest = load_manifest(app.static_folder)
+    app.extensions['assets_manifest'] = manifest
+
+    if manifest:
+        @app.url_defaults
+        def _fingerprint_static_url(endpoint, values):
+            if endpoint == 'static':
+                hashed_path = manifest.get(values.get('filename'))
+                if hashed_path:
+                    values['filename'] = f'{DIST_DIR}/{hashed_path}'
+
+    static_view = app.view_functions['static']
+    dist_prefix = DIST_DIR + '/'
+
+    def static_with_fingerprints(filename):
+        # Anything under dist/ is content-addressed, including files from earlier builds
+        if filename.startswith(dist_prefix) and filename != dist_prefix + MANIFEST_NAME:
+            return send_fingerprinted(app.static_folder, filename)
+        return static_view(filename=filename)
+
+    app.view_functions['static'] = static_with_fingerprints
+    return manifest
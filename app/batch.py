@@ -0,0 +1,182 @@
+# app/batch.py
+# Batch admin operations (POST /admin/batch): recategorise, delete and reorder many
+# posts or footer icons in one request and one transaction.
+#
+# Each operation is one set-based statement (UPDATE ... WHERE id IN, UPDATE ... CASE,
+# DELETE ... WHERE id IN) instead of a load-modify-flush per row. Bulk statements skip
+# the ORM's per-object events, so the side effects those events would have had are
+# applied here: search-index and post_media rows of deleted posts are removed, and the
+# static export is told which posts changed. The home-post invariant is restored once,
+# after all operations, and the content/footer versions are bumped once per batch.
+from sqlalchemy import case, delete, update
+from .cache import bump_content_version, bump_footer_version
+from .extensions import db
+from .home_post import HOME_CATEGORY, ensure_home_post, get_home_post, set_home_post
+
+POST_CATEGORIES = ('home', 'portfolio', 'blog')
+ACTIONS = ('set_category', 'delete_posts', 'reorder_icons', 'delete_icons')
+MAX_BATCH_IDS = 500  # Per operation; keeps each IN list under SQLite's bound-parameter limit
+
+
+class BatchError(ValueError):
+    """An invalid batch request; nothing has been changed."""
+
+
+def _ids(operation, key):
+    ids = operation.get(key)
+    if not isinstance(ids, list) or not ids:
+        raise BatchError(f"'{key}' must be a non-empty list of ids.")
+    if len(ids) > MAX_BATCH_IDS:
+        raise BatchError(f"At most {MAX_BATCH_IDS} ids per operation.")
+    try:
+        ids = [int(item) for item in ids]
+    except (TypeError, ValueError):
+        raise BatchError(f"'{key}' must contain integer ids.")
+    return list(dict.fromkeys(ids))  # Deduplicated, in the given order (it matters for reorder_icons)
+
+
+def validate_operations(operations):
+    """Checks every operation before any of them runs. Returns the normalised list, or raises BatchError."""
+    if not isinstance(operations, list) or not operations:
+        raise BatchError("'operations' must be a non-empty list.")
+    validated = []
+    for operation in operations:
+        if not isinstance(operation, dict) or operation.get('action') not in ACTIONS:
+            raise BatchError(f"Each operation needs an 'action', one of: {', '.join(ACTIONS)}.")
+        action = operation['action']
+        if action in ('set_category', 'delete_posts'):
+            item = {'action': action, 'ids': _ids(operation, 'post_ids')}
+            if action == 'set_category':
+                item['category'] = operation.get('category')
+                if item['category'] not in POST_CATEGORIES:
+                    raise BatchError(f"'category' must be one of: {', '.join(POST_CATEGORIES)}.")
+                if item['category'] == HOME_CATEGORY and len(item['ids']) != 1:
+                    raise BatchError("Only one post can be the home post.")
+        else:
+            item = {'action': action, 'ids': _ids(operation, 'icon_ids')}
+        validated.append(item)
+    return validated
+
+
+def _post_categories(post_ids):
+    """{id: category} for the posts that exist. One indexed read."""
+    from .models import Post
+    return dict(db.session.query(Post.id, Post.category).filter(Post.id.in_(post_ids)))
+
+
+def set_posts_category(post_ids, category):
+    """
+    Moves posts to `category` with one UPDATE (updated_at is refreshed by its onupdate).
+    Returns ({id: old category} of the posts that existed, id of a demoted home post or None).
+    """
+    from .models import Post
+    from .static_export import record_changes
+
+    old_categories = _post_categories(post_ids)
+    demoted_id = None
+    if category == HOME_CATEGORY:
+        if old_categories:
+            post = db.session.get(Post, next(iter(old_categories)), options=[Post.summary_only()])
+            demoted_id = set_home_post(post)  # Demote-then-promote, in the order the unique index needs
+    elif old_categories:
+        db.session.execute(update(Post).where(Post.id.in_(list(old_categories))).values(category=category))
+    record_changes(db.session, {post_id: [old, category] for post_id, old in old_categories.items()})
+    return old_categories, demoted_id
+
+
+def delete_posts(post_ids):
+    """Deletes posts with one DELETE and drops their search-index and post_media rows. Returns {id: old category}."""
+    from .media_library import unlink_posts
+    from .models import Post
+    from .search import remove_from_index
+    from .static_export import record_changes
+
+    old_categories = _post_categories(post_ids)
+    if old_categories:
+        deleted_ids = list(old_categories)
+        db.session.execute(delete(Post).where(Post.id.in_(deleted_ids)))
+        remove_from_index(deleted_ids)
+        unlink_posts(db.session.connection(), deleted_ids)
+        record_changes(db.session, {post_id: [old] for post_id, old in old_categories.items()})
+    return old_categories
+
+
+def reorder_icons(icon_ids):
+    """
+    Sets footer icon order to each id's position in icon_ids with one UPDATE ... CASE.
+    Icons not listed keep their order. Returns the number of icons updated.
+    """
+    from .models import FooterIcon
+    from .static_export import record_changes
+
+    if not icon_ids:
+        return 0
+    positions = {icon_id: index for index, icon_id in enumerate(icon_ids)}
+    result = db.session.execute(
+        update(FooterIcon).where(FooterIcon.id.in_(icon_ids))
+        .values(order=case(positions, value=FooterIcon.id))
+    )
+    if result.rowcount:
+        record_changes(db.session, full=True)
+    return result.rowcount
+
+
+def delete_icons(icon_ids):
+    """Deletes footer icons with one DELETE (their image files stay in static/img). Returns the count."""
+    from .models import FooterIcon
+    from .static_export import record_changes
+
+    result = db.session.execute(delete(FooterIcon).where(FooterIcon.id.in_(icon_ids)))
+    if result.rowcount:
+        record_changes(db.session, full=True)
+    return result.rowcount
+
+
+def _home_post_among(old_categories):
+    return next((post_id for post_id, category in old_categories.items() if category == HOME_CATEGORY), None)
+
+
+def apply_batch(operations):
+    """
+    Validates and runs operations in order, in the current transaction, then restores
+    the home-post invariant and bumps the versions once. Caller commits (or rolls back).
+    Returns {'results': [per-operation dict], 'home_post_id': id or None, 'new_home_post_id': id or None}.
+    """
+    operations = validate_operations(operations)
+    results = []
+    posts_changed = footer_changed = False
+    former_home_post_id = None
+    for operation in operations:
+        action, ids = operation['action'], operation['ids']
+        if action == 'set_category':
+            old_categories, demoted_id = set_posts_category(ids, operation['category'])
+            if operation['category'] != HOME_CATEGORY:
+                former_home_post_id = _home_post_among(old_categories) or former_home_post_id
+            posts_changed = posts_changed or bool(old_categories)
+            results.append({'action': action, 'updated': sorted(old_categories), 'demoted_home_post_id': demoted_id,
+                            'not_found': [post_id for post_id in ids if post_id not in old_categories]})
+        elif action == 'delete_posts':
+            old_categories = delete_posts(ids)
+            former_home_post_id = _home_post_among(old_categories) or former_home_post_id
+            posts_changed = posts_changed or bool(old_categories)
+            results.append({'action': action, 'deleted': sorted(old_categories),
+                            'not_found': [post_id for post_id in ids if post_id not in old_categories]})
+        elif action == 'reorder_icons':
+            updated = reorder_icons(ids)
+            footer_changed = footer_changed or bool(updated)
+            results.append({'action': action, 'updated': updated})
+        else:
+            deleted = delete_icons(ids)
+            footer_changed = footer_changed or bool(deleted)
+            results.append({'action': action, 'deleted': deleted})
+
+    # Prefer a post other than the one that just left home, as set_post_category does
+    new_home_post = ensure_home_post(excluded_post_id=former_home_post_id) if former_home_post_id else None
+    if footer_changed:
+        bump_footer_version()  # Also bumps the content version
+    elif posts_changed:
+        bump_content_version()
+
+    home_post = get_home_post(with_content=False)
+    return {'results': results, 'home_post_id': home_post.id if home_post else None,
+            'new_home_post_id': new_home_post.id if new_home_post else None}
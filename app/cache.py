@@ -0,0 +1,162 @@
+# app/cache.py
+# Process-local caches and version stamps for data that changes rarely but is needed on every page.
+#
+# Each gunicorn worker keeps its own copy. Admin writes stamp a new version value
+# into SiteConfiguration in the same transaction as the change, so every worker
+# notices the change with one cheap indexed read instead of re-running the full queries.
+import threading
+import time
+import uuid
+from collections import namedtuple
+from flask import current_app, url_for
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from .extensions import db
+
+FOOTER_VERSION_KEY = 'footer_version'
+CONTENT_VERSION_KEY = 'content_version'
+
+
+class FooterIconSnapshot(namedtuple('FooterIconSnapshot', ['id', 'name', 'icon_filename', 'click_url', 'order'])):
+    """Detached, read-only copy of a FooterIcon row that is safe to share between requests."""
+
+    @property
+    def icon_url(self):
+        # Built per render so the URL respects the current request (e.g. X-Forwarded-Prefix)
+        return url_for('static', filename=f'img/{self.icon_filename}')
+
+
+FooterSnapshot = namedtuple('FooterSnapshot', ['version', 'icons', 'copyright_message', 'sprite'])
+
+_lock = threading.Lock()
+_versions = {}  # key -> (value, monotonic time it was read)
+_footer_snapshot = None
+
+
+def read_version(key):
+    """Returns the version stamp stored under `key` (None if it was never set)."""
+    from .models import SiteConfiguration
+    return db.session.query(SiteConfiguration.value).filter_by(key=key).scalar()
+
+
+def current_version(key, check_interval=None):
+    """
+    Returns the version stamp for `key`, re-reading it from the database at most once
+    every `check_interval` seconds (VERSION_CHECK_SECONDS by default) per worker.
+    """
+    if check_interval is None:
+        check_interval = current_app.config.get('VERSION_CHECK_SECONDS', 5)
+    now = time.monotonic()
+    cached = _versions.get(key)
+    if cached is not None and now - cached[1] < check_interval:
+        return cached[0]
+    value = read_version(key)
+    with _lock:
+        _versions[key] = (value, now)
+    return value
+
+
+def bump_version(key):
+    """
+    Stages a new version stamp for `key` in the current session.
+    The caller commits it together with the data change it describes; once the
+    commit succeeds this worker forgets its cached copy of the stamp.
+    """
+    from .models import SiteConfiguration
+    entry = SiteConfiguration.query.filter_by(key=key).first()
+    if not entry:
+        entry = SiteConfiguration(key=key)
+        db.session.add(entry)
+    entry.value = uuid.uuid4().hex
+    db.session.info.setdefault('bumped_versions', set()).add(key)
+    return entry.value
+
+
+def bump_content_version():
+    """
+    Call from any admin route that changes what public pages render (posts, footer),
+    before committing. Cached pages keyed on the old version stop being served once each
+    worker re-reads the stamp (within VERSION_CHECK_SECONDS).
+    """
+    return bump_version(CONTENT_VERSION_KEY)
+
+
+def bump_footer_version():
+    """
+    Call from any admin route that changes footer icons or the copyright message,
+    before committing. The footer is on every page, so this also bumps the content version.
+    """
+    bump_content_version()
+    return bump_version(FOOTER_VERSION_KEY)
+
+
+def forget_versions(*keys):
+    """Drops this worker's cached stamps (and the footer snapshot) so the next read hits the DB."""
+    global _footer_snapshot
+    with _lock:
+        for key in keys or list(_versions):
+            _versions.pop(key, None)
+        if not keys or FOOTER_VERSION_KEY in keys:
+            _footer_snapshot = None
+
+
+def invalidate_footer_cache():
+    """Forgets this worker's footer snapshot so the next render reloads it."""
+    forget_versions(FOOTER_VERSION_KEY)
+
+
+@event.listens_for(Session, 'after_commit')
+def _forget_after_commit(session):
+    bumped = session.info.pop('bumped_versions', None)
+    if bumped:
+        forget_versions(*bumped)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('bumped_versions', None)
+
+
+def _load_footer_snapshot(version):
+    from .models import FooterIcon, SiteConfiguration
+
+    icons = tuple(
+        FooterIconSnapshot(icon.id, icon.name, icon.icon_filename, icon.click_url, icon.order)
+        for icon in FooterIcon.query.order_by(FooterIcon.order).all()
+    )
+    copyright_config = SiteConfiguration.query.filter_by(key='copyright_message').first()
+    copyright_message = copyright_config.value if copyright_config else None
+    return FooterSnapshot(version, icons, copyright_message, _load_footer_sprite(icons))
+
+
+def _load_footer_sprite(icons):
+    # One image for all footer icons (app/footer_icons.py); written once per icon set
+    if not icons or not current_app.config.get('FOOTER_SPRITE_ENABLED', True):
+        return None
+    from .footer_icons import build_footer_sprite
+    try:
+        return build_footer_sprite(current_app.static_folder, [icon.icon_filename for icon in icons],
+                                   current_app.config.get('FOOTER_ICON_SIZE', 48))
+    except Exception as e:  # e.g. a read-only static folder; the footer falls back to one <img> per icon
+        current_app.logger.warning(f"Could not build the footer icon sprite: {e}")
+        return None
+
+
+def get_footer_snapshot():
+    """
+    Returns the cached footer data for this worker, reloading it when the stored
+    version stamp has changed. The stamp itself is re-read at most once every
+    VERSION_CHECK_SECONDS, so most renders run no footer queries at all.
+    """
+    global _footer_snapshot
+
+    if not current_app.config.get('FOOTER_CACHE_ENABLED', True):
+        return _load_footer_snapshot(None)
+
+    version = current_version(FOOTER_VERSION_KEY)
+    snapshot = _footer_snapshot
+    if snapshot is None or snapshot.version != version:
+        snapshot = _load_footer_snapshot(version)
+        with _lock:
+            _footer_snapshot = snapshot
+    return snapshot
@@ -0,0 +1,208 @@
+# app/compression.py
+# gzip/brotli compression of dynamic responses (HTML pages, admin JSON), installed
+# as WSGI middleware next to ProxyFix.
+#
+# A response is compressed when the client accepts an encoding, its Content-Type is
+# in COMPRESSION_MIMETYPES, it has no Content-Encoding yet (precompressed assets from
+# app/assets.py pass through), it isn't marked no-transform, and it is at least
+# COMPRESSION_MIN_SIZE bytes. Bodies up to COMPRESSION_STREAM_THRESHOLD are compressed
+# in one go and keep a Content-Length; larger ones, or ones of unknown length, are
+# compressed chunk by chunk as the app yields them.
+#
+# Compressible responses always get "Vary: Accept-Encoding". Strong ETags of
+# compressed responses get the encoding appended ("abc" -> "abc-gzip"), and the
+# suffix is removed from If-None-Match before the app sees it, so 304s keep working.
+# Brotli needs the optional brotli package; without it, only gzip is offered.
+import re
+import time
+import zlib
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ETAG_SUFFIX_RE = re.compile(r'-(gzip|br)"')
+ETAG_SUFFIX_ENVIRON_KEY = 'app.compression.etag_suffix'
+
+
+class _GzipCompressor:
+    def __init__(self, level):
+        # wbits 16 + MAX_WBITS writes the gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """WSGI middleware that compresses eligible responses; see the module comment."""
+
+    def __init__(self, wsgi_app, mimetypes, min_size=1024, stream_threshold=1024 * 1024,
+                 gzip_level=6, brotli_quality=4, record=None):
+        self.wsgi_app = wsgi_app
+        self.mimetypes = frozenset(mimetypes)
+        self.min_size = min_size
+        self.stream_threshold = stream_threshold
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        # record(encoding, bytes_in, bytes_out, cpu_seconds), e.g. into app/metrics.py
+        self.record = record
+
+    def _negotiate(self, environ):
+        accepted = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING'))
+        if brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+    def _compressor(self, encoding):
+        return _BrotliCompressor(self.brotli_quality) if encoding == 'br' else _GzipCompressor(self.gzip_level)
+
+    def _is_compressible_type(self, headers):
+        content_type = headers.get('Content-Type', '').split(';', 1)[0].strip().lower()
+        return content_type in self.mimetypes
+
+    def __call__(self, environ, start_response):
+        # Clients revalidate with the ETag we sent them, which may carry an encoding suffix
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            match = ETAG_SUFFIX_RE.search(if_none_match)
+            if match:
+                environ[ETAG_SUFFIX_ENVIRON_KEY] = match.group(1)
+                environ['HTTP_IF_NONE_MATCH'] = ETAG_SUFFIX_RE.sub('"', if_none_match)
+
+        encoding = self._negotiate(environ)
+        state = {'encoding': None, 'length': None}
+
+        def compressing_start_response(status, headers, exc_info=None):
+            headers = Headers(headers)
+            status_code = int(status.split(' ', 1)[0])
+            if status_code == 304:
+                # Echo the suffix the client revalidated with so its cached copy keeps matching
+                suffix = environ.get(ETAG_SUFFIX_ENVIRON_KEY)
+                if suffix and headers.get('ETag', '').endswith('"'):
+                    headers['ETag'] = headers['ETag'][:-1] + f'-{suffix}"'
+                return start_response(status, headers.to_wsgi_list(), exc_info)
+
+            if (status_code < 200 or status_code in (204, 206)
+                    or 'Content-Encoding' in headers or not self._is_compressible_type(headers)):
+                return start_response(status, headers.to_wsgi_list(), exc_info)
+
+            vary = [value.strip() for value in headers.get('Vary', '').split(',') if value.strip()]
+            if 'accept-encoding' not in (value.lower() for value in vary):
+                headers['Vary'] = ', '.join(vary + ['Accept-Encoding'])
+
+            length = headers.get('Content-Length', type=int)
+            if (encoding and environ.get('REQUEST_METHOD') != 'HEAD'
+                    and 'no-transform' not in headers.get('Cache-Control', '')
+                    and (length is None or length >= self.min_size)):
+                state['encoding'] = encoding
+                state['length'] = length
+                headers['Content-Encoding'] = encoding
+                headers.remove('Content-Length')  # Set again below for bodies compressed in one go
+                etag = headers.get('ETag')
+                if etag and not etag.startswith('W/') and etag.endswith('"'):
+                    headers['ETag'] = etag[:-1] + f'-{encoding}"'
+                if length is not None and length <= self.stream_threshold:
+                    state['headers'] = headers
+                    state['status'] = status
+                    state['exc_info'] = exc_info
+                    return None  # start_response is called once the compressed length is known
+            return start_response(status, headers.to_wsgi_list(), exc_info)
+
+        app_iter = self.wsgi_app(environ, compressing_start_response)
+        if state['encoding'] is None:
+            return app_iter
+        if 'headers' in state:
+            return self._compress_buffered(app_iter, state, start_response)
+        return self._compress_streaming(app_iter, state['encoding'])
+
+    def _compress_buffered(self, app_iter, state, start_response):
+        try:
+            body = b''.join(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        started = time.thread_time()
+        compressor = self._compressor(state['encoding'])
+        compressed = compressor.compress(body) + compressor.flush()
+        self._record(state['encoding'], len(body), len(compressed), time.thread_time() - started)
+        headers = state['headers']
+        headers['Content-Length'] = str(len(compressed))
+        start_response(state['status'], headers.to_wsgi_list(), state['exc_info'])
+        return [compressed]
+
+    def _compress_streaming(self, app_iter, encoding):
+        compressor = self._compressor(encoding)
+        bytes_in = bytes_out = 0
+        cpu_seconds = 0.0
+        try:
+            for chunk in app_iter:
+                if not chunk:
+                    continue
+                started = time.thread_time()
+                output = compressor.compress(chunk)
+                cpu_seconds += time.thread_time() - started
+                bytes_in += len(chunk)
+                if output:
+                    bytes_out += len(output)
+                    yield output
+            started = time.thread_time()
+            output = compressor.flush()
+            cpu_seconds += time.thread_time() - started
+            bytes_out += len(output)
+            yield output
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        self._record(encoding, bytes_in, bytes_out, cpu_seconds)
+
+    def _record(self, encoding, bytes_in, bytes_out, cpu_seconds):
+        if self.record is not None:
+            self.record(encoding, bytes_in, bytes_out, cpu_seconds)
+
+
+def init_compression(app):
+    """Wraps app.wsgi_app in CompressionMiddleware when COMPRESSION_ENABLED is on."""
+    if not app.config.get('COMPRESSION_ENABLED'):
+        return None
+
+    def record(encoding, bytes_in, bytes_out, cpu_seconds):
+        # Runs outside the app context, after the request's own metrics were recorded
+        registry = app.extensions.get('metrics')
+        if registry is None:
+            return
+        labels = {'encoding': encoding}
+        registry.inc('compression_responses_total', labels)
+        registry.inc('compression_bytes_in_total', labels, bytes_in)
+        registry.inc('compression_bytes_out_total', labels, bytes_out)
+        registry.inc('compression_cpu_seconds_total', labels, cpu_seconds)
+
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        mimetypes=app.config['COMPRESSION_MIMETYPES'],
+        min_size=app.config.get('COMPRESSION_MIN_SIZE', 1024),
+        stream_threshold=app.config.get('COMPRESSION_STREAM_THRESHOLD', 1024 * 1024),
+        gzip_level=app.config.get('COMPRESSION_GZIP_LEVEL', 6),
+        brotli_quality=app.config.get('COMPRESSION_BROTLI_QUALITY', 4),
+        record=record,
+    )
+    return app.wsgi_app
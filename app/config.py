@@ -6,6 +6,15 @@ from dotenv import load_dotenv
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 load_dotenv(os.path.join(project_root, '.env'))
 
+def _engine_options_from_env():
+    """SQLAlchemy pool options from DB_POOL_* environment variables; unset ones keep SQLAlchemy's defaults."""
+    options = {'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')}
+    for env_name, option in (('DB_POOL_SIZE', 'pool_size'), ('DB_MAX_OVERFLOW', 'max_overflow'),
+                             ('DB_POOL_RECYCLE', 'pool_recycle'), ('DB_POOL_TIMEOUT', 'pool_timeout')):
+        if os.environ.get(env_name):
+            options[option] = int(os.environ[env_name])
+    return options
+
 class Config:
     """remove 'or 'you-should-really-change-this' when putting into production """
 
@@ -16,9 +25,102 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(project_root, 'instance', 'app.db')
 
-    # Configuration for uploaded media files
-    UPLOAD_FOLDER = os.path.join(project_root, 'app', 'static', 'media_files')
+    # Configuration for uploaded media files. UPLOAD_FOLDER can be moved (e.g. bench/ points it at its
+    # generated media) but /static/media_files/ URLs are only served from the default location
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(project_root, 'app', 'static', 'media_files')
     MEDIA_FILES_URL = '/static/media_files/'                        # URL path to access these files
+    # Largest request body accepted (uploads over this get a 413), and the largest image, in pixels,
+    # that uploads may decode to (guards against decompression bombs)
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 25 * 1024 * 1024))
+    UPLOAD_MAX_PIXELS = int(os.environ.get('UPLOAD_MAX_PIXELS', 40_000_000))
+
+    # Version stamps (app/cache.py): how often each worker re-reads the footer/content stamps
+    VERSION_CHECK_SECONDS = int(os.environ.get('VERSION_CHECK_SECONDS', 5))
+    FOOTER_CACHE_ENABLED = True
+    # Footer icons (app/footer_icons.py): uploads are downscaled to FOOTER_ICON_SIZE px (2x the 24px display size)
+    # and the footer shows them from one generated sprite image
+    FOOTER_ICON_SIZE = int(os.environ.get('FOOTER_ICON_SIZE', 48))
+    FOOTER_SPRITE_ENABLED = True
+
+    # Full-page cache for anonymous visitors (app/page_cache.py). Opt-in.
+    # Backend 'memory' is a per-worker LRU; 'filesystem' is shared by all workers via PAGE_CACHE_DIR.
+    PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND', 'memory')
+    PAGE_CACHE_MAX_BYTES = int(os.environ.get('PAGE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    PAGE_CACHE_DIR = os.environ.get('PAGE_CACHE_DIR') or os.path.join(project_root, 'instance', 'page_cache')
+
+    # Listing pagination mode: 'offset' (page numbers) or 'keyset' (cursor seek on created_at, id).
+    # In keyset mode, ?page=N URLs still work and fall back to offset pagination.
+    BLOG_PAGINATION = os.environ.get('BLOG_PAGINATION', 'offset')
+    PORTFOLIO_PAGINATION = os.environ.get('PORTFOLIO_PAGINATION', 'offset')
+    DASHBOARD_PAGINATION = os.environ.get('DASHBOARD_PAGINATION', 'offset')
+
+    # Background thumbnail generation (app/thumbnails.py): pool size per gunicorn worker, and how many
+    # jobs may be queued before uploads fall back to generating the thumbnail inline
+    THUMBNAIL_ASYNC = True
+    THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+    THUMBNAIL_MAX_PENDING = int(os.environ.get('THUMBNAIL_MAX_PENDING', 16))
+
+    # Per-request instrumentation (app/instrumentation.py): Server-Timing header with SQL/template/total
+    # time, and a warning log for statements slower than SLOW_QUERY_MS (with bound parameters, truncated)
+    SQL_INSTRUMENTATION = os.environ.get('SQL_INSTRUMENTATION', '').lower() in ('1', 'true', 'yes')
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+    SLOW_QUERY_LOG_PARAMS = os.environ.get('SLOW_QUERY_LOG_PARAMS', 'true').lower() in ('1', 'true', 'yes')
+
+    # Prometheus-style metrics (app/metrics.py) at /admin/metrics, summed across workers through METRICS_DIR
+    # (clear it on deploy). Readable by logged-in admins, or by scrapers sending "Authorization: Bearer <METRICS_TOKEN>".
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+    METRICS_DIR = os.environ.get('METRICS_DIR') or os.path.join(project_root, 'instance', 'metrics')
+    METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 5))
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Request profiler (app/profiling.py): cProfile for a random PROFILE_SAMPLE_RATE of requests, and
+    # collapsed stack samples for any request slower than PROFILE_SLOW_MS. Newest PROFILE_MAX_CAPTURES are kept.
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.01))
+    PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', 1000))
+    PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', 5))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR') or os.path.join(project_root, 'instance', 'profiles')
+    PROFILE_MAX_CAPTURES = int(os.environ.get('PROFILE_MAX_CAPTURES', 200))
+
+    # gzip/brotli compression of responses (app/compression.py). Only these types are compressed (images,
+    # fonts and archives already are); bodies over COMPRESSION_STREAM_THRESHOLD are compressed as they stream.
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_STREAM_THRESHOLD = int(os.environ.get('COMPRESSION_STREAM_THRESHOLD', 1024 * 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+    COMPRESSION_MIMETYPES = ('text/html', 'text/css', 'text/plain', 'text/xml', 'text/javascript',
+                             'application/javascript', 'application/json', 'application/xml',
+                             'application/rss+xml', 'application/atom+xml', 'image/svg+xml',
+                             'image/vnd.microsoft.icon', 'image/x-icon')
+
+    # Fingerprinted static assets (app/assets.py), built into static/dist/ by `flask build-assets`.
+    # With a manifest present, url_for('static', ...) returns hashed URLs served with immutable caching.
+    ASSETS_FINGERPRINT = os.environ.get('ASSETS_FINGERPRINT', 'true').lower() in ('1', 'true', 'yes')
+    ASSETS_PATHS = ('css', 'js', 'favicon.ico')  # Relative to app/static; img/ holds admin-uploaded footer icons
+
+    # SQLite pragmas applied to every new connection (app/database.py); empty means SQLite's defaults
+    SQLITE_PRAGMAS = {}
+
+    # Resized images served from /media/<name> (app/media.py). ?w= and ?q= snap to these allow-lists.
+    # Derivatives are cached in MEDIA_CACHE_DIR (shared by all workers), oldest evicted past MEDIA_CACHE_MAX_BYTES.
+    MEDIA_WIDTHS = (320, 480, 640, 960, 1280, 1920)
+    MEDIA_QUALITIES = (50, 65, 80, 90)
+    MEDIA_DEFAULT_WIDTH = 960
+    MEDIA_DEFAULT_QUALITY = 80
+    MEDIA_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    MEDIA_CACHE_DIR = os.environ.get('MEDIA_CACHE_DIR') or os.path.join(project_root, 'instance', 'media_cache')
+    MEDIA_CACHE_MAX_BYTES = int(os.environ.get('MEDIA_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    MEDIA_MAX_AGE = int(os.environ.get('MEDIA_MAX_AGE', 86400))
+    # Rewrite <img> tags in post bodies to /media/ URLs with a srcset (the responsive_images filter)
+    MEDIA_RESPONSIVE_IMAGES = True
+    MEDIA_IMG_SIZES = '(max-width: 800px) 100vw, 800px'
+
+    # `flask export-static` writes the public pages here as plain files (app/static_export.py).
+    # With STATIC_EXPORT_ON_SAVE, committed post/footer changes re-export the affected pages.
+    STATIC_EXPORT_DIR = os.environ.get('STATIC_EXPORT_DIR') or os.path.join(project_root, 'instance', 'static_export')
+    STATIC_EXPORT_ON_SAVE = os.environ.get('STATIC_EXPORT_ON_SAVE', 'false').lower() in ('1', 'true', 'yes')
 
     @staticmethod
     def init_app(app):
@@ -47,18 +149,35 @@ class DevelopmentConfig(Config):
     """Configurations for Development."""
     DEBUG = True
     SQLALCHEMY_ECHO = False # Set to True to see SQL queries
+    ASSETS_FINGERPRINT = False # Edits to css/js show up on reload even if a build exists
 
 class TestingConfig(Config):
     """Configurations for Testing, with a separate test database."""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:' # Or use a file-based test DB
     WTF_CSRF_ENABLED = False # Disable CSRF for tests
+    FOOTER_CACHE_ENABLED = False # The snapshot is process-wide, so it would leak between test apps
+    VERSION_CHECK_SECONDS = 0
+    THUMBNAIL_ASYNC = False # Generate thumbnails inline so tests see them immediately
 
 class ProductionConfig(Config):
     """Configurations for Production."""
     DEBUG = False
     # Ensure DATABASE_URL is set in the environment for production
 
+    # WAL lets gunicorn workers keep reading while an admin write commits; NORMAL sync is
+    # durable across application crashes in WAL mode (only an OS crash can lose the last commits)
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -32768)),  # Negative means KiB, i.e. 32 MiB
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024)),
+        'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'MEMORY'),
+    }
+    # Pool options for the engine, e.g. DB_POOL_SIZE=5 DB_POOL_RECYCLE=1800 (pre-ping is on unless DB_POOL_PRE_PING=false)
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options_from_env()
+
 config = {
     'development': DevelopmentConfig,
     'testing': TestingConfig,
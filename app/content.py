@@ -0,0 +1,202 @@
+# app/content.py
+# Helpers for deriving listing data (excerpts) from stored Trix HTML.
+# Shared by the admin write paths and the public listing views, so it lives
+# outside either blueprint to avoid circular imports.
+#
+# analyze_content() walks the HTML once with the stdlib HTMLParser and returns
+# everything the app derives from a post body (excerpt, images, plain text, word
+# count). Its excerpts match the original BeautifulSoup implementation, which is
+# kept in bench/legacy_content.py as the reference for bench/content_analysis.py.
+import re # For regular expressions (sentence splitting)
+from collections import namedtuple
+from functools import lru_cache
+from html.parser import HTMLParser
+
+EXCERPT_SENTENCES = 2 # Number of sentences stored in Post.excerpt
+
+ContentAnalysis = namedtuple('ContentAnalysis', ['excerpt', 'first_image_src', 'images', 'word_count', 'text'])
+
+# Elements that never have an end tag, so they are not pushed on the open-element stack
+_VOID_ELEMENTS = frozenset(['area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen',
+                            'link', 'meta', 'param', 'source', 'track', 'wbr'])
+_SKIPPED_ELEMENTS = frozenset(['script', 'style'])
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Trix figcaptions that are just "filename.ext 12.5 KB" or dimensions say nothing about the post
+_CAPTION_FILENAME_RE = re.compile(
+    r'[\w\s\-_\.]+\.(?:jpg|jpeg|png|gif|webp|bmp|tiff|svg|ico|pdf|doc|docx|xls|xlsx|ppt|pptx)'
+    r'(?:\s+\d{1,7}(?:\.\d{1,2})?\s*(?:KB|MB|GB|B))?\.?', re.IGNORECASE)
+_CAPTION_DIMENSIONS_RE = re.compile(r'\d{1,4}x\d{1,4}')
+
+# "filename.ext size KB/MB/GB." at the start of the text, left over from attachments outside a figcaption
+_FILENAME_SIZE_PATTERN = (r"^\s*[\w\s\-_\.]+\.(?:jpg|jpeg|png|gif|webp|bmp|tiff|svg|ico|pdf|doc|docx|xls|xlsx|ppt|pptx)"
+                          r"\s+\d{1,7}(?:\.\d{1,2})?\s*(?:KB|MB|GB|bytes|B)\b[\.,;]?\s*")
+_FILENAME_SIZE_RE = re.compile(_FILENAME_SIZE_PATTERN, re.IGNORECASE)
+_FILENAME_SIZE_SENTENCE_RE = re.compile(_FILENAME_SIZE_PATTERN.strip('^$\\s*'), re.IGNORECASE)
+
+_SENTENCE_SPLIT_RE = re.compile(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\?|!)\s')
+
+
+class _ContentParser(HTMLParser):
+    """
+    Collects text chunks, <p> membership and <img> sources in one pass.
+    Mirrors how BeautifulSoup's html.parser builder nests elements: an end tag
+    closes the most recent open element of that name and is ignored otherwise.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chunks = []        # [stripped text, ids of enclosing <p>s, dropped?]
+        self.paragraph_count = 0
+        self.images = []
+        self.first_image_src = None
+        self._seen_img = False
+        self._open = []         # Stack of [tag name, <p> id or None, first chunk index for figcaptions]
+        self._open_paragraphs = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'img':
+            src = dict(attrs).get('src')
+            if not self._seen_img:
+                self._seen_img = True
+                self.first_image_src = src
+            if src:
+                self.images.append(src)
+        if tag in _VOID_ELEMENTS:
+            return
+        entry = [tag, None, None]
+        if tag == 'p':
+            entry[1] = self.paragraph_count
+            self._open_paragraphs.append(self.paragraph_count)
+            self.paragraph_count += 1
+        elif tag == 'figcaption':
+            entry[2] = len(self.chunks)
+        elif tag in _SKIPPED_ELEMENTS:
+            self._skip_depth += 1
+        self._open.append(entry)
+
+    def handle_startendtag(self, tag, attrs):
+        # <p/> and friends: open and immediately close, like BeautifulSoup does
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        for index in range(len(self._open) - 1, -1, -1):
+            if self._open[index][0] == tag:
+                break
+        else:
+            return
+        while len(self._open) > index:
+            self._close(self._open.pop())
+
+    def _close(self, entry):
+        tag, paragraph_id, first_chunk = entry
+        if paragraph_id is not None:
+            self._open_paragraphs.remove(paragraph_id)
+        elif tag in _SKIPPED_ELEMENTS:
+            self._skip_depth -= 1
+        elif first_chunk is not None:
+            caption_chunks = [chunk for chunk in self.chunks[first_chunk:] if not chunk[2]]
+            caption_text = ' '.join(chunk[0] for chunk in caption_chunks)
+            if _CAPTION_FILENAME_RE.fullmatch(caption_text) or \
+                    _CAPTION_DIMENSIONS_RE.fullmatch(caption_text) or \
+                    len(caption_text.split()) < 4:
+                for chunk in caption_chunks:
+                    chunk[2] = True
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        text = data.strip()
+        if text:
+            self.chunks.append([text, tuple(self._open_paragraphs), False])
+
+    def close(self):
+        super().close()
+        while self._open:
+            self._close(self._open.pop())
+
+
+def _excerpt_from_text(paragraph_texts, all_text, num_sentences):
+    # Get text, trying paragraphs first. If paragraph text is too short or absent,
+    # use all text (figcaptions with filename metadata already removed).
+    if not paragraph_texts or len(" ".join(paragraph_texts).split()) < 15:  # Arbitrary threshold
+        extracted_text = all_text
+    else:
+        extracted_text = " ".join(paragraph_texts)
+
+    # Normalize whitespace
+    extracted_plain_text = _WHITESPACE_RE.sub(' ', extracted_text).strip()
+    if not extracted_plain_text:
+        return ""
+
+    # Remove a leading "filename.ext size KB/MB/GB." left over from an attachment
+    cleaned_text = _FILENAME_SIZE_RE.sub("", extracted_plain_text, count=1).strip()
+    if len(cleaned_text) >= len(extracted_plain_text):
+        cleaned_text = extracted_plain_text
+    if not cleaned_text:
+        return ""
+
+    # Sentence splitting
+    sentences = _SENTENCE_SPLIT_RE.split(cleaned_text)
+    sentences = [s.strip() for s in sentences if s.strip()]
+
+    # Require more than 3 words for a sentence to be "meaningful", and make sure the
+    # sentence itself doesn't re-match the filename pattern if it somehow got through
+    meaningful_sentences = [
+        s for s in sentences
+        if len(s.split()) > 3 and not _FILENAME_SIZE_SENTENCE_RE.fullmatch(s)
+    ]
+
+    if not meaningful_sentences:
+        words = cleaned_text.split()
+        return ' '.join(words[:35])  # Default to 35 words from cleaned text
+
+    return ' '.join(meaningful_sentences[:num_sentences])
+
+
+# A save passes its analysis to the route's helpers, and the flush events that index
+# the same post (search, media references) hit the memo. Only the post being saved needs
+# to stay cached: entries hold the whole HTML plus its text, megabytes for image-heavy posts.
+ANALYSIS_CACHE_SIZE = 4
+
+
+@lru_cache(maxsize=ANALYSIS_CACHE_SIZE)
+def analyze_content(html_content, num_sentences=EXCERPT_SENTENCES):
+    """
+    Parses post HTML once and returns a ContentAnalysis: the excerpt, the first
+    <img> src (None if the first image has no src), all image sources, the
+    visible text (scripts/styles removed, whitespace-normalised) and its word count.
+    Memoised (a few entries), so the ORM events of one save don't re-parse the content.
+    """
+    if not html_content:
+        return ContentAnalysis("", None, (), 0, "")
+
+    parser = _ContentParser()
+    parser.feed(html_content)
+    parser.close()
+
+    paragraphs = [[] for _ in range(parser.paragraph_count)]
+    kept_text = []
+    for text, paragraph_ids, dropped in parser.chunks:
+        if dropped:
+            continue
+        kept_text.append(text)
+        for paragraph_id in paragraph_ids:
+            paragraphs[paragraph_id].append(text)
+
+    text = _WHITESPACE_RE.sub(' ', ' '.join(chunk[0] for chunk in parser.chunks)).strip()
+    excerpt = _excerpt_from_text([' '.join(p) for p in paragraphs], ' '.join(kept_text), num_sentences)
+    return ContentAnalysis(excerpt, parser.first_image_src, tuple(parser.images), len(text.split()), text)
+
+
+def get_text_excerpt(html_content, num_sentences=2):
+    return analyze_content(html_content, num_sentences).excerpt
+
+
+def html_to_text(html_content):
+    """Returns all visible text of a post (scripts and styles removed), whitespace-normalised."""
+    return analyze_content(html_content, EXCERPT_SENTENCES).text
@@ -0,0 +1,50 @@
+# app/database.py
+# Per-connection SQLite tuning.
+#
+# SQLite pragmas (other than journal_mode) only last for the connection that ran
+# them, so they are applied from a SQLAlchemy "connect" event on every new pooled
+# connection. Which pragmas are applied comes from SQLITE_PRAGMAS in config.py;
+# ProductionConfig turns on WAL so gunicorn readers don't block behind admin writes.
+from sqlalchemy import event
+from .extensions import db
+
+# Order matters a little: journal_mode first, since synchronous=NORMAL is only safe with WAL
+_PRAGMA_ORDER = ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store')
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    """Runs `PRAGMA name = value` for each configured pragma on a raw sqlite3 connection."""
+    names = sorted(pragmas, key=lambda name: (_PRAGMA_ORDER.index(name) if name in _PRAGMA_ORDER
+                                              else len(_PRAGMA_ORDER), name))
+    cursor = dbapi_connection.cursor()
+    try:
+        for name in names:
+            value = pragmas[name]
+            if value is None:
+                continue
+            if not name.isidentifier() or not str(value).replace('-', '').isalnum():
+                raise ValueError(f"Invalid SQLite pragma {name}={value!r}")
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+
+def init_database(app):
+    """Registers the pragma hook on the app's engine when it is SQLite and SQLITE_PRAGMAS is set."""
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    if not pragmas:
+        return
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+
+def sqlite_pragma_values(names=_PRAGMA_ORDER):
+    """Current values of the given pragmas on a pooled connection (for checks and the benchmark)."""
+    connection = db.session.connection()
+    return {name: connection.exec_driver_sql(f"PRAGMA {name}").scalar() for name in names}
@@ -0,0 +1,159 @@
+# app/footer_icons.py
+# Footer icon images: optimized when uploaded, and combined into one sprite sheet.
+#
+# Uploaded *_ico.png files are downscaled to FOOTER_ICON_SIZE (twice the 24px they
+# are displayed at, for high-DPI screens), stripped of metadata and recompressed
+# losslessly. `flask optimize-footer-icons` does the same for icons already in static/img/.
+#
+# The footer snapshot (app/cache.py) is rebuilt whenever the footer version changes,
+# and it asks for a sprite of the icons in use. The sprite's name is a hash of those
+# icon files (name, size, mtime), so it is written once per icon set to
+# static/dist/sprites/ and is served with immutable caching (see app/assets.py).
+import hashlib
+import os
+import tempfile
+from collections import namedtuple
+from flask import url_for
+from PIL import Image
+from .thumbnails import MAX_IMAGE_PIXELS
+
+ICON_SUFFIX = '_ico.png'
+SPRITE_DIR = os.path.join('dist', 'sprites')  # Relative to the static folder
+SPRITE_KEEP = 5  # Recent sprites kept: pages rendered before an icon change (in other workers or caches) still use them
+
+
+class FooterSprite(namedtuple('FooterSprite', ['filename', 'cells', 'count'])):
+    """A generated sprite: `cells` maps icon filename -> horizontal cell index."""
+
+    @property
+    def url(self):
+        return url_for('static', filename=f"{SPRITE_DIR.replace(os.sep, '/')}/{self.filename}")
+
+
+def _save_png_atomic(image, path):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        image.save(tmp_path, 'PNG', optimize=True)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _open_icon(path, size):
+    """The icon as RGBA, scaled down (never up) to fit size x size, without metadata."""
+    with Image.open(path) as img:
+        if img.width * img.height > MAX_IMAGE_PIXELS:
+            raise ValueError(f"Icon is {img.width}x{img.height}, which is too large.")
+        icon = img.convert('RGBA')
+    if max(icon.size) > size:
+        icon.thumbnail((size, size), Image.LANCZOS)
+    icon.info = {}  # convert() copies text chunks, dpi and ICC profiles; none are needed at this size
+    return icon
+
+
+def optimize_icon(source_path, destination_path, size):
+    """
+    Writes an optimized copy of source_path to destination_path (which may be the
+    same file). Returns (bytes before, bytes after). Raises on unreadable images.
+    """
+    before = os.path.getsize(source_path)
+    icon = _open_icon(source_path, size)
+    _save_png_atomic(icon, destination_path)
+    return before, os.path.getsize(destination_path)
+
+
+def save_uploaded_icon(file_storage, destination_path, size):
+    """Saves an uploaded icon (a werkzeug FileStorage) to destination_path, optimized."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(destination_path), suffix='.upload')
+    os.close(fd)
+    try:
+        file_storage.save(tmp_path)
+        return optimize_icon(tmp_path, destination_path, size)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def optimize_icon_folder(img_folder, size):
+    """Optimizes every *_ico.png in img_folder in place. Returns [(filename, before, after or error)]."""
+    results = []
+    for filename in sorted(os.listdir(img_folder)):
+        if not filename.lower().endswith(ICON_SUFFIX):
+            continue
+        path = os.path.join(img_folder, filename)
+        try:
+            before, after = optimize_icon(path, path, size)
+            results.append((filename, before, after))
+        except Exception as e:
+            results.append((filename, os.path.getsize(path), f"error: {e}"))
+    return results
+
+
+def _sprite_key(img_folder, icon_filenames, size):
+    digest = hashlib.sha256(str(size).encode())
+    for filename in icon_filenames:
+        stat = os.stat(os.path.join(img_folder, filename))
+        digest.update(f"|{filename}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:12]
+
+
+def build_footer_sprite(static_folder, icon_filenames, size):
+    """
+    Returns the FooterSprite for these icons (in this order, duplicates dropped),
+    writing it if it doesn't exist yet. Icons that can't be read are left out; the
+    footer shows those as plain <img> tags. Returns None if there is nothing to combine.
+    """
+    img_folder = os.path.join(static_folder, 'img')
+    filenames = []
+    for filename in icon_filenames:
+        if filename not in filenames and os.path.isfile(os.path.join(img_folder, filename)):
+            filenames.append(filename)
+    if not filenames:
+        return None
+
+    sprite_folder = os.path.join(static_folder, SPRITE_DIR)
+    os.makedirs(sprite_folder, exist_ok=True)
+    sprite_filename = f"footer.{_sprite_key(img_folder, filenames, size)}.png"
+    sprite_path = os.path.join(sprite_folder, sprite_filename)
+    cells = {}
+    if os.path.exists(sprite_path):
+        # Same key, same icons: the layout is the order they were given in
+        cells = {filename: index for index, filename in enumerate(filenames)}
+        return FooterSprite(sprite_filename, cells, len(filenames))
+
+    icons = []
+    for filename in filenames:
+        try:
+            icons.append((filename, _open_icon(os.path.join(img_folder, filename), size)))
+        except Exception:
+            continue
+    if len(icons) != len(filenames):
+        # Recompute the key over the readable icons only, so the layout stays index == position
+        return build_footer_sprite(static_folder, [filename for filename, _ in icons], size) if icons else None
+
+    sheet = Image.new('RGBA', (size * len(icons), size), (0, 0, 0, 0))
+    for index, (filename, icon) in enumerate(icons):
+        # Centred in its square cell, so non-square icons keep their aspect ratio
+        sheet.paste(icon, (index * size + (size - icon.width) // 2, (size - icon.height) // 2), icon)
+        cells[filename] = index
+    _save_png_atomic(sheet, sprite_path)
+    _prune_sprites(sprite_folder, keep=sprite_filename)
+    return FooterSprite(sprite_filename, cells, len(icons))
+
+
+def _prune_sprites(sprite_folder, keep):
+    sprites = []
+    for filename in os.listdir(sprite_folder):
+        if filename.startswith('footer.') and filename != keep:
+            try:
+                sprites.append((os.path.getmtime(os.path.join(sprite_folder, filename)), filename))
+            except OSError:  # Pruned by another worker meanwhile
+                continue
+    for _, filename in sorted(sprites, reverse=True)[SPRITE_KEEP - 1:]:
+        try:
+            os.remove(os.path.join(sprite_folder, filename))
+        except OSError:
+            pass
@@ -0,0 +1,95 @@
+# app/home_post.py
+# The "exactly one home post" invariant (the post featured on /).
+#
+# It is maintained by the admin write paths (add_post, set_post_category,
+# delete_post) in the same transaction as the change, and backed by the partial
+# unique index ix_post_single_home, so the public index() only ever reads it.
+# `flask check-home-post` reports (and with --repair fixes) existing data.
+from .cache import bump_content_version
+from .extensions import db
+
+HOME_CATEGORY = 'home'
+DEMOTED_CATEGORY = 'blog'  # Where a replaced home post goes
+
+
+def get_home_post(with_content=True):
+    """
+    The current home post, or None if there are no posts. One indexed read.
+    Callers that only check for it or re-categorise it pass with_content=False.
+    """
+    from .models import Post
+    query = Post.query.filter_by(category=HOME_CATEGORY)
+    if not with_content:
+        query = query.options(Post.summary_only())
+    return query.first()
+
+
+def set_home_post(post):
+    """
+    Makes `post` the home post, demoting the current one to DEMOTED_CATEGORY.
+    Returns the demoted post's id (or None). Caller commits.
+    """
+    old_home_post = get_home_post(with_content=False)
+    old_home_post_id = None
+    if old_home_post and old_home_post.id != post.id:
+        old_home_post.category = DEMOTED_CATEGORY
+        old_home_post_id = old_home_post.id
+        # The unit of work orders UPDATEs by primary key, not by when they were made;
+        # write the demotion first so the unique index never sees two home posts
+        db.session.flush()
+    post.category = HOME_CATEGORY
+    db.session.add(post)
+    bump_content_version()
+    return old_home_post_id
+
+
+def ensure_home_post(excluded_post_id=None):
+    """
+    If no post is marked home, promotes the most recent post (preferring one other
+    than `excluded_post_id`, e.g. a post just moved away from home).
+    Returns the promoted post, or None if nothing changed. Caller commits.
+    """
+    from .models import Post
+    db.session.flush()  # Make pending category changes/deletes visible to the queries below
+    if get_home_post(with_content=False) is not None:
+        return None
+
+    query = Post.query.options(Post.summary_only()).order_by(Post.created_at.desc(), Post.id.desc())
+    candidate = None
+    if excluded_post_id is not None:
+        candidate = query.filter(Post.id != excluded_post_id).first()
+    if candidate is None:
+        candidate = query.first()
+    if candidate is None:
+        return None
+
+    candidate.category = HOME_CATEGORY
+    bump_content_version()
+    return candidate
+
+
+def check_home_posts(repair=False):
+    """
+    Verifies the invariant: one home post whenever any post exists. With repair,
+    keeps the newest of several home posts (demoting the rest) or promotes the
+    newest post when there is none, and commits.
+    Returns a dict with 'home_post_ids', 'demoted_ids' and 'promoted_id'.
+    """
+    from .models import Post
+    home_post_ids = [post_id for (post_id,) in db.session.query(Post.id)
+                     .filter(Post.category == HOME_CATEGORY)
+                     .order_by(Post.created_at.desc(), Post.id.desc())]
+    report = {'home_post_ids': home_post_ids, 'demoted_ids': [], 'promoted_id': None}
+    if not repair:
+        return report
+
+    if len(home_post_ids) > 1:
+        report['demoted_ids'] = home_post_ids[1:]
+        Post.query.filter(Post.id.in_(report['demoted_ids'])) \
+            .update({Post.category: DEMOTED_CATEGORY}, synchronize_session=False)
+        bump_content_version()
+    elif not home_post_ids:
+        promoted = ensure_home_post()
+        report['promoted_id'] = promoted.id if promoted else None
+    db.session.commit()
+    return report
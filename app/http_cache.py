@@ -0,0 +1,98 @@
+# app/http_cache.py
+# HTTP validators (ETag / Last-Modified) for the public post pages.
+#
+# Validators are computed from small queries over Post ids and timestamps, so a
+# conditional GET that matches can be answered with 304 before any template renders.
+import hashlib
+from collections import namedtuple
+from datetime import timezone
+from flask import current_app, request, session, abort
+from flask_login import current_user
+from sqlalchemy import func
+from .cache import current_version, FOOTER_VERSION_KEY, CONTENT_VERSION_KEY
+from .extensions import db
+
+Validators = namedtuple('Validators', ['etag', 'last_modified'])
+
+
+def _as_utc(dt):
+    # Timestamps are stored as naive UTC; HTTP dates only have one-second resolution
+    if dt is None:
+        return None
+    return dt.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def _make_validators(parts, last_modified):
+    # Pending flash messages make the page visitor-specific, so skip validation entirely
+    if '_flashes' in session:
+        return None
+    # The footer and the logged-in navigation are part of every page as well
+    parts = list(parts) + [
+        current_version(FOOTER_VERSION_KEY),
+        current_user.get_id() if current_user.is_authenticated else 'anon',
+        request.query_string.decode('latin-1'),
+    ]
+    digest = hashlib.sha1('|'.join(str(p) for p in parts).encode('utf-8')).hexdigest()
+    return Validators(digest, _as_utc(last_modified))
+
+
+def post_validators(post_id):
+    """
+    Returns Validators for a single post page, aborting with 404 if the post doesn't exist.
+    Only the timestamps are read; the content column is not loaded.
+    """
+    from .models import Post
+    row = db.session.query(Post.updated_at, Post.created_at).filter(Post.id == post_id).first()
+    if row is None:
+        abort(404)
+    updated_at = row.updated_at or row.created_at
+    return _make_validators(['post', post_id, updated_at], updated_at)
+
+
+def listing_validators(category, per_page):
+    """
+    Returns Validators for a listing page of `category`, using one aggregate query.
+    Any insert, edit or category change inside the category changes the count,
+    the newest id or the newest update timestamp. Deletions leave no timestamp on
+    the posts themselves, so Last-Modified also considers when the content version
+    stamp (bumped by every admin post write) was last changed.
+    """
+    from .models import Post, SiteConfiguration
+    content_changed_at = db.session.query(SiteConfiguration.updated_at) \
+        .filter(SiteConfiguration.key == CONTENT_VERSION_KEY) \
+        .scalar_subquery()
+    count, last_updated, max_id, content_updated = db.session.query(
+        func.count(Post.id), func.max(Post.updated_at), func.max(Post.id), content_changed_at
+    ).filter(Post.category == category).one()
+    last_modified = max(filter(None, [last_updated, content_updated]), default=None)
+    return _make_validators(['listing', category, per_page, count, max_id, last_updated], last_modified)
+
+
+def not_modified_response(validators):
+    """Returns a 304 response if the request's conditional headers match, otherwise None."""
+    if validators is None or request.method not in ('GET', 'HEAD'):
+        return None
+
+    if request.if_none_match:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2)
+        matched = request.if_none_match.contains_weak(validators.etag)
+    elif request.if_modified_since and validators.last_modified:
+        matched = validators.last_modified <= request.if_modified_since
+    else:
+        matched = False
+
+    if not matched:
+        return None
+    response = current_app.response_class(status=304)
+    return apply_validators(response, validators)
+
+
+def apply_validators(response, validators):
+    """Sets ETag/Last-Modified on a response and asks clients to revalidate before reuse."""
+    if validators is None:
+        return response
+    response.set_etag(validators.etag)
+    if validators.last_modified:
+        response.last_modified = validators.last_modified
+    response.cache_control.no_cache = True
+    return response
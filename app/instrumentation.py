@@ -0,0 +1,101 @@
+# app/instrumentation.py
+# Opt-in per-request timing: SQL query count/time, template render time and total
+# time, reported in a Server-Timing header, plus a log of slow SQL statements.
+#
+# Enabled with SQL_INSTRUMENTATION. The hooks only read perf_counter() and add to
+# a few numbers on flask.g, so they are cheap enough to leave on in production.
+# With only METRICS_ENABLED, the timings are collected for app/metrics.py but no
+# header is sent and nothing is logged.
+import time
+from flask import g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+from .extensions import db
+
+_PARAM_REPR_LIMIT = 200  # Bound parameters are truncated in the slow-query log
+
+
+class RequestTimings:
+    """Accumulated timings for one request, stored on flask.g."""
+    __slots__ = ('started', 'queries', 'db_seconds', 'template_seconds', 'template_started')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_started = None
+
+    def server_timing(self):
+        total_ms = (time.perf_counter() - self.started) * 1000
+        return (f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries", '
+                f'tpl;dur={self.template_seconds * 1000:.1f}, '
+                f'total;dur={total_ms:.1f}')
+
+
+def current_timings():
+    """The RequestTimings of the current request, or None outside a request or when disabled."""
+    if not has_request_context():
+        return None
+    return g.get('_request_timings')
+
+
+def _format_params(parameters):
+    text = repr(parameters)
+    return text if len(text) <= _PARAM_REPR_LIMIT else text[:_PARAM_REPR_LIMIT] + '...'
+
+
+def init_instrumentation(app):
+    """Installs the SQL/template hooks and the Server-Timing response header when SQL_INSTRUMENTATION is on."""
+    report = app.config.get('SQL_INSTRUMENTATION')
+    if not (report or app.config.get('METRICS_ENABLED')):
+        return
+
+    slow_query_seconds = app.config.get('SLOW_QUERY_MS', 100) / 1000
+    log_params = app.config.get('SLOW_QUERY_LOG_PARAMS', True)
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # On the execution context, not the pooled connection: a statement that fails
+        # never reaches after_cursor_execute, and its start time goes away with it
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        timings = current_timings()
+        if timings is not None:
+            timings.queries += 1
+            timings.db_seconds += elapsed
+        if report and elapsed >= slow_query_seconds:
+            endpoint = request.endpoint if has_request_context() else None
+            params = f" params={_format_params(parameters)}" if log_params else ''
+            app.logger.warning(f"Slow query ({elapsed * 1000:.1f} ms, endpoint={endpoint}"
+                               f"{', executemany' if executemany else ''}): {' '.join(statement.split())}{params}")
+
+    def _template_started(sender, template, context, **extra):
+        timings = current_timings()
+        if timings is not None:
+            timings.template_started = time.perf_counter()
+
+    def _template_finished(sender, template, context, **extra):
+        timings = current_timings()
+        if timings is not None and timings.template_started is not None:
+            timings.template_seconds += time.perf_counter() - timings.template_started
+            timings.template_started = None
+
+    # Strong references: the handlers are closures that nothing else keeps alive
+    before_render_template.connect(_template_started, app, weak=False)
+    template_rendered.connect(_template_finished, app, weak=False)
+
+    @app.before_request
+    def _start_request_timings():
+        g._request_timings = RequestTimings()
+
+    @app.after_request
+    def _add_server_timing(response):
+        timings = current_timings()
+        if report and timings is not None:
+            response.headers.add('Server-Timing', timings.server_timing())
+        return response
@@ -1,146 +1,57 @@
 # app/main/routes.py
-from flask import render_template, request, current_app, url_for
+import os
+from flask import render_template, request, current_app, url_for, make_response, abort, send_file, send_from_directory
+from werkzeug.utils import secure_filename
 from . import main
 from app.models import Post
-from app.admin.routes import ensure_home_post_exists # If used
-from ..extensions import db
-from bs4 import BeautifulSoup # For stripping HTML
-import re # For regular expressions (sentence splitting)
-
-def get_text_excerpt(html_content, num_sentences=2):
-    if not html_content:
-        # current_app.logger.debug("get_text_excerpt: HTML content is empty.")
-        return ""
-
-    soup = BeautifulSoup(html_content, 'html.parser')
-
-    # 1. Remove script and style tags
-    for SCRIPT_OR_STYLE_TAG in soup(["script", "style"]):
-        SCRIPT_OR_STYLE_TAG.extract()
-
-    # 2. Attempt to remove Trix figcaptions if they mostly contain filename-like metadata
-    for figcaption in soup.find_all("figcaption"):
-        caption_text = figcaption.get_text(separator=' ', strip=True)
-        # Regex to check if caption text looks like a common image filename, optional size, or just dimensions
-        if re.fullmatch(r'[\w\s\-_\.]+\.(?:jpg|jpeg|png|gif|webp|bmp|tiff|svg|ico|pdf|doc|docx|xls|xlsx|ppt|pptx)'
-                        r'(?:\s+\d{1,7}(?:\.\d{1,2})?\s*(?:KB|MB|GB|B))?\.?', caption_text, re.IGNORECASE) or \
-                re.fullmatch(r'\d{1,4}x\d{1,4}', caption_text) or \
-                len(caption_text.split()) < 4:  # Or if it's very short (e.g., less than 4 words)
-            # current_app.logger.debug(
-            #     f"get_text_excerpt: Removing figcaption likely containing only filename/metadata: '{caption_text}'")
-            figcaption.extract()
-
-    # 3. Get text, trying paragraphs first
-    paragraphs = soup.find_all('p')
-    plain_text_from_tags = []
-    if paragraphs:
-        for p in paragraphs:
-            plain_text_from_tags.append(p.get_text(separator=' ', strip=True))
-
-    # If paragraph text is too short or absent, get all text from the (modified) soup
-    if not plain_text_from_tags or len(" ".join(plain_text_from_tags).split()) < 15:  # Arbitrary threshold
-        # current_app.logger.debug(
-        #     "get_text_excerpt: Text from <p> tags is minimal or absent. Using broader text extraction from modified soup.")
-        # Using the soup that has had figcaptions potentially removed
-        extracted_text_from_soup = soup.get_text(separator=' ', strip=True)
-    else:
-        extracted_text_from_soup = " ".join(plain_text_from_tags)
-
-    # Normalize whitespace
-    extracted_plain_text = re.sub(r'\s+', ' ', extracted_text_from_soup).strip()
-
-    if not extracted_plain_text:
-        # current_app.logger.debug("get_text_excerpt: Plain text is empty after initial extraction and normalization.")
-        return ""
-
-    # current_app.logger.debug(
-    #     f"get_text_excerpt: Plain text BEFORE specific filename/size stripping: \"{extracted_plain_text[:300]}...\"")
-
-    # **4. NEW: Explicitly remove "filename.ext size KB/MB/GB." pattern from the beginning of the text**
-    # This pattern looks for:
-    # - Optional leading spaces/tabs
-    # - Filename (word chars, spaces, hyphens, underscores, periods)
-    # - Common image/doc extension
-    # - Whitespace
-    # - Size (number, optional decimal, KB/MB/GB/bytes/B)
-    # - Optional punctuation after size (.,;)
-    # - Trailing whitespace
-    filename_size_pattern = r"^\s*[\w\s\-_\.]+\.(?:jpg|jpeg|png|gif|webp|bmp|tiff|svg|ico|pdf|doc|docx|xls|xlsx|ppt|pptx)\s+\d{1,7}(?:\.\d{1,2})?\s*(?:KB|MB|GB|bytes|B)\b[\.,;]?\s*"
-
-    # Remove the pattern if it occurs at the beginning of the string
-    cleaned_text = re.sub(filename_size_pattern, "", extracted_plain_text, count=1, flags=re.IGNORECASE).strip()
-
-    if len(cleaned_text) < len(extracted_plain_text):
-        pass
-        #   current_app.logger.debug(f"get_text_excerpt: Plain text AFTER specific filename/size stripping: \"{cleaned_text[:300]}...\"")
-    else:
-        # current_app.logger.debug(
-        #     f"get_text_excerpt: No leading filename/size pattern found, or stripping had no effect on length.")
-        # Ensure cleaned_text is assigned even if no stripping occurred
-        cleaned_text = extracted_plain_text
-
-    if not cleaned_text:
-        # current_app.logger.debug("get_text_excerpt: Plain text is empty after filename/size stripping.")
-        return ""
-
-    # 5. Sentence splitting
-    # Using re.split for potentially better handling of trailing text if last sentence is incomplete.
-    sentences = re.split(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\?|!)\s', cleaned_text)
-    sentences = [s.strip() for s in sentences if s.strip()]
-
-    # 6. Filter for meaningful sentences
-    # Also ensure the sentence itself doesn't re-match the filename pattern if it somehow got through
-    meaningful_sentences = [
-        s for s in sentences
-        if len(s.split()) > 3 and not re.fullmatch(filename_size_pattern.strip('^$\\s*'), s, flags=re.IGNORECASE)
-    ]  # Require more than 3 words for a sentence to be "meaningful"
-    # current_app.logger.debug(
-    #     f"get_text_excerpt: Found {len(meaningful_sentences)} meaningful sentences: {meaningful_sentences[:num_sentences + 1]}")  # Log one more than needed
-
-    if not meaningful_sentences:
-        words = cleaned_text.split()
-        fallback_text = ' '.join(words[:35])  # Default to 35 words from cleaned text
-        # current_app.logger.debug(
-        #     f"get_text_excerpt: No meaningful sentences found, returning word fallback from cleaned text: \"{fallback_text}\"")
-        return fallback_text
-
-    final_excerpt = ' '.join(meaningful_sentences[:num_sentences])
-    # current_app.logger.debug(f"get_text_excerpt: Returning final excerpt: \"{final_excerpt}\"")
-    return final_excerpt
+from app.content import get_text_excerpt, EXCERPT_SENTENCES
+from app.home_post import get_home_post
+from app.page_cache import cached_page
+from app.pagination import paginate_listing
+from app.search import search_available, search_posts
+from app.http_cache import post_validators, listing_validators, not_modified_response, apply_validators
+from app.media import clamp_width, clamp_quality, negotiate_format, get_derivative, is_animated
+
+
+def post_excerpt(post):
+    """
+    Returns the excerpt stored on the post at write time.
+    Rows saved before the excerpt column existed (and not yet backfilled with
+    `flask backfill-excerpts`) fall back to parsing the content on the fly, which
+    loads the content column listings otherwise defer.
+    """
+    if post.excerpt is not None:
+        return post.excerpt
+    return get_text_excerpt(post.content, EXCERPT_SENTENCES)
+
 
 @main.route('/')
 @main.route('/index')
+@cached_page
 def index():
-    # Ensure a home post exists (especially on first run or after all posts were non-home)
-    ensure_home_post_exists()
-
-    home_post = Post.query.filter_by(category='home').order_by(Post.created_at.desc()).first()
-
-    if not home_post:  # Fallback if ensure_home_post_exists didn't find one (e.g., no posts at all)
-        home_post = Post.query.order_by(Post.created_at.desc()).first()
-        if home_post:  # If there is at least one post, make it home
-            home_post.category = 'home'
-            try:
-                db.session.add(home_post)
-                db.session.commit()
-            except Exception as e:
-                db.session.rollback()
-                current_app.logger.error(f"Error setting fallback home post: {e}")
-
+    # Read-only: the admin write paths keep exactly one post marked 'home' (see app/home_post.py)
+    home_post = get_home_post()
     return render_template('main/index.html', title='Home', home_post=home_post)
 
 
 @main.route('/portfolio')
+@cached_page
 def portfolio():
-    page = request.args.get('page', 1, type=int)
-    portfolio_posts_pagination = Post.query.filter_by(category='portfolio') \
-        .order_by(Post.created_at.desc()) \
-        .paginate(page=page, per_page=5)
+    # Answer conditional GETs from one aggregate query, before loading or rendering anything
+    validators = listing_validators('portfolio', 5)
+    not_modified = not_modified_response(validators)
+    if not_modified:
+        return not_modified
+
+    # Offset or keyset pagination, depending on PORTFOLIO_PAGINATION
+    portfolio_posts_pagination = paginate_listing(Post.query.filter_by(category='portfolio')
+                                                  .options(Post.without_content()),
+                                                  Post, 'portfolio', per_page=5)
 
     items_with_details = []
     # current_app.logger.debug("--- Debugging Portfolio Items ---")  # Log separator
     for post_item in portfolio_posts_pagination.items:
-        excerpt_text = get_text_excerpt(post_item.content, 2)
+        excerpt_text = post_excerpt(post_item)
         items_with_details.append({
             'post': post_item,
             'excerpt': excerpt_text
@@ -154,38 +65,102 @@ def portfolio():
     #     )
     # current_app.logger.debug("--- End Debugging Portfolio Items ---")  # Log separator
 
-    return render_template('main/portfolio.html',
-                           title='My Portfolio',
-                           items_pagination=portfolio_posts_pagination,
-                           items_with_details=items_with_details)
+    response = make_response(render_template('main/portfolio.html',
+                                             title='My Portfolio',
+                                             items_pagination=portfolio_posts_pagination,
+                                             items_with_details=items_with_details))
+    return apply_validators(response, validators)
 
 
 @main.route('/blog')
+@cached_page
 def blog():
-    page = request.args.get('page', 1, type=int)
     # You can make items_per_page configurable or keep it fixed
     items_per_page_blog = current_app.config.get('BLOG_ITEMS_PER_PAGE', 5)
 
-    blog_posts_pagination = Post.query.filter_by(category='blog') \
-        .order_by(Post.created_at.desc()) \
-        .paginate(page=page, per_page=items_per_page_blog)  # Consistent pagination object
+    validators = listing_validators('blog', items_per_page_blog)
+    not_modified = not_modified_response(validators)
+    if not_modified:
+        return not_modified
+
+    blog_posts_pagination = paginate_listing(Post.query.filter_by(category='blog').options(Post.without_content()),
+                                             Post, 'blog', per_page=items_per_page_blog)  # Consistent pagination object
 
     items_with_details = []
     for post_item in blog_posts_pagination.items:
-        # Use the same excerpt function as portfolio
-        excerpt_text = get_text_excerpt(post_item.content, 2)  # Adjust num_sentences if needed
+        # Use the same excerpt lookup as portfolio
+        excerpt_text = post_excerpt(post_item)
         items_with_details.append({
             'post': post_item,
             'excerpt': excerpt_text
             # thumbnail_url is already part of post_item if it exists (post_item.thumbnail_url)
         })
 
-    return render_template('main/blog.html',
-                           title='My Blog',
-                           items_pagination=blog_posts_pagination,  # Pass the pagination object
-                           items_with_details=items_with_details)  # Pass the detailed items
+    response = make_response(render_template('main/blog.html',
+                                             title='My Blog',
+                                             items_pagination=blog_posts_pagination,  # Pass the pagination object
+                                             items_with_details=items_with_details))  # Pass the detailed items
+    return apply_validators(response, validators)
 
 @main.route('/post/<int:post_id>')
+@cached_page
 def view_post(post_id):
+    # Validators only need the id and timestamps, so a 304 never loads the content column
+    validators = post_validators(post_id)
+    not_modified = not_modified_response(validators)
+    if not_modified:
+        return not_modified
+
     post = Post.query.get_or_404(post_id)
-    return render_template('main/view_post.html', title=post.title, post=post)
+    response = make_response(render_template('main/view_post.html', title=post.title, post=post))
+    return apply_validators(response, validators)
+
+
+@main.route('/search')
+@cached_page
+def search():
+    query = request.args.get('q', '', type=str).strip()
+    page = request.args.get('page', 1, type=int)
+    per_page = current_app.config.get('SEARCH_RESULTS_PER_PAGE', 10)
+
+    available = search_available()
+    results = search_posts(query, page=page, per_page=per_page) if (available and query) else None
+    return render_template('main/search.html',
+                           title='Search',
+                           query=query,
+                           search_available=available,
+                           results=results)
+
+
+@main.route('/media/<filename>')
+def media(filename):
+    """
+    Serves an uploaded image resized to ?w= (and re-encoded at ?q=), both snapped to
+    the configured allow-lists. Derivatives are rendered once and cached on disk.
+    """
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if filename != secure_filename(filename) or extension not in current_app.config['MEDIA_EXTENSIONS']:
+        abort(404)
+
+    max_age = current_app.config.get('MEDIA_MAX_AGE', 86400)
+    if extension == 'gif' and is_animated(filename):
+        # Resizing would drop the animation, so animated GIFs are served as uploaded
+        return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename, max_age=max_age)
+
+    width = clamp_width(request.args.get('w', type=int))
+    quality = clamp_quality(request.args.get('q', type=int))
+    negotiated = negotiate_format(extension)
+    try:
+        derivative = get_derivative(filename, width, quality, negotiated)
+    except (OSError, ValueError) as e:  # Corrupt (UnidentifiedImageError) or over UPLOAD_MAX_PIXELS
+        current_app.logger.error(f"media: Could not render {filename} at {width}px: {e}")
+        abort(404)
+    if derivative is None:
+        abort(404)
+
+    path, mimetype, source_mtime = derivative
+    # Cache hits refresh the file's mtime (for LRU), so validators come from the cache key and source instead
+    response = send_file(path, mimetype=mimetype, max_age=max_age, conditional=True,
+                         etag=os.path.basename(path), last_modified=source_mtime)
+    response.vary.add('Accept')  # WebP or not depends on the Accept header
+    return response
@@ -0,0 +1,260 @@
+# app/media.py
+# On-demand resized copies ("derivatives") of uploaded images, served from /media/<name>.
+#
+# `?w=` and `?q=` are snapped to the MEDIA_WIDTHS / MEDIA_QUALITIES allow-lists, so
+# only a small, fixed set of derivatives can exist per image. Each one is rendered
+# once and kept in MEDIA_CACHE_DIR, which is shared by all workers and pruned
+# oldest-first (by mtime, refreshed on every hit) once it grows past MEDIA_CACHE_MAX_BYTES.
+# Clients that send `Accept: image/webp` get WebP; everyone else gets the original format.
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from flask import current_app, request, url_for
+from markupsafe import Markup
+from PIL import Image, ImageOps
+from .media_library import upload_filename
+from .metrics import inc_counter
+from .thumbnails import MAX_IMAGE_PIXELS
+
+# Output format per source extension for clients that don't accept WebP
+_FALLBACK_FORMATS = {
+    'jpg': ('JPEG', 'image/jpeg', 'jpg'),
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg'),
+    'png': ('PNG', 'image/png', 'png'),
+    'gif': ('PNG', 'image/png', 'png'),  # Static GIFs are re-encoded as PNG
+}
+_WEBP = ('WEBP', 'image/webp', 'webp')
+
+_IMG_SRC_RE = re.compile(r'(<img\b[^>]*?\bsrc=)(["\'])(.*?)\2', re.IGNORECASE)
+
+
+class DerivativeCache:
+    """Directory of rendered derivatives with approximate LRU eviction, like FileSystemBackend in page_cache.py."""
+
+    PRUNE_EVERY = 20  # Stores between directory size checks
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._stores_since_prune = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key, extension):
+        return os.path.join(self.directory, f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.{extension}")
+
+    def lookup(self, path):
+        try:
+            os.utime(path, None)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, path, render):
+        """Calls render(file_object) into a temp file and renames it into place atomically."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                render(f)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            self._stores_since_prune += 1
+            prune = self._stores_since_prune >= self.PRUNE_EVERY
+            if prune:
+                self._stores_since_prune = 0
+        if prune:
+            self.prune()
+
+    def _files(self):
+        files = []
+        with os.scandir(self.directory) as it:
+            for dir_entry in it:
+                if dir_entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = dir_entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, dir_entry.path))
+        return files
+
+    def prune(self):
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(files):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.evictions += 1
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        files = self._files()
+        lookups = self.hits + self.misses
+        return {
+            'pid': os.getpid(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'entries': len(files),
+            'bytes': sum(size for _, size, _ in files),
+            'max_bytes': self.max_bytes,
+            'directory': self.directory,
+        }
+
+
+def init_media(app):
+    """Creates the derivative cache and registers the responsive_images template filter."""
+    app.extensions['media_cache'] = DerivativeCache(app.config['MEDIA_CACHE_DIR'],
+                                                    app.config.get('MEDIA_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    app.add_template_filter(responsive_images, 'responsive_images')
+
+
+def get_media_cache():
+    return current_app.extensions['media_cache']
+
+
+def media_cache_stats():
+    return get_media_cache().stats()
+
+
+def clamp_width(width):
+    """Snaps a requested width up to the next allowed one (or the largest); None means the default."""
+    widths = sorted(current_app.config['MEDIA_WIDTHS'])
+    if not width or width <= 0:
+        return current_app.config.get('MEDIA_DEFAULT_WIDTH', widths[-1])
+    return next((w for w in widths if w >= width), widths[-1])
+
+
+def clamp_quality(quality):
+    """Snaps a requested quality to the nearest allowed one; None means the default."""
+    qualities = current_app.config['MEDIA_QUALITIES']
+    if not quality:
+        return current_app.config.get('MEDIA_DEFAULT_QUALITY', 80)
+    return min(qualities, key=lambda q: (abs(q - quality), q))
+
+
+def negotiate_format(extension):
+    """
+    Picks WebP when the client's Accept header names image/webp, otherwise the source's
+    own format. Wildcards don't count: older browsers, curl and most bots send */* or
+    image/* without being able to decode WebP.
+    """
+    if any(value.lower() == 'image/webp' and quality > 0 for value, quality in request.accept_mimetypes):
+        return _WEBP
+    return _FALLBACK_FORMATS[extension]
+
+
+def render_derivative(source_path, out_file, width, quality, pil_format, max_pixels):
+    """Writes source_path scaled down to `width` pixels wide (never upscaled) to out_file."""
+    with Image.open(source_path) as img:
+        if img.width * img.height > max_pixels:
+            raise ValueError(f"{source_path} is {img.width}x{img.height}, over the {max_pixels} pixel limit")
+        if img.format == 'JPEG':
+            # Let libjpeg decode at a reduced scale; much faster and lighter for large photos.
+            # Both sides stay >= width, so an EXIF rotation below can't leave it too narrow.
+            img.draft('RGB', (width, width))
+        img = ImageOps.exif_transpose(img)
+        if img.width > width:
+            img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+
+        if pil_format == 'JPEG' and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        elif img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            img = img.convert('RGBA')
+
+        options = {'optimize': True}
+        if pil_format in ('JPEG', 'WEBP'):
+            options['quality'] = quality
+        if pil_format == 'JPEG':
+            options['progressive'] = True
+        if pil_format == 'WEBP':
+            options['method'] = 4
+        img.save(out_file, pil_format, **options)
+
+
+def get_derivative(filename, width, quality, negotiated):
+    """
+    Returns (path, mimetype, source mtime) of the derivative for an upload, rendering it on a
+    cache miss. Returns None when the source image doesn't exist. The key includes
+    the source's size and mtime, so replacing an upload yields fresh derivatives.
+    """
+    source_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+    try:
+        source_stat = os.stat(source_path)
+    except OSError:
+        return None
+
+    pil_format, mimetype, extension = negotiated
+    cache = get_media_cache()
+    key = f"{filename}|{source_stat.st_size}|{source_stat.st_mtime_ns}|{width}|{quality}|{pil_format}"
+    path = cache.path_for(key, extension)
+    hit = cache.lookup(path)
+    inc_counter('media_cache_requests_total', result='hit' if hit else 'miss')
+    if not hit:
+        max_pixels = current_app.config.get('UPLOAD_MAX_PIXELS', MAX_IMAGE_PIXELS)
+        cache.store(path, lambda f: render_derivative(source_path, f, width, quality, pil_format, max_pixels))
+    return path, mimetype, source_stat.st_mtime
+
+
+def is_animated(filename):
+    try:
+        with Image.open(os.path.join(current_app.config['UPLOAD_FOLDER'], filename)) as img:
+            return getattr(img, 'is_animated', False)
+    except OSError:
+        return False
+
+
+def _media_filename(src):
+    """Returns the upload filename if `src` points at an upload /media/ can resize, otherwise None."""
+    filename = upload_filename(src)
+    if filename is None or filename.rsplit('.', 1)[-1].lower() not in _FALLBACK_FORMATS:
+        return None
+    return filename
+
+
+def responsive_images(html):
+    """
+    Template filter for post bodies: points <img> tags for uploads at /media/
+    with a srcset over MEDIA_WIDTHS, so browsers download a size that fits the
+    column instead of the full-size original. Other images are left alone.
+    """
+    if not html or not current_app.config.get('MEDIA_RESPONSIVE_IMAGES', True):
+        return Markup(html or '')
+
+    widths = sorted(current_app.config['MEDIA_WIDTHS'])
+    sizes = current_app.config.get('MEDIA_IMG_SIZES', '100vw')
+
+    def rewrite(match):
+        filename = _media_filename(match.group(3))
+        if filename is None:
+            return match.group(0)
+        quote = match.group(2)
+        default_src = url_for('main.media', filename=filename)
+        srcset = ', '.join(f"{url_for('main.media', filename=filename, w=w)} {w}w" for w in widths)
+        return (f'{match.group(1)}{quote}{default_src}{quote} srcset={quote}{srcset}{quote} '
+                f'sizes={quote}{sizes}{quote} loading={quote}lazy{quote}')
+
+    return Markup(_IMG_SRC_RE.sub(rewrite, str(html)))
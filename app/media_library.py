@@ -0,0 +1,260 @@
+# app/media_library.py
+# Index of the image files the site serves from disk (MediaAsset), so request paths
+# ask the database what exists instead of probing the filesystem.
+#
+# Two kinds of files are indexed: Trix uploads in UPLOAD_FOLDER ('upload') and footer
+# icons in static/img ('footer_icon'). Each row records the file's SHA-256, size,
+# dimensions, MIME type and derived variants (an upload's thumbnail, once it exists).
+# The upload routes index what they save, thumbnail jobs record their results, and
+# `flask index-media` indexes what was already on disk (and drops rows of files that
+# are gone). Uploads saved before the index existed are indexed the first time a post
+# uses them. The footer pages rescan static/img whenever its mtime changes, so icons
+# copied there by hand are picked up without running index-media.
+#
+# post_media holds the upload filenames each post's content references. Post events
+# keep it in sync, the same way app/search.py keeps the search index in sync; bulk
+# statements fire no events, so their callers (app/batch.py, app/post_transfer.py) call
+# link_posts/unlink_posts themselves.
+import hashlib
+import mimetypes
+import os
+from datetime import datetime
+from urllib.parse import urlparse
+from flask import current_app
+from PIL import Image
+from sqlalchemy import bindparam, delete, event, inspect, insert, select
+from .content import analyze_content, EXCERPT_SENTENCES
+from .extensions import db
+from .footer_icons import ICON_SUFFIX
+from .models import MediaAsset, Post, post_media
+from .thumbnails import IMAGE_EXTENSIONS, is_thumbnail, thumbnail_filename
+
+KIND_UPLOAD = 'upload'
+KIND_FOOTER_ICON = 'footer_icon'
+THUMBNAIL_VARIANT = 'thumbnail'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_scanned_folder_mtimes = {}  # Folder -> its st_mtime_ns when this process last scanned it
+_NOT_SCANNED = object()
+
+
+def _folder(kind):
+    if kind == KIND_UPLOAD:
+        return current_app.config['UPLOAD_FOLDER']
+    return os.path.join(current_app.static_folder, 'img')
+
+
+def _is_indexed_file(kind, filename):
+    if kind == KIND_FOOTER_ICON:
+        return filename.lower().endswith(ICON_SUFFIX)
+    return filename.rsplit('.', 1)[-1].lower() in IMAGE_EXTENSIONS and not is_thumbnail(filename)
+
+
+def describe_file(path, content_hash=None):
+    """Column values for the file at path. Pass content_hash if it was computed while writing the file."""
+    if content_hash is None:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+    width = height = mime_type = None
+    try:
+        with Image.open(path) as img:  # Header only
+            width, height = img.size
+            mime_type = Image.MIME.get(img.format)
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        pass
+    return {'content_hash': content_hash, 'byte_size': os.path.getsize(path), 'width': width, 'height': height,
+            'mime_type': mime_type or mimetypes.guess_type(path)[0]}
+
+
+def get_asset(kind, filename):
+    return MediaAsset.query.filter_by(kind=kind, filename=filename).first()
+
+
+def record_file(kind, filename, content_hash=None, variants=None):
+    """
+    Indexes (or re-indexes) a file that was just written to its folder. A file whose
+    content changed loses its variants, which were derived from the old content;
+    pass `variants` to set them. Caller commits. Returns the MediaAsset.
+    """
+    values = describe_file(os.path.join(_folder(kind), filename), content_hash)
+    asset = get_asset(kind, filename)
+    if asset is None:
+        asset = MediaAsset(kind=kind, filename=filename, variants={})
+        db.session.add(asset)
+    elif asset.content_hash != values['content_hash']:
+        asset.variants = {}
+    for key, value in values.items():
+        setattr(asset, key, value)
+    asset.updated_at = datetime.utcnow()  # When the file was last read; scan_folder compares it to the mtime
+    if variants is not None:
+        asset.variants = dict(variants)
+    return asset
+
+
+def find_upload(filename):
+    """
+    The MediaAsset of an upload. An upload from before the index existed is indexed
+    now (with its thumbnail, if one is on disk); returns None if there is no such file.
+    """
+    asset = get_asset(KIND_UPLOAD, filename)
+    if asset is not None:
+        return asset
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    if not os.path.isfile(os.path.join(upload_folder, filename)):
+        return None
+    thumb_filename = thumbnail_filename(filename)
+    has_thumbnail = os.path.isfile(os.path.join(upload_folder, thumb_filename))
+    return record_file(KIND_UPLOAD, filename, variants={THUMBNAIL_VARIANT: thumb_filename} if has_thumbnail else {})
+
+
+def set_variant(filename, variant, variant_filename):
+    """Records (or, with variant_filename None, forgets) a derived file of an upload. Caller commits."""
+    asset = find_upload(filename)
+    if asset is None:
+        return None
+    variants = dict(asset.variants or {})  # Reassigned, so the JSON column sees the change
+    if variant_filename is None:
+        variants.pop(variant, None)
+    else:
+        variants[variant] = variant_filename
+    asset.variants = variants
+    return asset
+
+
+def footer_icon_filenames():
+    """
+    Sorted filenames of the footer icons in static/img, from the index. The folder is
+    rescanned when its mtime differs from this process's last scan, so icons copied in
+    (or deleted) by hand show up as they did with a plain listing; that is one stat()
+    per call, and a commit only when the scan changed the index.
+    """
+    folder = _folder(KIND_FOOTER_ICON)
+    try:
+        folder_mtime = os.stat(folder).st_mtime_ns
+    except FileNotFoundError:
+        folder_mtime = None
+    if _scanned_folder_mtimes.get(folder, _NOT_SCANNED) != folder_mtime:
+        stats = scan_folder(KIND_FOOTER_ICON)
+        if stats['indexed'] or stats['removed']:
+            db.session.commit()
+        _scanned_folder_mtimes[folder] = folder_mtime
+    return [filename for (filename,) in db.session.query(MediaAsset.filename)
+            .filter(MediaAsset.kind == KIND_FOOTER_ICON).order_by(MediaAsset.filename)]
+
+
+def scan_folder(kind, prune=True, progress=None):
+    """
+    Indexes the files of one kind on disk. Files whose size is unchanged and that were
+    not modified since they were indexed are not re-hashed. With prune, rows of files
+    that no longer exist are deleted. Caller commits. Returns counts.
+    """
+    folder = _folder(kind)
+    stats = {'indexed': 0, 'unchanged': 0, 'removed': 0}
+    known = {asset.filename: asset for asset in MediaAsset.query.filter_by(kind=kind)}
+    on_disk = set()
+    entries = sorted(os.scandir(folder), key=lambda entry: entry.name) if os.path.isdir(folder) else []
+    names = {entry.name for entry in entries}
+    for entry in entries:
+        if not entry.is_file() or not _is_indexed_file(kind, entry.name):
+            continue
+        on_disk.add(entry.name)
+        asset = known.get(entry.name)
+        stat = entry.stat()
+        variants = None
+        if kind == KIND_UPLOAD:
+            thumb_filename = thumbnail_filename(entry.name)
+            variants = {THUMBNAIL_VARIANT: thumb_filename} if thumb_filename in names else {}
+        if (asset is not None and asset.byte_size == stat.st_size and asset.updated_at
+                and asset.updated_at >= datetime.utcfromtimestamp(stat.st_mtime)):
+            if variants is not None and variants != asset.variants:
+                asset.variants = variants
+            stats['unchanged'] += 1
+        else:
+            record_file(kind, entry.name, variants=variants)
+            stats['indexed'] += 1
+        if progress:
+            progress(kind, len(on_disk))
+    if prune:
+        gone = [asset.id for filename, asset in known.items() if filename not in on_disk]
+        if gone:
+            db.session.execute(delete(MediaAsset).where(MediaAsset.id.in_(gone)))
+            stats['removed'] = len(gone)
+    return stats
+
+
+# --- Which posts use which uploads --------------------------------------------
+
+def upload_filename(src):
+    """The upload filename an <img> src points at, or None for images from elsewhere."""
+    media_url = current_app.config.get('MEDIA_FILES_URL', '/static/media_files/')
+    path = urlparse(src).path
+    if not path.startswith(media_url):
+        return None
+    filename = path[len(media_url):]
+    return filename if filename and '/' not in filename else None
+
+
+def referenced_uploads(image_srcs):
+    return sorted({filename for filename in map(upload_filename, image_srcs) if filename})
+
+
+def link_posts(connection, post_images):
+    """Replaces the post_media rows of the given posts. post_images: [(post id, <img> srcs)]."""
+    if not post_images:
+        return
+    connection.execute(delete(post_media).where(post_media.c.post_id.in_(bindparam('ids', expanding=True))),
+                       {'ids': [post_id for post_id, _ in post_images]})
+    rows = [{'post_id': post_id, 'filename': filename}
+            for post_id, image_srcs in post_images for filename in referenced_uploads(image_srcs)]
+    if rows:
+        connection.execute(insert(post_media), rows)
+
+
+def unlink_posts(connection, post_ids):
+    """Drops post_media rows of deleted posts (SQLite doesn't enforce the cascade by default)."""
+    if post_ids:
+        connection.execute(delete(post_media).where(post_media.c.post_id.in_(bindparam('ids', expanding=True))),
+                           {'ids': list(post_ids)})
+
+
+def relink_all_posts(batch_size=200):
+    """Rebuilds post_media from every post's content, reading posts in primary-key batches."""
+    connection = db.session.connection()
+    connection.execute(delete(post_media))
+    last_id, linked = 0, 0
+    while True:
+        rows = connection.execute(
+            select(Post.id, Post.content).where(Post.id > last_id).order_by(Post.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return linked
+        link_posts(connection, [(row.id, analyze_content(row.content, EXCERPT_SENTENCES).images) for row in rows])
+        linked += len(rows)
+        last_id = rows[-1].id
+
+
+@event.listens_for(Post, 'after_insert')
+def _link_new_post(mapper, connection, target):
+    link_posts(connection, [(target.id, analyze_content(target.content, EXCERPT_SENTENCES).images)])
+
+
+@event.listens_for(Post, 'after_update')
+def _relink_post(mapper, connection, target):
+    if inspect(target).attrs.content.history.has_changes():
+        link_posts(connection, [(target.id, analyze_content(target.content, EXCERPT_SENTENCES).images)])
+
+
+@event.listens_for(Post, 'after_delete')
+def _unlink_post(mapper, connection, target):
+    unlink_posts(connection, [target.id])
+
+
+def scan_media(prune=True, progress=None):
+    """`flask index-media`: indexes uploads and footer icons and rebuilds post_media. Commits."""
+    stats = {kind: scan_folder(kind, prune=prune, progress=progress) for kind in (KIND_UPLOAD, KIND_FOOTER_ICON)}
+    stats['posts_linked'] = relink_all_posts()
+    db.session.commit()
+    return stats
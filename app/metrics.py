@@ -0,0 +1,238 @@
+# app/metrics.py
+# Prometheus-style metrics, aggregated across gunicorn workers without a
+# Prometheus client library.
+#
+# Each process keeps its counters and histograms in memory and periodically writes
+# them to METRICS_DIR/metrics-<pid>.json (atomic rename). /admin/metrics (or
+# `flask show-metrics`) sums every file in the directory and renders the text
+# exposition format. Files of exited workers are kept so counters never go
+# backwards; clear METRICS_DIR when the service is (re)deployed.
+import atexit
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from flask import current_app, g, has_app_context, request
+
+# name -> (type, help text, histogram bucket upper bounds)
+METRICS = {
+    'http_requests_total': ('counter', 'HTTP requests by endpoint, method and status code.', None),
+    'http_request_duration_seconds': ('histogram', 'Request latency by endpoint.',
+                                      (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)),
+    'http_response_size_bytes': ('histogram', 'Response body size by endpoint.',
+                                 (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)),
+    'db_queries_per_request': ('histogram', 'SQL statements issued per request, by endpoint.',
+                               (0, 1, 2, 3, 5, 8, 13, 21, 50)),
+    'db_query_seconds_total': ('counter', 'Time spent in SQL statements, by endpoint.', None),
+    'page_cache_requests_total': ('counter', 'Page cache lookups by result (hit or miss).', None),
+    'media_cache_requests_total': ('counter', 'Resized image cache lookups by result (hit or miss).', None),
+    'thumbnail_duration_seconds': ('histogram', 'Thumbnail generation time by outcome.',
+                                   (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)),
+    'compression_responses_total': ('counter', 'Responses compressed, by encoding.', None),
+    'compression_bytes_in_total': ('counter', 'Response bytes before compression, by encoding.', None),
+    'compression_bytes_out_total': ('counter', 'Response bytes after compression, by encoding.', None),
+    'compression_cpu_seconds_total': ('counter', 'CPU time spent compressing responses, by encoding.', None),
+    'upload_bytes_total': ('counter', 'Bytes received in uploaded files, by kind.', None),
+    'upload_size_bytes': ('histogram', 'Uploaded file size, by kind.',
+                          (65536, 262144, 1048576, 4194304, 8388608, 16777216, 33554432)),
+}
+
+
+class MetricsRegistry:
+    """This process's metric values plus the shared directory they are flushed to."""
+
+    def __init__(self, directory, flush_seconds):
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._counters = {}    # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self._last_flush = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def _check_pid(self):
+        # After a fork the inherited values belong to the parent's file; start fresh
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._counters = {}
+            self._histograms = {}
+            self._last_flush = 0.0
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_pid()
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_pid()
+            values = self._histograms.get(key)
+            if values is None:
+                values = self._histograms[key] = [0] * (len(buckets) + 2)
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    values[index] += 1
+                    break
+            else:
+                values[len(buckets)] += 1
+            values[-1] += value
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f'metrics-{pid}.json')
+
+    def flush(self, force=False):
+        """Writes this process's values to its file (at most every flush_seconds unless forced)."""
+        now = time.monotonic()
+        with self._lock:
+            self._check_pid()
+            if not force and now - self._last_flush < self.flush_seconds:
+                return
+            if not self._counters and not self._histograms:
+                return  # Nothing recorded (e.g. a CLI process); don't leave an empty file behind
+            self._last_flush = now
+            snapshot = {
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), values] for (name, labels), values in self._histograms.items()],
+            }
+            pid = self._pid
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self._path(pid))
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def collect(self):
+        """Sums the files of every process (flushing this one first). Returns (counters, histograms)."""
+        self.flush(force=True)
+        counters, histograms = {}, {}
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith('metrics-') and filename.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in snapshot.get('counters', []):
+                key = (name, tuple(tuple(pair) for pair in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, values in snapshot.get('histograms', []):
+                if name not in METRICS or len(values) != len(METRICS[name][2]) + 2:
+                    continue  # Written with different buckets by an older release
+                key = (name, tuple(tuple(pair) for pair in labels))
+                merged = histograms.setdefault(key, [0] * len(values))
+                for index, value in enumerate(values):
+                    merged[index] += value
+        return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf'
+        return repr(round(value, 6))
+    return str(value)
+
+
+def render_metrics(registry):
+    """Returns all metrics, summed across processes, in the Prometheus text exposition format."""
+    counters, histograms = registry.collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+            continue
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(list(buckets) + [float('inf')], values[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels + (("le", _number(float(bound))),))} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(float(values[-1]))}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def get_registry():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('metrics')
+
+
+def inc_counter(name, amount=1, **labels):
+    """Adds to a counter; a no-op when metrics are disabled or outside an app context."""
+    registry = get_registry()
+    if registry is not None:
+        registry.inc(name, labels, amount)
+
+
+def observe(name, value, **labels):
+    """Records a histogram observation; a no-op when metrics are disabled or outside an app context."""
+    registry = get_registry()
+    if registry is not None:
+        registry.observe(name, labels, value)
+
+
+def init_metrics(app):
+    """Creates the registry (app.extensions['metrics']) and the per-request hooks when METRICS_ENABLED is on."""
+    if not app.config.get('METRICS_ENABLED'):
+        app.extensions['metrics'] = None
+        return None
+
+    registry = MetricsRegistry(app.config['METRICS_DIR'], app.config.get('METRICS_FLUSH_SECONDS', 5))
+    app.extensions['metrics'] = registry
+    atexit.register(registry.flush, force=True)
+
+    @app.before_request
+    def _start_metrics_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request_metrics(response):
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return response
+        # Unmatched URLs have no endpoint; group them so random 404 paths can't create new series
+        endpoint = request.endpoint or 'unmatched'
+        registry.observe('http_request_duration_seconds', {'endpoint': endpoint}, time.perf_counter() - started)
+        registry.inc('http_requests_total', {'endpoint': endpoint, 'method': request.method,
+                                             'status': str(response.status_code)})
+        if response.content_length is not None:
+            registry.observe('http_response_size_bytes', {'endpoint': endpoint}, response.content_length)
+
+        from .instrumentation import current_timings
+        timings = current_timings()
+        if timings is not None:
+            registry.observe('db_queries_per_request', {'endpoint': endpoint}, timings.queries)
+            registry.inc('db_query_seconds_total', {'endpoint': endpoint}, timings.db_seconds)
+        registry.flush()
+        return response
+
+    return registry
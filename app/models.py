@@ -1,5 +1,6 @@
 from .extensions import db
 from datetime import datetime
+from sqlalchemy.orm import defer, load_only
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin # Import UserMixin
 from .extensions import login_manager # Assuming login_manager is initialized in extensions
@@ -32,24 +33,55 @@ class Post(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(150), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
-    category = db.Column(db.String(50), nullable=False, default='blog', index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Used for ETag/Last-Modified
+    category = db.Column(db.String(50), nullable=False, default='blog')
 
     # New fields
     first_image_url = db.Column(db.String(255), nullable=True)  # To store URL of the first image in post
     thumbnail_url = db.Column(db.String(255), nullable=True)  # To store URL of the generated thumbnail
 
-    # excerpt = db.Column(db.Text, nullable=True) # Optional: for a manually/auto-generated excerpt
+    excerpt = db.Column(db.Text, nullable=True)  # Plain-text excerpt generated from content when the post is saved
+
+    __table_args__ = (
+        # At most one post may be the home post (partial unique index; see app/home_post.py)
+        db.Index('ix_post_single_home', 'category', unique=True,
+                 sqlite_where=db.text("category = 'home'"),
+                 postgresql_where=db.text("category = 'home'")),
+        # Listings filter on category and sort newest first (created_at DESC, id DESC): walked
+        # backwards, this index returns a page without sorting. updated_at makes the
+        # listing validators' count/max query covering (see app/http_cache.py).
+        db.Index('ix_post_category_created_at', 'category', 'created_at', 'id', 'updated_at'),
+        # The admin dashboard and the home-post fallback sort all posts the same way
+        db.Index('ix_post_created_at_id', 'created_at', 'id'),
+        # Posts still waiting for their thumbnail (app/thumbnails.py); usually none
+        db.Index('ix_post_missing_thumbnail', 'first_image_url',
+                 sqlite_where=db.text('thumbnail_url IS NULL'),
+                 postgresql_where=db.text('thumbnail_url IS NULL')),
+    )
 
     def __repr__(self):
         return f'<Post {self.title}>'
 
+    # Loader options for queries that list posts. `content` holds the full Trix HTML
+    # (megabytes for image-heavy posts), so only views that render it should read it;
+    # a deferred column is still loaded, with its own SELECT, if it is accessed.
+    @classmethod
+    def without_content(cls):
+        """Every column except content: public listings (titles, dates, thumbnails, excerpts)."""
+        return defer(cls.content)
+
+    @classmethod
+    def summary_only(cls):
+        """Just id, title, category and timestamps: admin tables and home-post bookkeeping."""
+        return load_only(cls.id, cls.title, cls.category, cls.created_at, cls.updated_at)
+
 class FooterIcon(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     icon_filename = db.Column(db.String(200), nullable=False) # e.g., 'facebook_ico.png'
     click_url = db.Column(db.String(500), nullable=False)
-    order = db.Column(db.Integer, default=0) # For ordering
+    order = db.Column(db.Integer, default=0, index=True) # For ordering
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def __repr__(self):
@@ -71,3 +103,56 @@ class SiteConfiguration(db.Model):
     def __repr__(self):
         return f'<SiteConfiguration {self.key}>'
 
+
+# Upload filenames each post's content references (kept in sync by app/media_library.py).
+# Keyed by filename rather than asset id, so a post can reference a file before it is indexed.
+post_media = db.Table(
+    'post_media',
+    db.Column('post_id', db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('filename', db.String(255), primary_key=True, index=True),
+)
+
+
+class MediaAsset(db.Model):
+    """An image the site serves from disk: a Trix upload or a footer icon (see app/media_library.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'upload' (UPLOAD_FOLDER) or 'footer_icon' (static/img)
+    filename = db.Column(db.String(255), nullable=False)  # e.g., 'photo.jpg'
+    content_hash = db.Column(db.String(64), nullable=False)  # SHA-256 of the file
+    byte_size = db.Column(db.Integer, nullable=False)
+    width = db.Column(db.Integer, nullable=True)  # None if Pillow can't read the file
+    height = db.Column(db.Integer, nullable=True)
+    mime_type = db.Column(db.String(50), nullable=True)
+    variants = db.Column(db.JSON, nullable=False, default=dict)  # Derived files, e.g. {'thumbnail': 'photo_thumb.jpg'}
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Lookups are by (kind, filename); walking it in order also lists a kind's files sorted
+        db.UniqueConstraint('kind', 'filename', name='uq_media_asset_kind_filename'),
+    )
+
+    def __repr__(self):
+        return f'<MediaAsset {self.kind} {self.filename}>'
+
+    def referencing_posts(self):
+        """Query for the posts whose content uses this upload (none, for footer icons)."""
+        if self.kind != 'upload':
+            return Post.query.filter(db.false())
+        return Post.query.join(post_media, post_media.c.post_id == Post.id) \
+            .filter(post_media.c.filename == self.filename)
+
+
+class ThumbnailJob(db.Model):
+    """Persisted status of a background thumbnail generation job (one per uploaded image)."""
+    id = db.Column(db.Integer, primary_key=True)
+    source_filename = db.Column(db.String(255), unique=True, nullable=False, index=True)  # e.g., 'photo.jpg'
+    thumb_filename = db.Column(db.String(255), nullable=False)  # e.g., 'photo_thumb.jpg'
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'done' or 'failed'
+    error = db.Column(db.Text, nullable=True)
+    duration_ms = db.Column(db.Float, nullable=True)  # Time spent generating the thumbnail
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<ThumbnailJob {self.source_filename} {self.status}>'
@@ -0,0 +1,256 @@
+# app/page_cache.py
+# Opt-in full-response cache for the public pages.
+#
+# Only anonymous GET requests are cached. Keys include the global content version
+# (see app/cache.py), which every Post/footer write in admin/routes.py bumps. The worker
+# that handled the write drops its copy of the version at once; other workers re-read it
+# at most every VERSION_CHECK_SECONDS (5 by default), so they may serve the old page for
+# up to that long after a change.
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, session, make_response
+from flask_login import current_user
+from .cache import current_version, CONTENT_VERSION_KEY
+from .metrics import inc_counter
+
+# Headers that must never be replayed to a different visitor
+_UNCACHEABLE_HEADERS = {'set-cookie', 'vary'}
+
+
+class PageCacheStats:
+    """Simple per-process counters, read by /admin/cache_stats."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def as_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            'pid': os.getpid(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class MemoryBackend:
+    """Per-worker LRU cache bounded by the total size of the stored bodies."""
+
+    def __init__(self, max_bytes, stats):
+        self.max_bytes = max_bytes
+        self.stats = stats
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        size = len(entry[2])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[2])
+            self._entries[key] = entry
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted[2])
+                self.stats.incr('evictions')
+
+    def usage(self):
+        return {'backend': 'memory', 'entries': len(self._entries), 'bytes': self._size, 'max_bytes': self.max_bytes}
+
+
+class FileSystemBackend:
+    """
+    Cache shared by every worker on the host through a directory of files.
+    Hits refresh the file's mtime, and the oldest files are pruned once the
+    directory grows past max_bytes, which gives approximate LRU eviction.
+    """
+
+    PRUNE_EVERY = 50  # Stores between directory size checks
+
+    def __init__(self, directory, max_bytes, stats):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stats = stats
+        self._stores_since_prune = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.page')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                stored_key, entry = pickle.load(f)
+            os.utime(path, None)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return None
+        return entry if stored_key == key else None
+
+    def set(self, key, entry):
+        if len(entry[2]) > self.max_bytes:
+            return
+        # Write to a temp file and rename, so other workers never read a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((key, entry), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._stores_since_prune += 1
+        if self._stores_since_prune >= self.PRUNE_EVERY:
+            self._stores_since_prune = 0
+            self.prune()
+
+    def _files(self):
+        files = []
+        with os.scandir(self.directory) as it:
+            for dir_entry in it:
+                if dir_entry.name.endswith('.page'):
+                    try:
+                        stat = dir_entry.stat()
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, dir_entry.path))
+        return files
+
+    def prune(self):
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(files):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.stats.incr('evictions')
+            if total <= self.max_bytes:
+                break
+
+    def usage(self):
+        files = self._files()
+        return {'backend': 'filesystem', 'entries': len(files), 'bytes': sum(size for _, size, _ in files),
+                'max_bytes': self.max_bytes, 'directory': self.directory}
+
+
+def init_page_cache(app):
+    """Creates the configured backend and stores it in app.extensions['page_cache']."""
+    if not app.config.get('PAGE_CACHE_ENABLED'):
+        app.extensions['page_cache'] = None
+        return None
+
+    stats = PageCacheStats()
+    backend_name = app.config.get('PAGE_CACHE_BACKEND', 'memory')
+    max_bytes = app.config.get('PAGE_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+    if backend_name == 'memory':
+        backend = MemoryBackend(max_bytes, stats)
+    elif backend_name == 'filesystem':
+        backend = FileSystemBackend(app.config['PAGE_CACHE_DIR'], max_bytes, stats)
+    else:
+        raise ValueError(f"Unknown PAGE_CACHE_BACKEND: {backend_name!r} (expected 'memory' or 'filesystem')")
+    app.extensions['page_cache'] = backend
+    return backend
+
+
+def get_page_cache():
+    return current_app.extensions.get('page_cache')
+
+
+def page_cache_stats():
+    """Hit/miss counters and storage usage for this worker (None if the cache is disabled)."""
+    backend = get_page_cache()
+    if backend is None:
+        return None
+    return dict(backend.stats.as_dict(), **backend.usage())
+
+
+def _cache_key():
+    # Sorted query string so ?page=2 and other args map to stable keys
+    args = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+    version = current_version(CONTENT_VERSION_KEY)
+    return f'{version}|{request.host}{request.script_root}{request.path}?{args}'
+
+
+def _is_cacheable_request():
+    if request.method != 'GET':
+        return False
+    # Pending flash messages are rendered into the page, so the page is visitor-specific
+    if '_flashes' in session:
+        return False
+    return not current_user.is_authenticated
+
+
+def cached_page(view):
+    """
+    Decorator for public views. Serves anonymous GETs from the page cache and
+    stores successful (200) responses. Responses carry an X-Page-Cache header.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        backend = get_page_cache()
+        if backend is None or not _is_cacheable_request():
+            return view(*args, **kwargs)
+
+        try:
+            key = _cache_key()
+            entry = backend.get(key)
+        except Exception as e:
+            current_app.logger.warning(f"Page cache lookup failed: {e}")
+            return view(*args, **kwargs)
+
+        if entry is not None:
+            backend.stats.incr('hits')
+            inc_counter('page_cache_requests_total', result='hit')
+            status, headers, body = entry
+            response = current_app.response_class(body, status=status, headers=headers)
+            response.headers['X-Page-Cache'] = 'HIT'
+            # Cached pages keep their ETag/Last-Modified, so revalidation still yields 304
+            return response.make_conditional(request)
+
+        backend.stats.incr('misses')
+        inc_counter('page_cache_requests_total', result='miss')
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.direct_passthrough and 'Set-Cookie' not in response.headers:
+            headers = [(k, v) for k, v in response.headers.items() if k.lower() not in _UNCACHEABLE_HEADERS]
+            try:
+                backend.set(key, (response.status_code, headers, response.get_data()))
+                backend.stats.incr('stores')
+            except Exception as e:
+                current_app.logger.warning(f"Page cache store failed: {e}")
+        response.headers['X-Page-Cache'] = 'MISS'
+        return response
+
+    return wrapper
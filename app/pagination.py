@@ -0,0 +1,121 @@
+# app/pagination.py
+# Keyset (cursor) pagination for the post listings.
+#
+# Offset pagination issues `LIMIT/OFFSET` plus a `COUNT(*)` per request, and deep
+# pages get slower as the table grows. Keyset mode seeks on (created_at, id) via the
+# index instead, and hands out opaque cursors for the next/previous page.
+# Old `?page=N` URLs keep working: they fall back to offset pagination.
+import base64
+import binascii
+from datetime import datetime
+from flask import current_app, request
+from sqlalchemy import and_, or_
+
+# Per-listing config keys; each may be 'offset' (default) or 'keyset'
+PAGINATION_MODE_KEYS = {
+    'blog': 'BLOG_PAGINATION',
+    'portfolio': 'PORTFOLIO_PAGINATION',
+    'dashboard': 'DASHBOARD_PAGINATION',
+}
+
+
+def encode_cursor(direction, post):
+    raw = f"{direction}|{post.created_at.isoformat()}|{post.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Returns (direction, created_at, id) for a cursor token, or None if it is malformed."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, created_at, post_id = base64.urlsafe_b64decode(padded).decode('utf-8').split('|')
+        if direction not in ('after', 'before'):
+            return None
+        return direction, datetime.fromisoformat(created_at), int(post_id)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+
+
+class KeysetPage:
+    """
+    One page of keyset-paginated results. Exposes `items`, `has_next`/`has_prev`
+    and `next_cursor`/`prev_cursor`, so templates can check `is_keyset` and build
+    `?cursor=` links instead of page numbers.
+    """
+    is_keyset = True
+
+    def __init__(self, items, next_cursor, prev_cursor, per_page):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.per_page = per_page
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def _older_than(model, created_at, post_id):
+    return or_(model.created_at < created_at,
+               and_(model.created_at == created_at, model.id < post_id))
+
+
+def _newer_than(model, created_at, post_id):
+    return or_(model.created_at > created_at,
+               and_(model.created_at == created_at, model.id > post_id))
+
+
+def keyset_paginate(query, model, per_page, cursor=None):
+    """
+    Paginates `query` (newest first) by seeking past `cursor`.
+    Fetches one extra row to detect the following page, and uses an indexed
+    EXISTS-style probe for the opposite direction; no COUNT(*) is issued.
+    """
+    newest_first = (model.created_at.desc(), model.id.desc())
+    oldest_first = (model.created_at.asc(), model.id.asc())
+
+    decoded = decode_cursor(cursor) if cursor else None
+    if decoded is None:
+        rows = query.order_by(*newest_first).limit(per_page + 1).all()
+        items, more_older = rows[:per_page], len(rows) > per_page
+        more_newer = False
+    elif decoded[0] == 'after':
+        _, created_at, post_id = decoded
+        rows = query.filter(_older_than(model, created_at, post_id)) \
+            .order_by(*newest_first).limit(per_page + 1).all()
+        items, more_older = rows[:per_page], len(rows) > per_page
+        more_newer = bool(items) and _has_row(query.filter(_newer_than(model, items[0].created_at, items[0].id)), model)
+    else:
+        _, created_at, post_id = decoded
+        rows = query.filter(_newer_than(model, created_at, post_id)) \
+            .order_by(*oldest_first).limit(per_page + 1).all()
+        more_newer = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        more_older = bool(items) and _has_row(query.filter(_older_than(model, items[-1].created_at, items[-1].id)), model)
+
+    next_cursor = encode_cursor('after', items[-1]) if items and more_older else None
+    prev_cursor = encode_cursor('before', items[0]) if items and more_newer else None
+    return KeysetPage(items, next_cursor, prev_cursor, per_page)
+
+
+def _has_row(query, model):
+    return query.with_entities(model.id).limit(1).first() is not None
+
+
+def pagination_mode(listing):
+    return current_app.config.get(PAGINATION_MODE_KEYS[listing], 'offset')
+
+
+def paginate_listing(query, model, listing, per_page):
+    """
+    Paginates a listing in the mode configured for it. In keyset mode a `?page=N`
+    argument still selects offset pagination, so existing links and bookmarks work.
+    """
+    if pagination_mode(listing) == 'keyset' and 'page' not in request.args:
+        return keyset_paginate(query, model, per_page, request.args.get('cursor'))
+    page = request.args.get('page', 1, type=int)
+    return query.order_by(model.created_at.desc(), model.id.desc()).paginate(page=page, per_page=per_page)
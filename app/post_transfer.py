@@ -0,0 +1,286 @@
+# app/post_transfer.py
+# Moving posts between environments: `flask posts export DIR` and `flask posts import DIR`.
+#
+# DIR holds posts.jsonl (one JSON object per post: id, title, content, category,
+# created_at, updated_at) and media/ (the original uploads; thumbnails are derived,
+# so they are rebuilt on import rather than copied). Both directions stream: export
+# reads posts in primary-key batches, import reads the file a batch at a time, so
+# memory use does not grow with the number of posts.
+#
+# Import copies the media first and creates missing thumbnails across a process pool,
+# then inserts posts a batch per transaction with one executemany INSERT. The derived
+# columns (excerpt, first image, thumbnail URL) and the search-index text come from
+# app.content.analyze_content, run in the same pool; the next batch is analysed while
+# the current one is written. Bulk inserts fire no ORM events, so the search index and
+# the media index (app/media_library.py) are filled here, and the home-post invariant,
+# content version and static export are handled once at the end.
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import insert, select, text
+from .cache import bump_content_version
+from .content import analyze_content, EXCERPT_SENTENCES
+from .extensions import db
+from .home_post import DEMOTED_CATEGORY, HOME_CATEGORY, ensure_home_post, get_home_post
+from .media_library import KIND_UPLOAD, THUMBNAIL_VARIANT, record_file
+from .thumbnails import IMAGE_EXTENSIONS, create_thumbnails, is_thumbnail, thumbnail_filename
+
+POSTS_FILENAME = 'posts.jsonl'
+MEDIA_DIRNAME = 'media'
+POST_CATEGORIES = ('home', 'portfolio', 'blog')
+EXPORTED_COLUMNS = ('id', 'title', 'content', 'category', 'created_at', 'updated_at')
+MAX_REPORTED_ERRORS = 20  # Per import; the rest are only counted
+
+
+def _is_original_image(filename):
+    return filename.rsplit('.', 1)[-1].lower() in IMAGE_EXTENSIONS and not is_thumbnail(filename)
+
+
+def _copy_media(source_folder, destination_folder, overwrite=False):
+    """Copies original images across. Returns (copied filenames, number skipped as already present)."""
+    os.makedirs(destination_folder, exist_ok=True)
+    copied, skipped = [], 0
+    for entry in sorted(os.scandir(source_folder), key=lambda entry: entry.name):
+        if not entry.is_file() or not _is_original_image(entry.name):
+            continue
+        destination = os.path.join(destination_folder, entry.name)
+        if os.path.exists(destination) and not overwrite:
+            skipped += 1
+            continue
+        shutil.copy2(entry.path, destination)
+        copied.append(entry.name)
+    return copied, skipped
+
+
+def export_posts(output_dir, batch_size=500, include_media=True, progress=None):
+    """
+    Writes every post to output_dir/posts.jsonl (and the uploads to output_dir/media/).
+    progress(stage, done, total, rate) is called after each batch. Returns a stats dict.
+    """
+    from .models import Post
+
+    os.makedirs(output_dir, exist_ok=True)
+    stats = {'posts': 0, 'media_copied': 0, 'media_skipped': 0}
+    columns = [getattr(Post.__table__.c, name) for name in EXPORTED_COLUMNS]
+    total = db.session.query(Post.id).count()
+    started = time.perf_counter()
+    tmp_path = os.path.join(output_dir, POSTS_FILENAME + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                select(*columns).where(Post.id > last_id).order_by(Post.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            for row in rows:
+                record = dict(row._mapping)
+                for key in ('created_at', 'updated_at'):
+                    record[key] = record[key].isoformat() if record[key] else None
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            stats['posts'] += len(rows)
+            last_id = rows[-1].id
+            db.session.expunge_all()
+            if progress:
+                progress('posts', stats['posts'], total, stats['posts'] / (time.perf_counter() - started))
+    os.replace(tmp_path, os.path.join(output_dir, POSTS_FILENAME))
+
+    if include_media:
+        copied, skipped = _copy_media(current_app.config['UPLOAD_FOLDER'], os.path.join(output_dir, MEDIA_DIRNAME),
+                                      overwrite=True)
+        stats['media_copied'], stats['media_skipped'] = len(copied), skipped
+    stats['seconds'] = round(time.perf_counter() - started, 2)
+    return stats
+
+
+def _analyze_post(content):
+    """Runs in a worker process: (excerpt, first image src, plain text for the search index, image srcs)."""
+    analysis = analyze_content(content, EXCERPT_SENTENCES)
+    return analysis.excerpt, analysis.first_image_src, analysis.text, analysis.images
+
+
+def _parse_timestamp(record, key):
+    value = record.get(key)
+    if not value:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"{key} must be an ISO 8601 string, not {value!r}")
+    return datetime.fromisoformat(value)
+
+
+def _read_batches(path, batch_size, stats):
+    """Yields lists of (line number, record) from a JSONL file; bad lines are recorded in stats."""
+    batch = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict) or not record.get('title') or record.get('content') is None:
+                    raise ValueError("a post needs a title and content")
+                if not isinstance(record['title'], str) or not isinstance(record['content'], str):
+                    raise ValueError("title and content must be strings")
+                if record.get('id') is not None and (not isinstance(record['id'], int) or isinstance(record['id'], bool)):
+                    raise ValueError(f"id must be an integer, not {record['id']!r}")
+                if record.get('category', 'blog') not in POST_CATEGORIES:
+                    raise ValueError(f"unknown category {record.get('category')!r}")
+                record['created_at'] = _parse_timestamp(record, 'created_at')
+                record['updated_at'] = _parse_timestamp(record, 'updated_at')
+            except ValueError as e:  # JSONDecodeError is a ValueError
+                stats['skipped'] += 1
+                if len(stats['errors']) < MAX_REPORTED_ERRORS:
+                    stats['errors'].append(f"line {line_number}: {e}")
+                continue
+            batch.append((line_number, record))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+class _Importer:
+    """Inserts analysed batches; holds what has to stay consistent across batches."""
+
+    def __init__(self, keep_ids, stats):
+        from .models import Post
+        self.keep_ids = keep_ids
+        self.stats = stats
+        self.media_url = current_app.config.get('MEDIA_FILES_URL', '/static/media_files/')
+        upload_folder = current_app.config['UPLOAD_FOLDER']
+        # One listing instead of an exists() per post
+        self.thumbnails = {name for name in os.listdir(upload_folder) if is_thumbnail(name)}
+        self.home_taken = get_home_post(with_content=False) is not None
+        self.insert = insert(Post.__table__).returning(Post.__table__.c.id, sort_by_parameter_order=True)
+
+    def _thumbnail_url(self, first_image_url):
+        if not first_image_url or not first_image_url.startswith(self.media_url):
+            return None
+        thumb_filename = thumbnail_filename(os.path.basename(first_image_url))
+        return self.media_url + thumb_filename if thumb_filename in self.thumbnails else None
+
+    def _category(self, category):
+        # Only one home post may exist; later ones (or all, if this site has one) become blog posts
+        if category != HOME_CATEGORY:
+            return category
+        if self.home_taken:
+            self.stats['demoted_home_posts'] += 1
+            return DEMOTED_CATEGORY
+        self.home_taken = True
+        return HOME_CATEGORY
+
+    def _advance_id_sequence(self):
+        # Explicit ids bypass PostgreSQL's post_id_seq; move it past them, in the batch's
+        # transaction, so the next add_post doesn't reuse an imported id. SQLite's
+        # INTEGER PRIMARY KEY always continues from max(id).
+        connection = db.session.connection()
+        if connection.dialect.name == 'postgresql':
+            connection.execute(text("SELECT setval(pg_get_serial_sequence('post', 'id'), "
+                                    "(SELECT max(id) FROM post))"))
+
+    def insert_batch(self, batch, analyses):
+        from .media_library import link_posts
+        from .search import add_to_index
+
+        now = datetime.utcnow()
+        rows, index_text, images = [], [], []
+        for (_, record), (excerpt, first_image_url, plain_text, image_srcs) in zip(batch, analyses):
+            row = {
+                'title': record['title'], 'content': record['content'],
+                'category': self._category(record.get('category', 'blog')),
+                'created_at': record['created_at'] or now,
+                'updated_at': record['updated_at'] or record['created_at'] or now,
+                'excerpt': excerpt, 'first_image_url': first_image_url,
+                'thumbnail_url': self._thumbnail_url(first_image_url),
+            }
+            if self.keep_ids and record.get('id') is not None:
+                row['id'] = record['id']
+            rows.append(row)
+            index_text.append(plain_text)
+            images.append(image_srcs)
+        try:
+            post_ids = db.session.execute(self.insert, rows).scalars().all()
+            add_to_index([(post_id, row['title'], body) for post_id, row, body in zip(post_ids, rows, index_text)])
+            link_posts(db.session.connection(), list(zip(post_ids, images)))
+            if self.keep_ids:
+                self._advance_id_sequence()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self.stats['posts'] += len(rows)
+
+
+def import_posts(input_dir, batch_size=500, workers=None, include_media=True, keep_ids=False,
+                 overwrite_media=False, progress=None):
+    """
+    Imports input_dir (as written by export_posts) into this site. Each batch is its own
+    transaction, so an interrupted import keeps the batches before the failure.
+    progress(stage, done, total, rate) reports the media, thumbnail and post stages.
+    Returns a stats dict.
+    """
+    posts_path = os.path.join(input_dir, POSTS_FILENAME)
+    if not os.path.isfile(posts_path):
+        raise FileNotFoundError(f"{posts_path} does not exist.")
+    stats = {'posts': 0, 'skipped': 0, 'errors': [], 'demoted_home_posts': 0, 'media_copied': 0,
+             'media_skipped': 0, 'thumbnails_created': 0, 'thumbnails_failed': 0}
+    workers = workers or current_app.config.get('THUMBNAIL_WORKERS', 2)
+    started = time.perf_counter()
+
+    media_dir = os.path.join(input_dir, MEDIA_DIRNAME)
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    if include_media and os.path.isdir(media_dir):
+        copied, stats['media_skipped'] = _copy_media(media_dir, upload_folder, overwrite=overwrite_media)
+        stats['media_copied'] = len(copied)
+        if progress:
+            progress('media', len(copied), len(copied), len(copied) / max(time.perf_counter() - started, 1e-9))
+        missing = [name for name in copied
+                   if overwrite_media or not os.path.exists(os.path.join(upload_folder, thumbnail_filename(name)))]
+        thumbnails_started = time.perf_counter()
+
+        def report_thumbnails(done, total):
+            if progress and (done % 50 == 0 or done == total):
+                progress('thumbnails', done, total, done / max(time.perf_counter() - thumbnails_started, 1e-9))
+
+        created, stats['thumbnails_failed'] = create_thumbnails(upload_folder, missing, workers=workers,
+                                                                progress=report_thumbnails)
+        stats['thumbnails_created'] = len(created)
+        created, missing = set(created), set(missing)
+        for filename in copied:
+            thumb_filename = thumbnail_filename(filename)
+            has_thumbnail = filename in created or (
+                filename not in missing and os.path.exists(os.path.join(upload_folder, thumb_filename)))
+            record_file(KIND_UPLOAD, filename, variants={THUMBNAIL_VARIANT: thumb_filename} if has_thumbnail else {})
+        db.session.commit()
+
+    importer = _Importer(keep_ids, stats)
+    posts_started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = None
+        for batch in _read_batches(posts_path, batch_size, stats):
+            # Submitted now, so the workers analyse this batch while the previous one is inserted
+            analyses = pool.map(_analyze_post, [record['content'] for _, record in batch],
+                                chunksize=max(1, len(batch) // (workers * 4)))
+            if pending:
+                importer.insert_batch(*pending)
+                if progress:
+                    progress('posts', stats['posts'], None, stats['posts'] / (time.perf_counter() - posts_started))
+            pending = (batch, analyses)
+        if pending:
+            importer.insert_batch(*pending)
+            if progress:
+                progress('posts', stats['posts'], None, stats['posts'] / (time.perf_counter() - posts_started))
+
+    if stats['posts']:
+        from .static_export import record_changes
+        ensure_home_post()
+        bump_content_version()  # Cached pages and validators pick up the new posts
+        record_changes(db.session, full=True)  # Every listing may have shifted
+        db.session.commit()
+    stats['seconds'] = round(time.perf_counter() - started, 2)
+    return stats
@@ -0,0 +1,218 @@
+# app/profiling.py
+# Opt-in request profiler, installed as WSGI middleware next to ProxyFix.
+#
+# Two capture modes, both enabled by PROFILING_ENABLED:
+# - a random PROFILE_SAMPLE_RATE fraction of requests run under cProfile (.pstats);
+# - every request is watched by a background stack sampler, and requests slower than
+#   PROFILE_SLOW_MS keep their samples as collapsed stacks (.collapsed, the format
+#   flamegraph.pl and speedscope read). Faster requests' samples are discarded.
+# Captures go to PROFILE_DIR, which keeps only the newest PROFILE_MAX_CAPTURES;
+# /admin/profiles lists the slowest ones by endpoint.
+import cProfile
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import datetime
+from flask import request
+
+ENDPOINT_ENVIRON_KEY = 'app.endpoint'  # Set by a before_request hook; WSGI middleware can't see endpoints
+
+Capture = namedtuple('Capture', ['name', 'endpoint', 'path', 'method', 'status', 'duration_ms', 'reason',
+                                 'captured_at', 'pid', 'samples', 'files'])
+
+_SAFE_NAME_RE = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+class StackSampler:
+    """Background thread that snapshots the stacks of threads currently serving a request."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._active = {}  # thread ident -> Counter of collapsed stacks
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+
+    def _ensure_running(self):
+        # Started lazily, and again in each gunicorn worker after the fork
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._active = {}
+            self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+            self._thread.start()
+
+    def start(self):
+        with self._lock:
+            self._ensure_running()
+            counter = Counter()
+            self._active[threading.get_ident()] = counter
+            return counter
+
+    def stop(self):
+        with self._lock:
+            return self._active.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for ident, counter in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        counter[_collapse(frame)] += 1
+
+
+def _collapse(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
+
+
+class ProfilerMiddleware:
+    """
+    WSGI middleware that profiles sampled requests with cProfile and keeps the
+    stack samples of slow requests. Captures are written by ProfileStore.
+    """
+
+    def __init__(self, wsgi_app, store, sample_rate, slow_seconds, sample_interval, logger):
+        self.wsgi_app = wsgi_app
+        self.logger = logger
+        self.store = store
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.sampler = StackSampler(sample_interval)
+
+    def __call__(self, environ, start_response):
+        status_holder = []
+
+        def capture_status(status, headers, exc_info=None):
+            status_holder.append(status)
+            return start_response(status, headers, exc_info)
+
+        profiler = cProfile.Profile() if random.random() < self.sample_rate else None
+        self.sampler.start()
+        started = time.perf_counter()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            try:
+                # Flask responses are usually fully rendered by now; the body is iterated outside the profile
+                return self.wsgi_app(environ, capture_status)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        finally:
+            duration = time.perf_counter() - started
+            stacks = self.sampler.stop()
+            slow = duration >= self.slow_seconds
+            if profiler is not None or slow:
+                try:
+                    self.store.save(environ, status_holder[0] if status_holder else None, duration,
+                                    'slow' if slow else 'sampled', profiler, stacks if slow else None)
+                except Exception as e:  # Profiling must never break the request
+                    self.logger.warning(f"Profiler: could not save capture: {e}")
+
+
+class ProfileStore:
+    """Directory of captures: <name>.json metadata plus .pstats and/or .collapsed files."""
+
+    def __init__(self, directory, max_captures):
+        self.directory = directory
+        self.max_captures = max_captures
+        self._saves_since_prune = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, environ, status, duration, reason, profiler, stacks):
+        endpoint = environ.get(ENDPOINT_ENVIRON_KEY) or 'unmatched'
+        duration_ms = round(duration * 1000, 1)
+        name = _SAFE_NAME_RE.sub('_', f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{os.getpid()}-{endpoint}-{int(duration_ms)}ms")
+        files = []
+        if profiler is not None:
+            profiler.dump_stats(os.path.join(self.directory, name + '.pstats'))
+            files.append(name + '.pstats')
+        if stacks:
+            with open(os.path.join(self.directory, name + '.collapsed'), 'w') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            files.append(name + '.collapsed')
+        meta = {
+            'endpoint': endpoint, 'path': environ.get('PATH_INFO', ''), 'method': environ.get('REQUEST_METHOD'),
+            'status': status, 'duration_ms': duration_ms, 'reason': reason,
+            'captured_at': datetime.utcnow().isoformat(timespec='seconds'), 'pid': os.getpid(),
+            'samples': sum(stacks.values()) if stacks else 0, 'files': files,
+        }
+        # Metadata last: a capture is only listed once its files are complete
+        with open(os.path.join(self.directory, name + '.json'), 'w') as f:
+            json.dump(meta, f)
+
+        self._saves_since_prune += 1
+        if self._saves_since_prune >= 10:
+            self._saves_since_prune = 0
+            self.prune()
+
+    def captures(self):
+        result = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            result.append(Capture(name=filename[:-5], **{field: meta.get(field) for field in Capture._fields[1:]}))
+        return result
+
+    def prune(self):
+        """Deletes the oldest captures beyond max_captures."""
+        captures = sorted(self.captures(), key=lambda capture: capture.name)  # Names start with the timestamp
+        for capture in captures[:max(len(captures) - self.max_captures, 0)]:
+            for filename in list(capture.files or []) + [capture.name + '.json']:
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+
+    def worst_by_endpoint(self, per_endpoint=5):
+        """{endpoint: slowest captures first}, endpoints ordered by their slowest capture."""
+        grouped = {}
+        for capture in self.captures():
+            grouped.setdefault(capture.endpoint, []).append(capture)
+        for endpoint_captures in grouped.values():
+            endpoint_captures.sort(key=lambda capture: capture.duration_ms or 0, reverse=True)
+        ordered = sorted(grouped.items(), key=lambda item: item[1][0].duration_ms or 0, reverse=True)
+        return {endpoint: endpoint_captures[:per_endpoint] for endpoint, endpoint_captures in ordered}
+
+
+def init_profiling(app):
+    """Wraps app.wsgi_app in ProfilerMiddleware when PROFILING_ENABLED is on. Returns the ProfileStore or None."""
+    if not app.config.get('PROFILING_ENABLED'):
+        app.extensions['profile_store'] = None
+        return None
+
+    store = ProfileStore(app.config['PROFILE_DIR'], app.config.get('PROFILE_MAX_CAPTURES', 200))
+    app.extensions['profile_store'] = store
+    app.wsgi_app = ProfilerMiddleware(
+        app.wsgi_app, store,
+        sample_rate=app.config.get('PROFILE_SAMPLE_RATE', 0.01),
+        slow_seconds=app.config.get('PROFILE_SLOW_MS', 1000) / 1000,
+        sample_interval=app.config.get('PROFILE_SAMPLE_INTERVAL_MS', 5) / 1000,
+        logger=app.logger,
+    )
+
+    @app.before_request
+    def _record_endpoint_for_profiler():
+        request.environ[ENDPOINT_ENVIRON_KEY] = request.endpoint
+
+    return store
@@ -0,0 +1,182 @@
+# app/search.py
+# Full-text search over posts, backed by an SQLite FTS5 virtual table.
+#
+# post_fts holds the title and the plain text of each post's HTML, keyed by
+# rowid = post.id. It is kept in sync by ORM events on Post (add/edit/delete go
+# through the session), and can be rebuilt in bulk with `flask rebuild-search-index`.
+# On other databases (e.g. PostgreSQL) search is reported as unavailable.
+import re
+import weakref
+from collections import namedtuple
+from markupsafe import Markup, escape
+from sqlalchemy import event, inspect, text, DDL, select, func, table, column, literal_column, bindparam
+from .content import html_to_text
+from .extensions import db
+from .models import Post
+
+FTS_TABLE = 'post_fts'
+
+# bm25() weights per column: a hit in the title counts far more than one in the body
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+# Control characters can't appear in the indexed text, so they are safe to use as
+# highlight markers and get swapped for <mark> tags after HTML-escaping the snippet.
+_HL_OPEN, _HL_CLOSE = '\x02', '\x03'
+
+# Lightweight handle for building queries against the virtual table
+fts_table = table(FTS_TABLE, column('rowid'), column('title'), column('body'))
+_fts_column = literal_column(FTS_TABLE)  # FTS5 auxiliary functions take the table itself
+
+# Engine -> whether post_fts exists; the table only appears via migration/create_all
+_fts_engines = weakref.WeakKeyDictionary()
+
+SearchResult = namedtuple('SearchResult', ['id', 'title', 'category', 'created_at', 'thumbnail_url',
+                                           'title_html', 'snippet_html'])
+SearchPage = namedtuple('SearchPage', ['query', 'results', 'total', 'page', 'per_page'])
+
+CREATE_FTS_SQL = (f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                  f"USING fts5(title, body, tokenize='porter unicode61')")
+
+# Create/drop the index alongside the post table (db.create_all(), `flask init-db`).
+# Migrated databases get it from the Alembic revision that introduced search.
+event.listen(Post.__table__, 'after_create', DDL(CREATE_FTS_SQL).execute_if(dialect='sqlite'))
+event.listen(Post.__table__, 'before_drop', DDL(f"DROP TABLE IF EXISTS {FTS_TABLE}").execute_if(dialect='sqlite'))
+
+
+def _fts_available(connection):
+    if connection.dialect.name != 'sqlite':
+        return False
+    available = _fts_engines.get(connection.engine)
+    if available is None:
+        available = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}
+        ).first() is not None
+        _fts_engines[connection.engine] = available
+    return available
+
+
+def search_available():
+    return _fts_available(db.session.connection())
+
+
+def _index_row(connection, post_id, title, content):
+    connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': post_id})
+    connection.execute(text(f"INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (:id, :title, :body)"),
+                       {'id': post_id, 'title': title or '', 'body': html_to_text(content)})
+
+
+@event.listens_for(Post, 'after_insert')
+def _index_new_post(mapper, connection, target):
+    if _fts_available(connection):
+        _index_row(connection, target.id, target.title, target.content)
+
+
+@event.listens_for(Post, 'after_update')
+def _reindex_post(mapper, connection, target):
+    # Category or thumbnail changes don't affect the index; skip the HTML parse for those
+    state = inspect(target)
+    if not (state.attrs.title.history.has_changes() or state.attrs.content.history.has_changes()):
+        return
+    if _fts_available(connection):
+        _index_row(connection, target.id, target.title, target.content)
+
+
+@event.listens_for(Post, 'after_delete')
+def _unindex_post(mapper, connection, target):
+    if _fts_available(connection):
+        connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': target.id})
+
+
+def add_to_index(entries):
+    """Indexes posts inserted with bulk (non-ORM) statements: (id, title, plain text) tuples, one executemany."""
+    connection = db.session.connection()
+    if entries and _fts_available(connection):
+        connection.execute(text(f"INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (:id, :title, :body)"),
+                           [{'id': post_id, 'title': title or '', 'body': body} for post_id, title, body in entries])
+
+
+def remove_from_index(post_ids):
+    """Drops index rows for posts deleted with bulk (non-ORM) statements."""
+    connection = db.session.connection()
+    if post_ids and _fts_available(connection):
+        statement = text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN :ids").bindparams(bindparam('ids', expanding=True))
+        connection.execute(statement, {'ids': list(post_ids)})
+
+
+def rebuild_search_index(batch_size=200, progress=None):
+    """
+    Recreates the index from scratch, reading posts in primary-key batches.
+    Returns the number of posts indexed.
+    """
+    connection = db.session.connection()
+    if connection.dialect.name != 'sqlite':
+        raise RuntimeError("Full-text search requires SQLite with FTS5.")
+    connection.execute(text(CREATE_FTS_SQL))
+    _fts_engines.pop(connection.engine, None)
+    connection.execute(text(f"DELETE FROM {FTS_TABLE}"))
+
+    indexed = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(Post.id, Post.title, Post.content) \
+            .filter(Post.id > last_id).order_by(Post.id).limit(batch_size).all()
+        if not rows:
+            break
+        connection.execute(
+            text(f"INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (:id, :title, :body)"),
+            [{'id': row.id, 'title': row.title or '', 'body': html_to_text(row.content)} for row in rows]
+        )
+        indexed += len(rows)
+        last_id = rows[-1].id
+        if progress:
+            progress(indexed, last_id)
+    db.session.commit()
+    return indexed
+
+
+def build_match_query(user_query):
+    """
+    Turns free text into a safe FTS5 MATCH expression: every word must match
+    (implicit AND), each is quoted so FTS5 operators in user input are inert,
+    and the last word is a prefix match so partially typed words still hit.
+    """
+    terms = re.findall(r'\w+', user_query or '')
+    if not terms:
+        return None
+    quoted = ['"{}"'.format(term.replace('"', '""')) for term in terms[:12]]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _highlighted(fragment):
+    html = str(escape(fragment or ''))
+    return Markup(html.replace(_HL_OPEN, '<mark>').replace(_HL_CLOSE, '</mark>'))
+
+
+def search_posts(user_query, page=1, per_page=10):
+    """Runs a ranked (bm25) search and returns a SearchPage with highlighted snippets."""
+    match = build_match_query(user_query)
+    if match is None:
+        return SearchPage(user_query, [], 0, page, per_page)
+    page = max(page, 1)
+
+    matches = _fts_column.op('MATCH')(match)
+    total = db.session.execute(select(func.count()).select_from(fts_table).where(matches)).scalar()
+    rows = db.session.execute(
+        select(Post.id, Post.title, Post.category, Post.created_at, Post.thumbnail_url,
+               func.highlight(_fts_column, 0, _HL_OPEN, _HL_CLOSE).label('title_hl'),
+               func.snippet(_fts_column, 1, _HL_OPEN, _HL_CLOSE, '…', 24).label('body_snippet'))
+        .select_from(fts_table.join(Post, Post.id == fts_table.c.rowid))
+        .where(matches)
+        .order_by(func.bm25(_fts_column, TITLE_WEIGHT, BODY_WEIGHT))
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+    ).all()
+
+    results = [
+        SearchResult(row.id, row.title, row.category, row.created_at, row.thumbnail_url,
+                     _highlighted(row.title_hl), _highlighted(row.body_snippet))
+        for row in rows
+    ]
+    return SearchPage(user_query, results, total, page, per_page)
@@ -0,0 +1,312 @@
+# app/static_export.py
+# Pre-renders the public pages to plain files so the reverse proxy can serve them
+# without Python: `/`, every blog and portfolio listing page, and every post,
+# plus the /static/ files those pages reference (uploads, thumbnails, css/js, sprites).
+#
+# Layout of STATIC_EXPORT_DIR (`flask export-static`):
+#   index.html                       /
+#   blog/index.html                  /blog and /blog?page=1
+#   blog/page/<n>/index.html         /blog?page=<n>  (same for portfolio)
+#   post/<id>/index.html             /post/<id>
+#   static/...                       /static/...
+#
+# Pages are rendered through the app itself (an anonymous test-client request), so
+# they are byte-for-byte what a visitor would get. Listings are exported with page
+# numbers even in keyset mode (keyset ?cursor= URLs stay dynamic). /media/ (resized images), /search and /admin stay
+# dynamic; set MEDIA_RESPONSIVE_IMAGES = False for a site with no dynamic images.
+#
+# With STATIC_EXPORT_ON_SAVE, committed changes to posts re-export only what they
+# affect (the post, /, and the listing pages from the post's position onwards),
+# and footer changes re-export everything. This runs on a background thread in the
+# worker that made the change. A Caddyfile that serves the export looks like:
+#
+#   @paged {
+#       path /blog /portfolio
+#       query page=*
+#   }
+#   rewrite @paged {path}/page/{query.page}/
+#   @exported {
+#       not query cursor=*
+#       file {
+#           root /srv/site-export
+#           try_files {path}/index.html {path}
+#       }
+#   }
+#   handle @exported {
+#       root * /srv/site-export
+#       file_server
+#   }
+#   handle {
+#       reverse_proxy localhost:8000
+#   }
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from .extensions import db
+from .models import FooterIcon, Post, SiteConfiguration
+
+# Listing name -> (URL path, function returning its page size for the app)
+LISTINGS = {
+    'blog': ('/blog', lambda app: app.config.get('BLOG_ITEMS_PER_PAGE', 5)),
+    'portfolio': ('/portfolio', lambda app: 5),
+}
+_STATIC_REF_RE = re.compile(r'''(?:src|href)=["'](/static/[^"'?#]+)|url\(['"]?(/static/[^"')?#]+)''')
+
+_export_lock = threading.Lock()  # One export at a time per process
+_pending = {'full': False, 'posts': {}}  # Changes waiting for the background thread
+_pending_lock = threading.Lock()
+_wakeup = threading.Event()
+_worker = {'thread': None, 'pid': None}
+
+
+class StaticExporter:
+    """Renders pages of `app` into output_dir. Call methods inside an app context."""
+
+    def __init__(self, app, output_dir):
+        self.app = app
+        self.output_dir = output_dir
+        self.client = app.test_client()
+        self.stats = {'pages': 0, 'removed': 0, 'static_files': 0, 'errors': []}
+
+    def _page_path(self, url_path):
+        return os.path.join(self.output_dir, url_path.strip('/'), 'index.html')
+
+    def _write_atomic(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.chmod(tmp_path, 0o644)  # mkstemp creates 0600; the web server must be able to read it
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def export_page(self, url, *output_url_paths):
+        """Renders `url` and writes it to <path>/index.html for each output path (default: url's path)."""
+        response = self.client.get(url)
+        if response.status_code != 200:
+            self.stats['errors'].append(f"{url}: HTTP {response.status_code}")
+            return False
+        body = response.get_data()
+        for output_url_path in output_url_paths or (url,):
+            self._write_atomic(self._page_path(output_url_path), body)
+        self.stats['pages'] += 1
+        self._copy_static_references(body.decode('utf-8', 'replace'))
+        return True
+
+    def _copy_static_references(self, html):
+        static_folder = self.app.static_folder
+        for match in _STATIC_REF_RE.finditer(html):
+            relative_path = (match.group(1) or match.group(2))[len('/static/'):]
+            source = os.path.normpath(os.path.join(static_folder, relative_path))
+            if not source.startswith(static_folder + os.sep) or not os.path.isfile(source):
+                continue
+            destination = os.path.join(self.output_dir, 'static', relative_path)
+            try:
+                source_stat = os.stat(source)
+                destination_stat = os.stat(destination)
+                if (destination_stat.st_size == source_stat.st_size
+                        and destination_stat.st_mtime >= source_stat.st_mtime):
+                    continue
+            except FileNotFoundError:
+                pass
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.copy2(source, destination)
+            self.stats['static_files'] += 1
+
+    def _remove_page(self, url_path):
+        directory = os.path.dirname(self._page_path(url_path))
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+            self.stats['removed'] += 1
+
+    def _listing_page_count(self, listing):
+        per_page = LISTINGS[listing][1](self.app)
+        total = db.session.query(Post.id).filter(Post.category == listing).count()
+        return max(1, -(-total // per_page))
+
+    def export_listing(self, listing, first_page=1):
+        """Exports pages first_page.. of a listing and removes pages past its end."""
+        base_path, _ = LISTINGS[listing]
+        pages = self._listing_page_count(listing)
+        for page in range(first_page, pages + 1):
+            output_paths = [f'{base_path}/page/{page}'] + ([base_path] if page == 1 else [])
+            self.export_page(f'{base_path}?page={page}', *output_paths)
+        page_root = os.path.join(self.output_dir, base_path.strip('/'), 'page')
+        if os.path.isdir(page_root):
+            for name in os.listdir(page_root):
+                if name.isdigit() and int(name) > pages:
+                    self._remove_page(f'{base_path}/page/{name}')
+
+    def export_post(self, post_id):
+        if db.session.get(Post, post_id) is None:
+            self._remove_page(f'/post/{post_id}')
+            return
+        self.export_page(f'/post/{post_id}')
+
+    def export_all(self):
+        """Exports every public page and removes pages of posts that no longer exist."""
+        self.export_page('/', '/')
+        for listing in LISTINGS:
+            self.export_listing(listing)
+        post_ids = {post_id for (post_id,) in db.session.query(Post.id)}
+        for post_id in sorted(post_ids):
+            self.export_page(f'/post/{post_id}')
+        post_root = os.path.join(self.output_dir, 'post')
+        if os.path.isdir(post_root):
+            for name in os.listdir(post_root):
+                if name.isdigit() and int(name) not in post_ids:
+                    self._remove_page(f'/post/{name}')
+        return self.stats
+
+    def export_changes(self, post_categories):
+        """
+        Re-exports what changes to these posts affect. post_categories maps a post id
+        to every category it had before or after the change; a post in a listing can
+        shift every later page of it, so those are re-rendered from its page onwards.
+        """
+        first_pages = {}
+        for post_id, categories in post_categories.items():
+            self.export_post(post_id)
+            post = db.session.get(Post, post_id)
+            for listing in categories & set(LISTINGS):
+                page = self._page_of(post, listing) if post is not None and post.category == listing else 1
+                first_pages[listing] = min(first_pages.get(listing, page), page)
+        self.export_page('/', '/')
+        for listing, first_page in first_pages.items():
+            self.export_listing(listing, first_page)
+        return self.stats
+
+    def _page_of(self, post, listing):
+        # Position in the listing's (created_at DESC, id DESC) order
+        newer = db.session.query(Post.id).filter(
+            Post.category == listing,
+            (Post.created_at > post.created_at) | ((Post.created_at == post.created_at) & (Post.id > post.id)),
+        ).count()
+        return newer // LISTINGS[listing][1](self.app) + 1
+
+
+def run_export(app, post_categories=None, full=False, output_dir=None):
+    """
+    Exports everything (full, or when no post changes are given) or just what the
+    changed posts affect, into output_dir (default STATIC_EXPORT_DIR). Exports in
+    one process run one at a time. Returns the exporter's stats.
+    """
+    with _export_lock:
+        exporter = StaticExporter(app, output_dir or app.config['STATIC_EXPORT_DIR'])
+        started = time.perf_counter()
+        stats = exporter.export_all() if full or not post_categories else exporter.export_changes(post_categories)
+        stats['seconds'] = round(time.perf_counter() - started, 2)
+        return stats
+
+
+# --- Export on save ---------------------------------------------------------
+
+def record_changes(session, post_categories=None, full=False):
+    """
+    Notes changes to export once `session` commits. The mapper events below call this;
+    bulk UPDATE/DELETE statements fire no mapper events, so their callers do (app/batch.py).
+    post_categories maps post ids to the categories they had before and after.
+    """
+    changes = session.info.setdefault('static_export_posts', {})
+    for post_id, categories in (post_categories or {}).items():
+        changes.setdefault(post_id, set()).update(category for category in categories if category)
+    if full:
+        session.info['static_export_full'] = True
+
+
+@event.listens_for(Post, 'after_insert')
+@event.listens_for(Post, 'after_delete')
+def _post_added_or_deleted(mapper, connection, target):
+    session = inspect(target).session
+    if session is not None:
+        record_changes(session, {target.id: [target.category]})
+
+
+@event.listens_for(Post, 'after_update')
+def _post_updated(mapper, connection, target):
+    session = inspect(target).session
+    if session is not None:
+        history = inspect(target).attrs.category.history
+        record_changes(session, {target.id: [target.category, *history.deleted]})
+
+
+@event.listens_for(FooterIcon, 'after_insert')
+@event.listens_for(FooterIcon, 'after_update')
+@event.listens_for(FooterIcon, 'after_delete')
+def _footer_changed(mapper, connection, target):
+    session = inspect(target).session
+    if session is not None:
+        record_changes(session, full=True)
+
+
+@event.listens_for(SiteConfiguration, 'after_insert')
+@event.listens_for(SiteConfiguration, 'after_update')
+def _site_configuration_changed(mapper, connection, target):
+    session = inspect(target).session
+    if session is not None and target.key == 'copyright_message':  # Version stamps change on every write
+        record_changes(session, full=True)
+
+
+@event.listens_for(Session, 'after_commit')
+def _export_after_commit(session):
+    posts = session.info.pop('static_export_posts', None)
+    full = session.info.pop('static_export_full', False)
+    if not (posts or full):
+        return
+    try:
+        app = current_app._get_current_object()
+    except RuntimeError:  # No app context
+        return
+    if app.config.get('STATIC_EXPORT_ON_SAVE'):
+        schedule_export(app, posts or {}, full)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('static_export_posts', None)
+    session.info.pop('static_export_full', None)
+
+
+def schedule_export(app, post_categories, full=False):
+    """Queues changes for this process's export thread; changes arriving meanwhile are merged."""
+    with _pending_lock:
+        _pending['full'] = _pending['full'] or full
+        for post_id, categories in post_categories.items():
+            _pending['posts'].setdefault(post_id, set()).update(categories)
+        if _worker['pid'] != os.getpid():  # Started lazily, and again in each gunicorn worker
+            _worker['pid'] = os.getpid()
+            _worker['thread'] = threading.Thread(target=_export_loop, args=(app,), name='static-export', daemon=True)
+            _worker['thread'].start()
+    _wakeup.set()
+
+
+def _export_loop(app):
+    while True:
+        _wakeup.wait()
+        _wakeup.clear()
+        with _pending_lock:
+            full, posts = _pending['full'], _pending['posts']
+            _pending['full'], _pending['posts'] = False, {}
+        if not (full or posts):
+            continue
+        with app.app_context():
+            try:
+                stats = run_export(app, posts, full)
+                app.logger.info(f"Static export ({'full' if full else f'{len(posts)} posts'}): {stats['pages']} pages, "
+                                f"{stats['removed']} removed, {stats['static_files']} files in {stats['seconds']}s")
+                for error in stats['errors']:
+                    app.logger.warning(f"Static export: {error}")
+            except Exception as e:
+                app.logger.error(f"Static export failed: {e}")
+            finally:
+                db.session.remove()
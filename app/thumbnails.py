@@ -0,0 +1,308 @@
+# app/thumbnails.py
+# Thumbnail generation for Trix uploads, run in a bounded background process pool.
+#
+# upload_trix_attachment saves the original and enqueues a job, so the request
+# returns without waiting for Pillow. Each job is recorded in ThumbnailJob. Posts
+# saved while a job is pending point at the thumbnail it is writing; when the job
+# finishes, posts still missing a thumbnail_url get it filled in, and if it fails,
+# posts pointing at the missing file are cleared.
+import os
+import threading
+import time
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from urllib.parse import urlparse
+from flask import current_app
+from PIL import Image
+from .extensions import db
+from .metrics import observe
+
+THUMBNAIL_TARGET_HEIGHT = 100
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+# Default pixel limit (width * height) for uploads; see UPLOAD_MAX_PIXELS in config.py
+MAX_IMAGE_PIXELS = 40_000_000
+
+_executor = None
+_executor_pid = None
+_pending = None
+_executor_lock = threading.Lock()
+
+
+def thumbnail_filename(original_filename):
+    base, ext = os.path.splitext(original_filename)
+    return f"{base}_thumb{ext}"
+
+
+def is_thumbnail(filename):
+    return os.path.splitext(filename)[0].endswith('_thumb')
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KiB (None where unsupported)."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+
+
+def check_image(image_path, max_pixels=MAX_IMAGE_PIXELS):
+    """
+    Reads only the image header and returns an error message if the file isn't an
+    image Pillow can open, or if it exceeds max_pixels (a decompression bomb, or
+    just too large to decode safely). Returns None if the image is acceptable.
+    """
+    try:
+        with Image.open(image_path) as img:
+            width, height = img.size
+    except Image.DecompressionBombError:
+        return "Image dimensions are too large."
+    except (OSError, SyntaxError):  # UnidentifiedImageError is an OSError
+        return "File is not a valid image."
+    if width * height > max_pixels:
+        return f"Image is {width}x{height}; at most {max_pixels // 1_000_000} megapixels are allowed."
+    return None
+
+
+def render_thumbnail(image_path, thumbnail_path, height=THUMBNAIL_TARGET_HEIGHT, max_pixels=MAX_IMAGE_PIXELS):
+    """
+    Writes a thumbnail `height` pixels high for image_path. Raises on failure.
+    Pure function with no app context, so it can run in a worker process.
+    """
+    with Image.open(image_path) as img:
+        if img.width * img.height > max_pixels:
+            raise ValueError(f"Image is {img.width}x{img.height}, over the {max_pixels} pixel limit")
+        aspect_ratio = img.width / img.height
+        new_width = int(aspect_ratio * height)
+
+        if img.format == 'JPEG':
+            # Decode at 1/2, 1/4 or 1/8 scale in libjpeg; a 40MP photo then never exists in memory at full size
+            img.draft('RGB', (new_width, height))
+        img.thumbnail((new_width, height))
+        img.save(thumbnail_path)  # This will overwrite if thumb_path already exists from a previous attempt
+
+
+def run_thumbnail_job(image_path, thumbnail_path, height=THUMBNAIL_TARGET_HEIGHT, max_pixels=MAX_IMAGE_PIXELS):
+    """
+    Worker-process entry point. Never raises; returns
+    (ok, error message, duration in ms, peak RSS of the process running it in KiB).
+    """
+    started = time.perf_counter()
+    try:
+        if not os.path.exists(image_path):
+            return False, f"Original image file not found at {image_path}", 0.0, peak_rss_kb()
+        render_thumbnail(image_path, thumbnail_path, height, max_pixels)
+        return True, None, (time.perf_counter() - started) * 1000, peak_rss_kb()
+    except Exception as e:
+        return False, str(e), (time.perf_counter() - started) * 1000, peak_rss_kb()
+
+
+def _get_executor(app):
+    """Returns this process's pool, creating it lazily (and again after a gunicorn fork)."""
+    global _executor, _executor_pid, _pending
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=app.config.get('THUMBNAIL_WORKERS', 2))
+            _executor_pid = os.getpid()
+            _pending = threading.BoundedSemaphore(app.config.get('THUMBNAIL_MAX_PENDING', 16))
+        return _executor, _pending
+
+
+def _record_result(source_filename, ok, error, duration_ms):
+    """Stores a job's outcome, records the thumbnail in the media index and resolves posts already using the image."""
+    from .media_library import THUMBNAIL_VARIANT, set_variant
+    from .models import ThumbnailJob
+
+    job = ThumbnailJob.query.filter_by(source_filename=source_filename).first()
+    if job is None:
+        return
+    job.status = 'done' if ok else 'failed'
+    job.error = error
+    job.duration_ms = duration_ms
+    job.finished_at = datetime.utcnow()
+    set_variant(source_filename, THUMBNAIL_VARIANT, job.thumb_filename if ok else None)
+    if ok:
+        resolve_post_thumbnails([source_filename])
+    else:
+        _clear_post_thumbnails(job.thumb_filename)
+    db.session.commit()
+
+
+def _clear_post_thumbnails(thumb_filename):
+    """Un-sets thumbnail_url on posts that were saved pointing at a thumbnail that never got created."""
+    from .models import Post
+    from .cache import bump_content_version
+
+    posts = Post.query.options(Post.without_content()) \
+        .filter(Post.thumbnail_url.like(f"%/media_files/{thumb_filename}")).all()
+    posts = [p for p in posts if os.path.basename(urlparse(p.thumbnail_url).path) == thumb_filename]
+    for post in posts:
+        post.thumbnail_url = None
+    if posts:
+        bump_content_version()
+
+
+def resolve_post_thumbnails(source_filenames):
+    """
+    Fills in thumbnail_url for posts whose first image is one of `source_filenames`
+    but which were saved before the thumbnail existed. Caller commits.
+    Returns the number of posts updated.
+    """
+    from .models import Post
+    from .cache import bump_content_version
+
+    media_url = current_app.config.get('MEDIA_FILES_URL', '/static/media_files/')
+    updated = 0
+    for source_filename in source_filenames:
+        posts = Post.query.options(Post.without_content()) \
+            .filter(Post.thumbnail_url.is_(None),
+                    Post.first_image_url.like(f"%/media_files/{source_filename}")).all()
+        for post in posts:
+            # LIKE treats '_' as a wildcard, so confirm the exact filename
+            if os.path.basename(urlparse(post.first_image_url).path) != source_filename:
+                continue
+            post.thumbnail_url = f"{media_url}{thumbnail_filename(source_filename)}"
+            updated += 1
+    if updated:
+        bump_content_version()
+    return updated
+
+
+def _job_done(app, source_filename, future, pending):
+    pending.release()
+    try:
+        ok, error, duration_ms, rss_kb = future.result()
+    except Exception as e:  # Worker process died (e.g. OOM-killed)
+        ok, error, duration_ms, rss_kb = False, f"Worker failed: {e}", None, None
+    with app.app_context():
+        try:
+            if duration_ms is not None:
+                observe('thumbnail_duration_seconds', duration_ms / 1000, outcome='done' if ok else 'failed')
+            _record_result(source_filename, ok, error, duration_ms)
+            if ok:
+                app.logger.info(f"thumbnails: Thumbnail ready for {source_filename} "
+                                f"({duration_ms:.0f} ms, pool process peak RSS {rss_kb} KiB)")
+            else:
+                app.logger.error(f"thumbnails: Failed to create thumbnail for {source_filename}: {error}")
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"thumbnails: Could not record result for {source_filename}: {e}")
+        finally:
+            db.session.remove()
+
+
+def enqueue_thumbnail(source_filename):
+    """
+    Records a pending ThumbnailJob for an uploaded file in UPLOAD_FOLDER and hands
+    the work to the process pool. Runs inline when THUMBNAIL_ASYNC is off, or when
+    THUMBNAIL_MAX_PENDING jobs are already queued in this worker (back-pressure).
+    Returns the job's status after enqueueing ('pending', 'done' or 'failed').
+    """
+    from .models import ThumbnailJob
+
+    app = current_app._get_current_object()
+    upload_folder = app.config['UPLOAD_FOLDER']
+    thumb_name = thumbnail_filename(source_filename)
+    image_path = os.path.join(upload_folder, source_filename)
+    thumb_path = os.path.join(upload_folder, thumb_name)
+    max_pixels = app.config.get('UPLOAD_MAX_PIXELS', MAX_IMAGE_PIXELS)
+
+    job = ThumbnailJob.query.filter_by(source_filename=source_filename).first()
+    if job is None:
+        job = ThumbnailJob(source_filename=source_filename, thumb_filename=thumb_name)
+        db.session.add(job)
+    job.status = 'pending'
+    job.error = None
+    job.finished_at = None
+    db.session.commit()
+
+    if app.config.get('THUMBNAIL_ASYNC', True):
+        executor, pending = _get_executor(app)
+        if pending.acquire(blocking=False):
+            try:
+                future = executor.submit(run_thumbnail_job, image_path, thumb_path, THUMBNAIL_TARGET_HEIGHT, max_pixels)
+            except Exception as e:
+                pending.release()
+                app.logger.warning(f"thumbnails: Pool unavailable ({e}); generating {source_filename} inline.")
+            else:
+                future.add_done_callback(lambda f: _job_done(app, source_filename, f, pending))
+                return 'pending'
+        else:
+            app.logger.warning(f"thumbnails: Queue full; generating {source_filename} inline.")
+
+    ok, error, duration_ms, rss_kb = run_thumbnail_job(image_path, thumb_path, THUMBNAIL_TARGET_HEIGHT, max_pixels)
+    app.logger.info(f"thumbnails: Inline thumbnail for {source_filename}: ok={ok}, "
+                    f"worker peak RSS {rss_kb} KiB")
+    observe('thumbnail_duration_seconds', duration_ms / 1000, outcome='done' if ok else 'failed')
+    _record_result(source_filename, ok, error, duration_ms)
+    return 'done' if ok else 'failed'
+
+
+def thumbnail_job_status(source_filename):
+    """Returns the recorded job status for an upload, or None if no job exists."""
+    from .models import ThumbnailJob
+    return db.session.query(ThumbnailJob.status).filter_by(source_filename=source_filename).scalar()
+
+
+def regenerate_thumbnails(regenerate_all=False, workers=None, progress=None):
+    """
+    Creates thumbnails for every original image in UPLOAD_FOLDER that lacks one
+    (or for all of them with regenerate_all), spread over a process pool, then
+    resolves thumbnail_url on posts that were missing it.
+    Returns (created, failed) counts.
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    sources = sorted(
+        f for f in os.listdir(upload_folder)
+        if f.rsplit('.', 1)[-1].lower() in IMAGE_EXTENSIONS and not is_thumbnail(f)
+    )
+    if not regenerate_all:
+        sources = [f for f in sources if not os.path.exists(os.path.join(upload_folder, thumbnail_filename(f)))]
+    if not sources:
+        return 0, 0
+
+    created, failed = create_thumbnails(upload_folder, sources, workers=workers, progress=progress)
+    record_thumbnails(created)
+    resolve_post_thumbnails(created)
+    db.session.commit()
+    return len(created), failed
+
+
+def record_thumbnails(source_filenames):
+    """Records new thumbnails of these uploads in the media index. Caller commits."""
+    from .media_library import THUMBNAIL_VARIANT, set_variant
+    for source_filename in source_filenames:
+        set_variant(source_filename, THUMBNAIL_VARIANT, thumbnail_filename(source_filename))
+
+
+def create_thumbnails(upload_folder, sources, workers=None, progress=None):
+    """
+    Writes thumbnails for the given originals in upload_folder across a process pool.
+    Returns (filenames of the originals that got one, number that failed).
+    """
+    if not sources:
+        return [], 0
+    created, failed, done = [], 0, 0
+    workers = workers or current_app.config.get('THUMBNAIL_WORKERS', 2)
+    max_pixels = current_app.config.get('UPLOAD_MAX_PIXELS', MAX_IMAGE_PIXELS)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(
+            run_thumbnail_job,
+            [os.path.join(upload_folder, f) for f in sources],
+            [os.path.join(upload_folder, thumbnail_filename(f)) for f in sources],
+            [THUMBNAIL_TARGET_HEIGHT] * len(sources),
+            [max_pixels] * len(sources),
+            chunksize=8,
+        )
+        for source_filename, (ok, error, _, _) in zip(sources, results):
+            done += 1
+            if ok:
+                created.append(source_filename)
+            else:
+                failed += 1
+                current_app.logger.error(f"thumbnails: Failed for {source_filename}: {error}")
+            if progress:
+                progress(done, len(sources))
+    return created, failed
@@ -0,0 +1,146 @@
+# bench/content_analysis.py
+# Compares app.content.analyze_content (one HTMLParser pass) with the BeautifulSoup
+# code it replaced (bench/legacy_content.py) over a corpus of Trix-style posts.
+#
+# First checks that both produce identical excerpts, plain text and image lists
+# (exits non-zero on any mismatch), then times what a post save used to cost
+# (three separate parses: excerpt, first image, search text) against one analysis.
+#
+#   python bench/content_analysis.py                 # generated corpus
+#   python bench/content_analysis.py --posts 2000 --repeat 5
+#   python bench/content_analysis.py --database sqlite:///instance/app.db   # real posts
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.content import analyze_content, EXCERPT_SENTENCES  # noqa: E402
+import legacy_content  # noqa: E402
+from corpus import trix_post  # noqa: E402
+
+# Hand-written cases for the corners of the old behaviour
+EDGE_CASES = [
+    '',
+    '<div><br></div>',
+    '<p>Short.</p>',
+    '<div>No paragraphs at all here. Just a Trix div with a couple of sentences in it. And another one.</div>',
+    '<p>Outer <p>nested paragraph text that is long enough</p> tail words</p><p>More text follows in this one. It ends.</p>',
+    '<p>Unclosed paragraph with quite a few words in it so the threshold is met. Second sentence here',
+    '<figure><img src="/static/media_files/a.jpg"><figcaption>a.jpg 12.5 KB</figcaption></figure>'
+    '<div>Caption was only metadata. The body text is what should be used for the excerpt.</div>',
+    '<figure><img src="/static/media_files/b.png"><figcaption>A caption that describes the photo well</figcaption></figure>'
+    '<div>Body text after a descriptive caption. It has two sentences.</div>',
+    '<div>report.pdf 1.2 MB. The real text starts after the attachment name. It has more sentences.</div>',
+    '<p>Entities &amp; such &lt;tags&gt; &nbsp; and &copy; 2024 are decoded here. Mr. Smith went to Washington. Done!</p>',
+    '<style>p { color: red }</style><script>var x = "<p>not text</p>";</script><p>Only this paragraph is visible text here today.</p>',
+    '<!-- a comment --><p>Comments are not text, and neither are doctype declarations. Right?</p>',
+    '<img alt="no src"><img src="/static/media_files/second.jpg"><p>First img tag has no src attribute at all here.</p>',
+    '<div><strong>Bold</strong><em>italic</em>run together words. e.g. abbreviations i.e. this. U.S. style?</div>',
+    '<p></p><p>   </p><p>Empty paragraphs before the real one, which has enough words to pass.</p>',
+    '<figure><figcaption>800x600</figcaption></figure><p>Dimensions-only caption should vanish from the text.</p>',
+    '<div>Stray end tags</span></p> should be ignored entirely by both parsers. Yes they should.</div>',
+    '<p>Self closing <br/> and <p/> tags mixed in with enough words to count as a sentence.</p>',
+]
+
+
+def generate_corpus(count, seed=1234):
+    rng = random.Random(seed)
+    return list(EDGE_CASES) + [trix_post(rng, index) for index in range(count)]
+
+
+def load_corpus_from_database(database_url):
+    from app import create_app
+    from app.extensions import db
+    from app.models import Post
+    os.environ['DATABASE_URL'] = database_url
+    app = create_app('production')
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    with app.app_context():
+        return [row.content or '' for row in db.session.query(Post.content)]
+
+
+def check_golden(corpus):
+    mismatches = []
+    for index, html in enumerate(corpus):
+        analysis = analyze_content(html, EXCERPT_SENTENCES)
+        expected = {
+            'excerpt': legacy_content.get_text_excerpt(html, EXCERPT_SENTENCES),
+            'text': legacy_content.html_to_text(html),
+            'first_image_src': legacy_content.first_image_src(html) if html else None,
+            'images': legacy_content.image_sources(html) if html else [],
+        }
+        actual = {
+            'excerpt': analysis.excerpt,
+            'text': analysis.text,
+            'first_image_src': analysis.first_image_src,
+            'images': list(analysis.images),
+        }
+        for field in expected:
+            if expected[field] != actual[field]:
+                mismatches.append({'post': index, 'field': field, 'expected': expected[field],
+                                   'actual': actual[field], 'html': html[:300]})
+    return mismatches
+
+
+def time_it(fn, corpus, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for html in corpus:
+            fn(html)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def legacy_save(html):
+    legacy_content.get_text_excerpt(html, EXCERPT_SENTENCES)
+    if html:
+        legacy_content.first_image_src(html)
+    legacy_content.html_to_text(html)
+
+
+def single_pass_save(html):
+    analyze_content.__wrapped__(html, EXCERPT_SENTENCES)  # Bypass the memo so every call parses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=500, help='Generated posts (ignored with --database).')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing runs; the best one is reported.')
+    parser.add_argument('--database', help='Read Post.content from this database URL instead of generating.')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+    args = parser.parse_args()
+
+    corpus = load_corpus_from_database(args.database) if args.database else generate_corpus(args.posts)
+    mismatches = check_golden(corpus)
+
+    legacy_seconds = time_it(legacy_save, corpus, args.repeat)
+    single_seconds = time_it(single_pass_save, corpus, args.repeat)
+    results = {
+        'posts': len(corpus),
+        'bytes': sum(len(html) for html in corpus),
+        'mismatches': len(mismatches),
+        'legacy_ms_per_post': round(legacy_seconds * 1000 / len(corpus), 4),
+        'single_pass_ms_per_post': round(single_seconds * 1000 / len(corpus), 4),
+        'speedup': round(legacy_seconds / single_seconds, 2) if single_seconds else None,
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for key, value in results.items():
+            print(f"{key:>24}: {value}")
+    for mismatch in mismatches[:10]:
+        print(f"MISMATCH post {mismatch['post']} {mismatch['field']}:\n"
+              f"  expected: {mismatch['expected']!r}\n  actual:   {mismatch['actual']!r}\n"
+              f"  html: {mismatch['html']!r}", file=sys.stderr)
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+# bench/corpus.py
+# Synthetic post bodies shaped like what the Trix editor saves: <div>/<p> paragraphs
+# of varying length, lists, headings, quotes, entities, and image attachments
+# (<figure> with an <img> and a figcaption that is either the Trix "name size"
+# metadata or a real caption). Deterministic for a given random.Random seed.
+WORDS = ("the quick brown fox jumps over lazy dog garden summer project design layout colour "
+         "photograph light studio client build render frame timber steel window kitchen").split()
+
+
+def _sentence(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(3, 16))]
+    words[0] = words[0].capitalize()
+    return ' '.join(words) + rng.choice(['.', '.', '.', '?', '!'])
+
+
+def _block(rng, index, image_names=None):
+    kind = rng.random()
+    if kind < 0.15:
+        if image_names:
+            name = rng.choice(image_names)
+        else:
+            name = f"photo_{index}_{rng.randint(1, 999)}.{rng.choice(['jpg', 'png', 'jpeg'])}"
+        caption = (f"{name} {rng.randint(10, 9000)}.{rng.randint(0, 9)} KB" if rng.random() < 0.6
+                   else ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 8))))
+        return (f'<figure data-trix-attachment="{{&quot;contentType&quot;:&quot;image/jpeg&quot;}}" '
+                f'class="attachment attachment--preview"><img src="/static/media_files/{name}" width="800" '
+                f'height="600"><figcaption class="attachment__caption">{caption}</figcaption></figure>')
+    if kind < 0.25:
+        items = ''.join(f'<li>{_sentence(rng)}</li>' for _ in range(rng.randint(2, 5)))
+        return f'<ul>{items}</ul>'
+    if kind < 0.3:
+        return f'<h1>{_sentence(rng)}</h1>'
+    if kind < 0.35:
+        return f'<blockquote>{_sentence(rng)}</blockquote>'
+    tag = 'p' if rng.random() < 0.4 else 'div'
+    sentences = ' '.join(_sentence(rng) for _ in range(rng.randint(1, 6)))
+    if rng.random() < 0.3:
+        sentences = sentences.replace(' ', ' <strong>', 1).replace('.', '.</strong>', 1)
+    if rng.random() < 0.2:
+        sentences += ' Fish &amp; chips &nbsp; cost &pound;5.'
+    return f'<{tag}>{sentences}<br></{tag}>'
+
+
+def trix_post(rng, index, image_names=None, min_blocks=2, max_blocks=30):
+    """
+    One post body. Images reference /static/media_files/<name>, picked from
+    image_names when given (so the files exist) or made up otherwise.
+    """
+    return ''.join(_block(rng, index, image_names) for _ in range(rng.randint(min_blocks, max_blocks)))
+
+
+def trix_title(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(2, 7))]
+    return ' '.join(words).capitalize()
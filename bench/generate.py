@@ -0,0 +1,218 @@
+# bench/generate.py
+# Seeds a throwaway site for bench/load.py: a SQLite database with N posts of
+# Trix-style HTML (bench/corpus.py), footer icons, a copyright message and an
+# admin user, plus JPEG media files (and their _thumb files) that the posts'
+# <img> tags and thumbnail URLs point at. Same arguments, same site.
+#
+# Everything goes to --workdir (default instance/bench/): bench.db, media/ and
+# bench.json, which records how the site was built so load.py can point the app at it.
+# Posts are inserted in batches with Core inserts; bodies are drawn from a pool of
+# --distinct-bodies so 100k posts don't need 100k HTML analyses.
+#
+#   python bench/generate.py --posts 1000
+#   python bench/generate.py --posts 100000 --media 200 --no-search-index
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from corpus import trix_post, trix_title  # noqa: E402
+
+DEFAULT_WORKDIR = os.path.join(PROJECT_ROOT, 'instance', 'bench')
+ADMIN_USERNAME = 'bench'
+ADMIN_PASSWORD = 'bench-password'
+# Existing icons in app/static/img; FooterIcon.icon_filename refers to that folder
+FOOTER_ICONS = [
+    ('Facebook', 'Facebook_ico.png', 'https://www.facebook.com/'),
+    ('GitHub', 'GitHub_Dark_ico.png', 'https://github.com/'),
+    ('LinkedIn', 'Linkedin_Black_ico.png', 'https://www.linkedin.com/'),
+]
+
+
+def workdir_paths(workdir):
+    return {
+        'database': os.path.join(workdir, 'bench.db'),
+        'media': os.path.join(workdir, 'media'),
+        'manifest': os.path.join(workdir, 'bench.json'),
+    }
+
+
+def configure_environment(workdir):
+    """Points the app's config at the bench site. Must run before `app` is imported."""
+    paths = workdir_paths(workdir)
+    os.environ['DATABASE_URL'] = f"sqlite:///{paths['database']}"
+    os.environ['UPLOAD_FOLDER'] = paths['media']
+    return paths
+
+
+def write_media(media_dir, count, size, rng):
+    """Photo-sized JPEGs (gradient plus noise, so they compress like photos) and their thumbnails."""
+    from PIL import Image
+    from app.thumbnails import render_thumbnail, thumbnail_filename
+
+    os.makedirs(media_dir, exist_ok=True)
+    names = []
+    for index in range(count):
+        name = f'bench_photo_{index:04d}.jpg'
+        names.append(name)
+        path = os.path.join(media_dir, name)
+        if not os.path.exists(path):
+            width, height = size
+            gradient = Image.linear_gradient('L').resize((width, height))
+            noise = Image.effect_noise((width, height), rng.randint(20, 80))
+            image = Image.merge('RGB', (gradient, noise, gradient.rotate(rng.choice([90, 180, 270]))))
+            image.save(path, quality=85)
+        thumb_path = os.path.join(media_dir, thumbnail_filename(name))
+        if not os.path.exists(thumb_path):
+            render_thumbnail(path, thumb_path)
+    return names
+
+
+def build_bodies(count, image_names, media_url, rng):
+    """(content, excerpt, first_image_url, thumbnail_url) for `count` distinct posts."""
+    from app.content import analyze_content, EXCERPT_SENTENCES
+    from app.thumbnails import thumbnail_filename
+
+    bodies = []
+    for index in range(count):
+        # Mostly long posts with the odd short one and the odd very long one
+        max_blocks = rng.choice([8, 30, 30, 60])
+        content = trix_post(rng, index, image_names, max_blocks=max_blocks)
+        analysis = analyze_content(content, EXCERPT_SENTENCES)
+        first_image_url = analysis.first_image_src
+        thumbnail_url = None
+        if first_image_url and first_image_url.startswith(media_url):
+            thumbnail_url = media_url + thumbnail_filename(os.path.basename(first_image_url))
+        bodies.append((content, analysis.excerpt, first_image_url, thumbnail_url))
+    return bodies
+
+
+def insert_posts(db, posts, bodies, batch_size, rng, progress=None):
+    from app.home_post import HOME_CATEGORY
+    from app.models import Post
+
+    started = datetime(2015, 1, 1)
+    step = timedelta(minutes=max(1, (10 * 365 * 24 * 60) // max(posts, 1)))  # Spread over ~10 years
+    inserted = 0
+    while inserted < posts:
+        rows = []
+        for index in range(inserted, min(inserted + batch_size, posts)):
+            content, excerpt, first_image_url, thumbnail_url = bodies[index % len(bodies)]
+            created_at = started + step * index
+            rows.append({
+                'title': trix_title(rng), 'content': content, 'excerpt': excerpt,
+                'first_image_url': first_image_url, 'thumbnail_url': thumbnail_url,
+                # The newest post is the home post (the invariant add_post keeps)
+                'category': HOME_CATEGORY if index == posts - 1 else ('portfolio' if rng.random() < 0.3 else 'blog'),
+                'created_at': created_at, 'updated_at': created_at,
+            })
+        db.session.execute(Post.__table__.insert(), rows)
+        db.session.commit()
+        inserted += len(rows)
+        if progress:
+            progress(inserted)
+
+
+def generate(args):
+    paths = configure_environment(args.workdir)
+    os.makedirs(paths['media'], exist_ok=True)  # Before create_app, which would announce creating it on stdout
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(paths['database'] + suffix):
+            os.remove(paths['database'] + suffix)
+
+    from sqlalchemy import text
+    from app import create_app
+    from app.extensions import db
+    from app.models import FooterIcon, SiteConfiguration, User
+    from app.search import rebuild_search_index
+
+    app = create_app(args.config)
+    rng = random.Random(args.seed)
+    timings = {}
+    with app.app_context():
+        db.create_all()
+
+        began = time.perf_counter()
+        image_names = write_media(paths['media'], args.media, (args.image_width, args.image_height), rng)
+        timings['media_seconds'] = time.perf_counter() - began
+
+        began = time.perf_counter()
+        bodies = build_bodies(min(args.distinct_bodies, args.posts), image_names,
+                              app.config.get('MEDIA_FILES_URL', '/static/media_files/'), rng)
+
+        def report(inserted):
+            if not args.json:
+                print(f"  {inserted}/{args.posts} posts", end='\r', flush=True)
+
+        insert_posts(db, args.posts, bodies, args.batch_size, rng, report)
+        if not args.json:
+            print()
+        timings['posts_seconds'] = time.perf_counter() - began
+
+        user = User(username=ADMIN_USERNAME, email='bench@example.com')
+        user.set_password(ADMIN_PASSWORD)
+        db.session.add(user)
+        for order, (name, icon_filename, click_url) in enumerate(FOOTER_ICONS, start=1):
+            db.session.add(FooterIcon(name=name, icon_filename=icon_filename, click_url=click_url, order=order))
+        db.session.add(SiteConfiguration(key='copyright_message', value='&copy; {year} Bench Site. All Rights Reserved.'))
+        db.session.commit()
+
+        indexed = None
+        if args.search_index:
+            began = time.perf_counter()
+            try:
+                indexed = rebuild_search_index(batch_size=args.batch_size)
+            except RuntimeError as e:
+                print(f"Search index not built: {e}", file=sys.stderr)
+            timings['search_index_seconds'] = time.perf_counter() - began
+
+        # Fold the WAL into the main file so the database is complete on its own (and its size is meaningful)
+        db.session.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
+        db.engine.dispose()
+
+    manifest = {
+        'posts': args.posts, 'seed': args.seed, 'config': args.config,
+        'distinct_bodies': len(bodies), 'media_files': len(image_names), 'search_indexed': indexed,
+        'database': paths['database'], 'media': paths['media'],
+        'admin_username': ADMIN_USERNAME, 'admin_password': ADMIN_PASSWORD,
+        'database_bytes': os.path.getsize(paths['database']),
+        'generated_at': datetime.utcnow().isoformat(timespec='seconds'),
+        **{key: round(value, 2) for key, value in timings.items()},
+    }
+    with open(paths['manifest'], 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=1000, help='Posts to create (100 to 100000 is the useful range).')
+    parser.add_argument('--media', type=int, default=40, help='Distinct JPEG media files referenced by posts.')
+    parser.add_argument('--image-width', type=int, default=1600)
+    parser.add_argument('--image-height', type=int, default=1200)
+    parser.add_argument('--distinct-bodies', type=int, default=500, help='Post bodies generated; posts reuse them.')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows per insert (and per search-index batch).')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--config', default='production', help="create_app() config name (default 'production').")
+    parser.add_argument('--workdir', default=DEFAULT_WORKDIR, help='Where bench.db, media/ and bench.json go.')
+    parser.add_argument('--no-search-index', dest='search_index', action='store_false',
+                        help='Skip building the full-text search index.')
+    parser.add_argument('--json', action='store_true', help='Print the manifest as JSON.')
+    args = parser.parse_args()
+
+    manifest = generate(args)
+    if args.json:
+        print(json.dumps(manifest, indent=2))
+    else:
+        for key, value in manifest.items():
+            print(f"{key:>22}: {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# bench/legacy_content.py
+# The BeautifulSoup-based excerpt/text extraction that app/content.py replaced,
+# kept verbatim as the golden reference for bench/content_analysis.py.
+# Not imported by the app.
+from bs4 import BeautifulSoup # For stripping HTML
+import re # For regular expressions (sentence splitting)
+
+EXCERPT_SENTENCES = 2 # Number of sentences stored in Post.excerpt
+
+
+def get_text_excerpt(html_content, num_sentences=2):
+    if not html_content:
+        # current_app.logger.debug("get_text_excerpt: HTML content is empty.")
+        return ""
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    # 1. Remove script and style tags
+    for SCRIPT_OR_STYLE_TAG in soup(["script", "style"]):
+        SCRIPT_OR_STYLE_TAG.extract()
+
+    # 2. Attempt to remove Trix figcaptions if they mostly contain filename-like metadata
+    for figcaption in soup.find_all("figcaption"):
+        caption_text = figcaption.get_text(separator=' ', strip=True)
+        # Regex to check if caption text looks like a common image filename, optional size, or just dimensions
+        if re.fullmatch(r'[\w\s\-_\.]+\.(?:jpg|jpeg|png|gif|webp|bmp|tiff|svg|ico|pdf|doc|docx|xls|xlsx|ppt|pptx)'
+                        r'(?:\s+\d{1,7}(?:\.\d{1,2})?\s*(?:KB|MB|GB|B))?\.?', caption_text, re.IGNORECASE) or \
+                re.fullmatch(r'\d{1,4}x\d{1,4}', caption_text) or \
+                len(caption_text.split()) < 4:  # Or if it's very short (e.g., less than 4 words)
+            # current_app.logger.debug(
+            #     f"get_text_excerpt: Removing figcaption likely containing only filename/metadata: '{caption_text}'")
+            figcaption.extract()
+
+    # 3. Get text, trying paragraphs first
+    paragraphs = soup.find_all('p')
+    plain_text_from_tags = []
+    if paragraphs:
+        for p in paragraphs:
+            plain_text_from_tags.append(p.get_text(separator=' ', strip=True))
+
+    # If paragraph text is too short or absent, get all text from the (modified) soup
+    if not plain_text_from_tags or len(" ".join(plain_text_from_tags).split()) < 15:  # Arbitrary threshold
+        # current_app.logger.debug(
+        #     "get_text_excerpt: Text from <p> tags is minimal or absent. Using broader text extraction from modified soup.")
+        # Using the soup that has had figcaptions potentially removed
+        extracted_text_from_soup = soup.get_text(separator=' ', strip=True)
+    else:
+        extracted_text_from_soup = " ".join(plain_text_from_tags)
+
+    # Normalize whitespace
+    extracted_plain_text = re.sub(r'\s+', ' ', extracted_text_from_soup).strip()
+
+    if not extracted_plain_text:
+        # current_app.logger.debug("get_text_excerpt: Plain text is empty after initial extraction and normalization.")
+        return ""
+
+    # current_app.logger.debug(
+    #     f"get_text_excerpt: Plain text BEFORE specific filename/size stripping: \"{extracted_plain_text[:300]}...\"")
+
+    # **4. NEW: Explicitly remove "filename.ext size KB/MB/GB." pattern from the beginning of the text**
+    # This pattern looks for:
+    # - Optional leading spaces/tabs
+    # - Filename (word chars, spaces, hyphens, underscores, periods)
+    # - Common image/doc extension
+    # - Whitespace
+    # - Size (number, optional decimal, KB/MB/GB/bytes/B)
+    # - Optional punctuation after size (.,;)
+    # - Trailing whitespace
+    filename_size_pattern = r"^\s*[\w\s\-_\.]+\.(?:jpg|jpeg|png|gif|webp|bmp|tiff|svg|ico|pdf|doc|docx|xls|xlsx|ppt|pptx)\s+\d{1,7}(?:\.\d{1,2})?\s*(?:KB|MB|GB|bytes|B)\b[\.,;]?\s*"
+
+    # Remove the pattern if it occurs at the beginning of the string
+    cleaned_text = re.sub(filename_size_pattern, "", extracted_plain_text, count=1, flags=re.IGNORECASE).strip()
+
+    if len(cleaned_text) < len(extracted_plain_text):
+        pass
+        #   current_app.logger.debug(f"get_text_excerpt: Plain text AFTER specific filename/size stripping: \"{cleaned_text[:300]}...\"")
+    else:
+        # current_app.logger.debug(
+        #     f"get_text_excerpt: No leading filename/size pattern found, or stripping had no effect on length.")
+        # Ensure cleaned_text is assigned even if no stripping occurred
+        cleaned_text = extracted_plain_text
+
+    if not cleaned_text:
+        # current_app.logger.debug("get_text_excerpt: Plain text is empty after filename/size stripping.")
+        return ""
+
+    # 5. Sentence splitting
+    # Using re.split for potentially better handling of trailing text if last sentence is incomplete.
+    sentences = re.split(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\?|!)\s', cleaned_text)
+    sentences = [s.strip() for s in sentences if s.strip()]
+
+    # 6. Filter for meaningful sentences
+    # Also ensure the sentence itself doesn't re-match the filename pattern if it somehow got through
+    meaningful_sentences = [
+        s for s in sentences
+        if len(s.split()) > 3 and not re.fullmatch(filename_size_pattern.strip('^$\\s*'), s, flags=re.IGNORECASE)
+    ]  # Require more than 3 words for a sentence to be "meaningful"
+    # current_app.logger.debug(
+    #     f"get_text_excerpt: Found {len(meaningful_sentences)} meaningful sentences: {meaningful_sentences[:num_sentences + 1]}")  # Log one more than needed
+
+    if not meaningful_sentences:
+        words = cleaned_text.split()
+        fallback_text = ' '.join(words[:35])  # Default to 35 words from cleaned text
+        # current_app.logger.debug(
+        #     f"get_text_excerpt: No meaningful sentences found, returning word fallback from cleaned text: \"{fallback_text}\"")
+        return fallback_text
+
+    final_excerpt = ' '.join(meaningful_sentences[:num_sentences])
+    # current_app.logger.debug(f"get_text_excerpt: Returning final excerpt: \"{final_excerpt}\"")
+    return final_excerpt
+
+
+def html_to_text(html_content):
+    """Returns all visible text of a post (scripts and styles removed), whitespace-normalised."""
+    if not html_content:
+        return ""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    for SCRIPT_OR_STYLE_TAG in soup(["script", "style"]):
+        SCRIPT_OR_STYLE_TAG.extract()
+    return re.sub(r'\s+', ' ', soup.get_text(separator=' ', strip=True)).strip()
+
+
+def first_image_src(html_content):
+    """What extract_first_image_and_get_urls used to read: the src of the first <img>."""
+    img = BeautifulSoup(html_content, 'html.parser').find('img')
+    return img.get('src') if img else None
+
+
+def image_sources(html_content):
+    return [img['src'] for img in BeautifulSoup(html_content, 'html.parser').find_all('img') if img.get('src')]
@@ -0,0 +1,127 @@
+# bench/listing_bytes.py
+# Counts the bytes each listing page pulls out of the database, against a site seeded
+# by bench/generate.py. Every row SQLite returns goes through a counting row factory,
+# so the figures cover all queries a request makes (pagination, validators, footer,
+# lazy loads), not just the listing query.
+#
+# For comparison, each page also reports what loading its posts as whole rows would
+# have read (the sum of every column's length for the same post ids). With
+# --budget, exits 1 if any listing page reads more than that many bytes, so it can
+# run as a check after changes to the listing queries.
+#
+#   python bench/generate.py --posts 1000
+#   python bench/listing_bytes.py
+#   python bench/listing_bytes.py --pages 3 --budget 65536 --json
+import argparse
+import json
+import os
+import re
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from generate import ADMIN_PASSWORD, ADMIN_USERNAME, DEFAULT_WORKDIR, configure_environment  # noqa: E402
+
+POST_LINK_RE = re.compile(r'/(?:admin/edit_)?post/(\d+)')
+
+
+class RowBytesCounter:
+    """sqlite3 row factory that adds up the size of every value it is handed."""
+
+    def __init__(self):
+        self.rows = 0
+        self.bytes = 0
+
+    def __call__(self, cursor, row):
+        self.rows += 1
+        for value in row:
+            if isinstance(value, str):
+                self.bytes += len(value.encode('utf-8'))
+            elif isinstance(value, bytes):
+                self.bytes += len(value)
+            elif value is not None:
+                self.bytes += 8  # INTEGER/REAL
+        return row
+
+
+def full_row_bytes(db, post_ids):
+    """What SELECT * would read for these posts (SQLite's length() of each column)."""
+    from sqlalchemy import text
+    if not post_ids:
+        return 0
+    columns = ('title', 'content', 'category', 'first_image_url', 'thumbnail_url', 'excerpt')
+    total = ' + '.join(f"coalesce(length(CAST({column} AS BLOB)), 0)" for column in columns)
+    placeholders = ', '.join(str(int(post_id)) for post_id in post_ids)
+    # id and the two timestamps as stored (integer, ISO strings)
+    row = db.session.execute(text(f"SELECT sum({total} + 8 + length(created_at) + coalesce(length(updated_at), 0)) "
+                                  f"FROM post WHERE id IN ({placeholders})")).scalar()
+    return int(row or 0)
+
+
+def measure(app, client, counter, path):
+    counter.rows = counter.bytes = 0
+    response = client.get(path)
+    html = response.get_data(as_text=True)
+    post_ids = sorted({int(post_id) for post_id in POST_LINK_RE.findall(html)})
+    return {'path': path, 'status': response.status_code, 'rows': counter.rows, 'bytes': counter.bytes,
+            'posts': len(post_ids), 'post_ids': post_ids}
+
+
+def run(args):
+    configure_environment(args.workdir)
+    from sqlalchemy import event
+    from app import create_app
+    from app.extensions import db
+
+    app = create_app('production')
+    # Measure the database, not the caches in front of it
+    app.config.update(PAGE_CACHE_ENABLED=False, WTF_CSRF_ENABLED=False)
+    counter = RowBytesCounter()
+    results = []
+    with app.app_context():
+        @event.listens_for(db.engine, 'checkout')
+        def _count_rows(dbapi_connection, connection_record, connection_proxy):
+            dbapi_connection.row_factory = counter
+
+        client = app.test_client()
+        response = client.post('/admin/login', data={'username_or_email': ADMIN_USERNAME,
+                                                     'password': ADMIN_PASSWORD})
+        if response.status_code != 302:
+            sys.exit(f"Could not log in as {ADMIN_USERNAME}; seed the site with bench/generate.py first.")
+
+        paths = ['/']
+        for page in range(1, args.pages + 1):
+            paths += [f'/blog?page={page}', f'/portfolio?page={page}', f'/admin/dashboard?page={page}']
+        for path in paths:
+            result = measure(app, client, counter, path)
+            result['full_row_bytes'] = full_row_bytes(db, result.pop('post_ids'))
+            results.append(result)
+
+    over_budget = [result for result in results if args.budget and result['path'] != '/'
+                   and result['bytes'] > args.budget]
+    if args.json:
+        print(json.dumps({'results': results, 'budget': args.budget,
+                          'over_budget': [result['path'] for result in over_budget]}, indent=2))
+    else:
+        print(f"{'path':<28}{'status':>7}{'rows':>7}{'posts':>7}{'bytes read':>12}{'full rows':>12}")
+        for result in results:
+            print(f"{result['path']:<28}{result['status']:>7}{result['rows']:>7}{result['posts']:>7}"
+                  f"{result['bytes']:>12}{result['full_row_bytes']:>12}")
+        for result in over_budget:
+            print(f"Over budget ({args.budget} bytes): {result['path']} read {result['bytes']} bytes")
+    return 1 if over_budget else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workdir', default=DEFAULT_WORKDIR, help='Site seeded by bench/generate.py.')
+    parser.add_argument('--pages', type=int, default=2, help='Listing pages measured per listing.')
+    parser.add_argument('--budget', type=int, default=0,
+                        help='Exit 1 if a listing page (not /, which renders a whole post) reads more bytes.')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+# bench/load.py
+# Load test against a site seeded by bench/generate.py. Drives either the Flask
+# test client in-process (the default), a gunicorn it starts itself (--gunicorn N
+# workers), or an already running server (--url), across these scenarios:
+#
+#   home       GET /
+#   blog       GET /blog?page=k, k uniform over all blog pages
+#   portfolio  GET /portfolio
+#   post       GET /post/<id>, id uniform over all posts
+#   upload     POST /admin/upload_trix_attachment as the bench admin (a JPEG from the site's media)
+#
+# Each scenario runs --requests requests over --concurrency threads after --warmup
+# unrecorded ones, and reports p50/p95/p99/max latency and requests/sec. The JSON
+# report (--output/--json) records the git commit and the app's tuning environment,
+# so two runs can be compared with --compare (exits 1 past --threshold).
+#
+#   python bench/generate.py --posts 10000
+#   python bench/load.py --requests 500 --output before.json
+#   python bench/load.py --gunicorn 4 --concurrency 8 --scenario blog --scenario post   # log: <workdir>/gunicorn.log
+#   python bench/load.py --requests 500 --compare before.json
+import argparse
+import http.cookiejar
+import io
+import json
+import math
+import os
+import random
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import datetime
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from generate import DEFAULT_WORKDIR, configure_environment, workdir_paths  # noqa: E402
+
+SCENARIOS = ('home', 'blog', 'portfolio', 'post', 'upload')
+PER_PAGE = 5  # BLOG_ITEMS_PER_PAGE default
+CSRF_TOKEN_RE = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+# Settings that change what is being measured; recorded in the report
+TUNING_ENV_PREFIXES = ('PAGE_CACHE_', 'SQLITE_', 'DB_POOL_', 'DB_MAX_', 'METRICS_', 'PROFIL', 'SQL_INSTRUMENTATION',
+                       'BLOG_PAGINATION', 'PORTFOLIO_PAGINATION', 'MEDIA_', 'THUMBNAIL_')
+
+
+class TestClientSession:
+    """One simulated visitor, using the Flask test client (cookies kept per session)."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, form=None, files=None, headers=None):
+        data = dict(form or {})
+        for field, (filename, content) in (files or {}).items():
+            data[field] = (io.BytesIO(content), filename)
+        response = self.client.open(path, method=method, data=data or None, headers=headers)
+        return response.status_code, response.get_data()
+
+
+class HttpSession:
+    """One simulated visitor talking HTTP to a running server (cookies kept per session)."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, path, form=None, files=None, headers=None):
+        headers = dict(headers or {})
+        body = None
+        if files:
+            boundary = uuid.uuid4().hex
+            parts = []
+            for name, value in (form or {}).items():
+                parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+            for name, (filename, content) in files.items():
+                parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                             f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n')
+            body = b''.join(parts) + f'--{boundary}--\r\n'.encode()
+            headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
+        elif form:
+            body = urllib.parse.urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        request = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers)
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+def log_in(session, username, password):
+    """Logs the session in as the bench admin. Returns the CSRF token for later POSTs."""
+    status, body = session.request('GET', '/admin/login')
+    match = CSRF_TOKEN_RE.search(body.decode('utf-8', 'replace'))
+    token = match.group(1) if match else ''
+    status, _ = session.request('POST', '/admin/login', form={
+        'csrf_token': token, 'username_or_email': username, 'password': password})
+    if status not in (200, 302):
+        raise RuntimeError(f"Login as {username} failed with HTTP {status}")
+    return token
+
+
+def site_shape(database_path):
+    """Post ids and the number of blog pages, read straight from the bench database."""
+    connection = sqlite3.connect(database_path)
+    try:
+        post_ids = [row[0] for row in connection.execute('SELECT id FROM post')]
+        blog_posts = connection.execute("SELECT count(*) FROM post WHERE category = 'blog'").fetchone()[0]
+    finally:
+        connection.close()
+    return post_ids, max(1, math.ceil(blog_posts / PER_PAGE))
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)]
+
+
+def run_scenario(name, make_session, manifest, shape, args):
+    post_ids, blog_pages = shape
+    upload_bytes = None
+    if name == 'upload':
+        media = sorted(f for f in os.listdir(manifest['media']) if f.startswith('bench_photo_') and '_thumb' not in f)
+        with open(os.path.join(manifest['media'], media[0]), 'rb') as f:
+            upload_bytes = f.read()
+
+    latencies, errors, statuses = [], [0], {}
+    lock = threading.Lock()
+    counter = iter(range(args.warmup + args.requests))
+
+    def worker(worker_index):
+        rng = random.Random(args.seed * 1000 + worker_index)
+        session = make_session()
+        token = log_in(session, manifest['admin_username'], manifest['admin_password']) if name == 'upload' else None
+        while True:
+            with lock:
+                sequence = next(counter, None)
+            if sequence is None:
+                return
+            if name == 'home':
+                call = ('GET', '/', {})
+            elif name == 'blog':
+                call = ('GET', f'/blog?page={rng.randint(1, blog_pages)}', {})
+            elif name == 'portfolio':
+                call = ('GET', '/portfolio', {})
+            elif name == 'post':
+                call = ('GET', f'/post/{rng.choice(post_ids)}', {})
+            else:
+                call = ('POST', '/admin/upload_trix_attachment', {
+                    'files': {'file': (f'bench_upload_{os.getpid()}_{worker_index}_{sequence}.jpg', upload_bytes)},
+                    'headers': {'X-CSRFToken': token}})
+            method, path, kwargs = call
+            began = time.perf_counter()
+            try:
+                status, _ = session.request(method, path, **kwargs)
+            except Exception:  # Connection refused/reset under overload
+                status = 'error'
+            elapsed = time.perf_counter() - began
+            if sequence < args.warmup:
+                continue
+            with lock:
+                latencies.append(elapsed)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                if status == 'error' or status >= 400:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(args.concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Includes the warmup; with the default handful of warmup requests the difference is noise
+    wall_seconds = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'statuses': statuses,
+        'requests_per_second': round(len(latencies) / wall_seconds, 1) if wall_seconds else None,
+        **{f'p{pct}_ms': round(percentile(latencies, pct) * 1000, 2) if latencies else None for pct in (50, 95, 99)},
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else None,
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(workers, manifest, log_path):
+    port = free_port()
+    env = dict(os.environ, FLASK_CONFIG=manifest['config'])
+    with open(log_path, 'wb') as log_file:  # Not a pipe: nothing reads it while the test runs, so it could fill up
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--bind', f'127.0.0.1:{port}', 'run:app'],
+            cwd=PROJECT_ROOT, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            with open(log_path, errors='replace') as log_file:
+                raise RuntimeError(f"gunicorn exited: {log_file.read()[-2000:]}")
+        try:
+            urllib.request.urlopen(base_url + '/', timeout=2).close()
+            return process, base_url
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("gunicorn did not start answering within 30 seconds")
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=PROJECT_ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=PROJECT_ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def compare(report, previous, threshold):
+    """Prints per-scenario changes against a previous report. Returns True if any scenario regressed past threshold %."""
+    regressed = False
+    for name, result in report['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        changes = []
+        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'requests_per_second'):
+            if not before.get(key) or result.get(key) is None:
+                continue
+            change = (result[key] - before[key]) / before[key] * 100
+            changes.append(f"{key} {before[key]} -> {result[key]} ({change:+.1f}%)")
+            if (key == 'p95_ms' and change > threshold) or (key == 'requests_per_second' and change < -threshold):
+                regressed = True
+        print(f"{name:>10}: " + ', '.join(changes), file=sys.stderr)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workdir', default=DEFAULT_WORKDIR, help='Site created by bench/generate.py.')
+    parser.add_argument('--scenario', choices=SCENARIOS, action='append', help='Scenario(s) to run; defaults to all.')
+    parser.add_argument('--requests', type=int, default=200, help='Recorded requests per scenario.')
+    parser.add_argument('--warmup', type=int, default=10, help='Unrecorded requests per scenario first.')
+    parser.add_argument('--concurrency', type=int, default=1, help='Concurrent sessions (threads).')
+    parser.add_argument('--seed', type=int, default=1)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--gunicorn', type=int, metavar='WORKERS', help='Start gunicorn with this many workers.')
+    target.add_argument('--url', help='Base URL of a server already running against the bench site.')
+    parser.add_argument('--output', help='Write the JSON report to this file.')
+    parser.add_argument('--json', action='store_true', help='Print the JSON report.')
+    parser.add_argument('--compare', help='Previous JSON report to compare against.')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='With --compare, exit 1 if p95 rises or requests/sec drops by more than this %%.')
+    args = parser.parse_args()
+
+    manifest_path = workdir_paths(args.workdir)['manifest']
+    if not os.path.exists(manifest_path):
+        parser.error(f"{manifest_path} not found; run bench/generate.py first")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    configure_environment(args.workdir)
+    shape = site_shape(manifest['database'])
+
+    server = None
+    if args.url:
+        target_name = args.url
+        make_session = lambda: HttpSession(args.url)  # noqa: E731
+    elif args.gunicorn:
+        server, base_url = start_gunicorn(args.gunicorn, manifest, os.path.join(args.workdir, 'gunicorn.log'))
+        target_name = f'gunicorn x{args.gunicorn}'
+        make_session = lambda: HttpSession(base_url)  # noqa: E731
+    else:
+        from app import create_app
+        app = create_app(manifest['config'])
+        target_name = 'test-client'
+        make_session = lambda: TestClientSession(app)  # noqa: E731
+
+    try:
+        scenarios = {name: run_scenario(name, make_session, manifest, shape, args)
+                     for name in (args.scenario or SCENARIOS)}
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    commit, dirty = git_revision()
+    report = {
+        'commit': commit, 'dirty': dirty, 'target': target_name,
+        'started_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'site': {key: manifest.get(key) for key in ('posts', 'seed', 'config', 'media_files', 'database_bytes')},
+        'settings': {'requests': args.requests, 'warmup': args.warmup, 'concurrency': args.concurrency},
+        'environment': {key: value for key, value in sorted(os.environ.items()) if key.startswith(TUNING_ENV_PREFIXES)},
+        'scenarios': scenarios,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['target']} @ {commit[:12] if commit else '?'}{' (dirty)' if dirty else ''}, "
+              f"{manifest.get('posts')} posts, concurrency {args.concurrency}")
+        for name, result in scenarios.items():
+            print(f"{name:>10}: p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  "
+                  f"{result['requests_per_second']} req/s  errors {result['errors']}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        if compare(report, previous, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,245 @@
+# bench/query_plans.py
+# Query-plan regression check for the public and admin routes.
+#
+# Builds a throwaway SQLite site from the Alembic migrations (so the indexes under
+# test are the ones production gets), seeds it with bench/generate.py's corpus, and
+# drives every main.* and admin.* route through the test client: both pagination
+# modes of each listing, cursors in both directions, search, and the admin write
+# paths. Every SELECT/UPDATE/DELETE they issue is recorded and run through
+# EXPLAIN QUERY PLAN afterwards.
+#
+# A statement fails the check when its plan contains
+#   - a full table scan ("SCAN <table>" without an index), or
+#   - a temporary B-tree ("USE TEMP B-TREE FOR ORDER BY / GROUP BY / DISTINCT"),
+# unless its table is in ALLOWED_FULL_SCANS. Index scans ("SCAN post USING INDEX ...",
+# e.g. an ORDER BY ... LIMIT walking an index) pass, and so does the relevance sort of
+# full-text search results, which no index can provide. Exits 1 on any failure.
+#
+#   python bench/query_plans.py
+#   python bench/query_plans.py --verbose        # every statement and its plan
+#   python bench/query_plans.py --posts 2000 --json
+import argparse
+import io
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from generate import ADMIN_PASSWORD, ADMIN_USERNAME, FOOTER_ICONS, build_bodies, configure_environment, \
+    insert_posts  # noqa: E402
+
+# Tables read whole by design: the handful of footer rows, and SQLite's schema table
+ALLOWED_FULL_SCANS = {'footer_icon', 'sqlite_master'}
+FULL_SCAN_RE = re.compile(r'^SCAN (\w+)$')
+TEMP_BTREE_RE = re.compile(r'USE TEMP B-TREE')
+CURSOR_LINK_RE = re.compile(r'[?&]cursor=([A-Za-z0-9_=-]+)')
+CHECKED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+
+class StatementRecorder:
+    """Collects the distinct statements issued while serving main.* and admin.* requests."""
+
+    def __init__(self):
+        self.statements = {}  # SQL -> {'endpoints': set, 'parameters': first parameters seen}
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        from flask import has_request_context, request
+        if not has_request_context() or not request.endpoint:
+            return
+        if not request.endpoint.startswith(('main.', 'admin.')):
+            return
+        if not statement.lstrip().upper().startswith(CHECKED_STATEMENTS):
+            return
+        entry = self.statements.setdefault(statement, {'endpoints': set(), 'parameters': parameters})
+        entry['endpoints'].add(request.endpoint)
+
+
+def exercise_routes(app, client):
+    """Requests every route, in each pagination mode. Returns [(path, status)] for non-2xx/3xx answers."""
+    from app.extensions import db
+    from app.models import FooterIcon, Post
+
+    problems = []
+
+    def get(path, expected=(200,)):
+        response = client.get(path)
+        if response.status_code not in expected:
+            problems.append((f'GET {path}', response.status_code))
+        return response.get_data(as_text=True)
+
+    def post(path, expected=(200, 302), **kwargs):
+        response = client.post(path, **kwargs)
+        if response.status_code not in expected:
+            problems.append((f'POST {path}', response.status_code))
+        return response
+
+    with app.app_context():
+        post_id = db.session.query(Post.id).filter(Post.category == 'blog').order_by(Post.id).first()[0]
+        home_post_id = db.session.query(Post.id).filter(Post.category == 'home').scalar()
+        icon_ids = [icon_id for (icon_id,) in db.session.query(FooterIcon.id).order_by(FooterIcon.id)]
+
+    # Public pages, as an anonymous visitor
+    for mode in ('offset', 'keyset'):
+        app.config.update(BLOG_PAGINATION=mode, PORTFOLIO_PAGINATION=mode, DASHBOARD_PAGINATION=mode)
+        get('/')
+        for listing in ('blog', 'portfolio'):
+            html = get(f'/{listing}')
+            get(f'/{listing}?page=2')
+            get(f'/{listing}?page=10000', expected=(404,))
+            # Follow the next link, then its previous link (keyset mode only has cursors)
+            for _ in range(2):
+                cursors = CURSOR_LINK_RE.findall(html)
+                if cursors:
+                    html = get(f'/{listing}?cursor={cursors[-1]}')
+    get(f'/post/{post_id}')
+    get('/post/999999', expected=(404,))
+    get('/search?q=garden')
+    get('/search?q=garden+light&page=2')
+    get('/media/missing.jpg?w=320', expected=(404,))
+
+    # Admin pages and write paths
+    post('/admin/login', data={'username_or_email': ADMIN_USERNAME, 'password': ADMIN_PASSWORD}, expected=(302,))
+    for mode in ('offset', 'keyset'):
+        app.config['DASHBOARD_PAGINATION'] = mode
+        html = get('/admin/dashboard')
+        get('/admin/dashboard?page=2')
+        cursors = CURSOR_LINK_RE.findall(html)
+        if cursors:
+            get(f'/admin/dashboard?cursor={cursors[-1]}')
+    get('/admin/add_post')
+    post('/admin/add_post', data={'title': 'Plan check', 'content': '<p>Added by the query plan check. It has text.</p>'})
+    get(f'/admin/edit_post/{post_id}')
+    post(f'/admin/edit_post/{post_id}', data={'title': 'Edited', 'content': '<p>Edited by the query plan check.</p>'})
+    post('/admin/set_post_category', json={'post_id': post_id, 'category': 'portfolio'})
+    post('/admin/set_post_category', json={'post_id': post_id, 'category': 'home'})
+    post('/admin/set_post_category', json={'post_id': post_id, 'category': 'blog'})  # Promotes a new home post
+    post(f'/admin/delete_post/{home_post_id}')
+    buffer = io.BytesIO()
+    from PIL import Image
+    Image.new('RGB', (64, 48), (120, 140, 160)).save(buffer, 'JPEG')
+    post('/admin/upload_trix_attachment', data={'file': (io.BytesIO(buffer.getvalue()), 'plan_check.jpg')})
+    get('/admin/manage_footer')
+    post('/admin/manage_footer', data={'copyright_message': '&copy; {year} Plan check', 'submit_copyright': '1'})
+    post('/admin/add_footer_icon', data={'name': 'Extra', 'click_url': 'https://example.com/',
+                                          'order': 9, 'existing_icon_filename': FOOTER_ICONS[0][1]})
+    get(f'/admin/edit_footer_icon/{icon_ids[0]}')
+    post(f'/admin/edit_footer_icon/{icon_ids[0]}', data={'name': 'Renamed', 'click_url': 'https://example.com/',
+                                                          'order': 5})
+    post('/admin/update_icon_order', data={'icon_order[]': [str(icon_id) for icon_id in reversed(icon_ids)]})
+    post(f'/admin/delete_footer_icon/{icon_ids[-1]}')
+    with app.app_context():
+        batch_ids = [row_id for (row_id,) in db.session.query(Post.id).order_by(Post.id.desc()).limit(6)]
+    post('/admin/batch', json={'operations': [
+        {'action': 'set_category', 'post_ids': batch_ids[:3], 'category': 'portfolio'},
+        {'action': 'delete_posts', 'post_ids': batch_ids[3:]},
+        {'action': 'reorder_icons', 'icon_ids': icon_ids[:-1]},
+    ]})
+    get('/admin/cache_stats')
+    get('/admin/logout', expected=(302,))
+    return problems
+
+
+def explain(connection, statement, parameters):
+    """EXPLAIN QUERY PLAN detail lines for a recorded statement."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)
+        return [row[3] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def violations(plan):
+    found = []
+    # Search results are ordered by bm25() rank, computed per match
+    ranks_search_results = any('VIRTUAL TABLE' in detail for detail in plan)
+    for detail in plan:
+        match = FULL_SCAN_RE.match(detail.strip())
+        if match and match.group(1) not in ALLOWED_FULL_SCANS:
+            found.append(detail)
+        elif TEMP_BTREE_RE.search(detail) and not ranks_search_results:
+            found.append(detail)
+    return found
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='query-plans-')
+    try:
+        configure_environment(workdir)
+        os.makedirs(os.path.join(workdir, 'media'), exist_ok=True)
+        from flask_migrate import upgrade
+        from sqlalchemy import event
+        from app import create_app
+        from app.extensions import db
+        from app.models import FooterIcon, SiteConfiguration, User
+        from app.search import rebuild_search_index
+
+        app = create_app('production')
+        app.config.update(WTF_CSRF_ENABLED=False, PAGE_CACHE_ENABLED=False, FOOTER_CACHE_ENABLED=False,
+                          THUMBNAIL_ASYNC=False, FOOTER_SPRITE_ENABLED=False, STATIC_EXPORT_ON_SAVE=False,
+                          MEDIA_CACHE_DIR=os.path.join(workdir, 'media_cache'))
+        rng = random.Random(args.seed)
+        with app.app_context():
+            upgrade(directory=os.path.join(PROJECT_ROOT, 'migrations'))
+            bodies = build_bodies(min(50, args.posts), [], app.config.get('MEDIA_FILES_URL', '/static/media_files/'), rng)
+            insert_posts(db, args.posts, bodies, 500, rng)
+            user = User(username=ADMIN_USERNAME, email='bench@example.com')
+            user.set_password(ADMIN_PASSWORD)
+            db.session.add(user)
+            for order, (name, icon_filename, click_url) in enumerate(FOOTER_ICONS, start=1):
+                db.session.add(FooterIcon(name=name, icon_filename=icon_filename, click_url=click_url, order=order))
+            db.session.add(SiteConfiguration(key='copyright_message', value='&copy; {year} Plan check'))
+            db.session.commit()
+            rebuild_search_index()
+
+            recorder = StatementRecorder()
+            event.listen(db.engine, 'before_cursor_execute', recorder)
+            problems = exercise_routes(app, app.test_client())
+            event.remove(db.engine, 'before_cursor_execute', recorder)
+
+            results = []
+            connection = db.engine.raw_connection()
+            try:
+                for statement, entry in recorder.statements.items():
+                    plan = explain(connection, statement, entry['parameters'])
+                    results.append({'endpoints': sorted(entry['endpoints']), 'statement': ' '.join(statement.split()),
+                                    'plan': plan, 'violations': violations(plan)})
+            finally:
+                connection.close()
+            db.engine.dispose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    failed = [result for result in results if result['violations']]
+    if args.json:
+        print(json.dumps({'statements': len(results), 'failed': failed, 'request_problems': problems,
+                          'results': results if args.verbose else None}, indent=2))
+    else:
+        for result in (results if args.verbose else failed):
+            print(f"{'FAIL' if result['violations'] else 'ok  '} {', '.join(result['endpoints'])}")
+            print(f"     {result['statement']}")
+            for detail in result['plan']:
+                print(f"       {detail}")
+        for request_line, status in problems:
+            print(f"Unexpected status {status}: {request_line}")
+        print(f"{len(results)} statements checked, {len(failed)} with full scans or temp B-trees.")
+    return 1 if failed or problems else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=300, help='Posts to seed (enough for several listing pages).')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--verbose', action='store_true', help='Show every statement and plan, not just failures.')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
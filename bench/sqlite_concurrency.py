@@ -0,0 +1,165 @@
+# bench/sqlite_concurrency.py
+# Read throughput of the post listings while an admin-style writer is committing,
+# with SQLite's defaults versus the ProductionConfig pragmas (WAL etc.).
+#
+# Reader processes stand in for gunicorn workers and run the blog listing query in
+# a loop. One writer process repeatedly inserts a post and edits another in a
+# transaction that stays open for --write-hold-ms. That mimics add_post, which
+# also parses content and bumps version stamps before it commits.
+#
+#   python bench/sqlite_concurrency.py
+#   python bench/sqlite_concurrency.py --readers 4 --seconds 10 --write-hold-ms 50 --json
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, event, text  # noqa: E402
+from app.config import ProductionConfig  # noqa: E402
+from app.database import apply_sqlite_pragmas  # noqa: E402
+from app.models import Post  # noqa: E402
+
+PROFILES = {
+    'default': {},
+    'production': ProductionConfig.SQLITE_PRAGMAS,
+}
+
+LISTING_SQL = text("SELECT id, title, excerpt, thumbnail_url, created_at FROM post "
+                   "WHERE category = 'blog' ORDER BY created_at DESC, id DESC LIMIT 5 OFFSET :offset")
+COUNT_SQL = text("SELECT count(id) FROM post WHERE category = 'blog'")
+
+
+def make_engine(path, pragmas):
+    engine = create_engine(f'sqlite:///{path}')
+    if pragmas:
+        event.listen(engine, 'connect', lambda dbapi_connection, record: apply_sqlite_pragmas(dbapi_connection, pragmas))
+    return engine
+
+
+def seed(path, posts):
+    engine = make_engine(path, {})
+    Post.__table__.create(engine)
+    started = datetime(2020, 1, 1)
+    body = '<div>' + 'Lorem ipsum dolor sit amet. ' * 200 + '</div>'
+    with engine.begin() as connection:
+        connection.execute(Post.__table__.insert(), [
+            {'title': f'Post {i}', 'content': body, 'excerpt': 'Lorem ipsum dolor sit amet.',
+             'category': 'blog' if i % 3 else 'portfolio', 'created_at': started + timedelta(hours=i),
+             'updated_at': started + timedelta(hours=i)}
+            for i in range(posts)
+        ])
+    engine.dispose()
+
+
+def reader(path, pragmas, seconds, start_at, results):
+    engine = make_engine(path, pragmas)
+    latencies, errors = [], 0
+    rng = random.Random(os.getpid())
+    while time.time() < start_at:
+        time.sleep(0.001)
+    deadline = start_at + seconds
+    while time.time() < deadline:
+        began = time.perf_counter()
+        try:
+            with engine.connect() as connection:
+                total = connection.execute(COUNT_SQL).scalar()
+                connection.execute(LISTING_SQL, {'offset': rng.randrange(0, max(total - 5, 1))}).all()
+        except Exception:  # "database is locked" under contention
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - began)
+    engine.dispose()
+    results.put(('reader', latencies, errors))
+
+
+def writer(path, pragmas, seconds, start_at, hold_ms, results):
+    engine = make_engine(path, pragmas)
+    writes, errors = 0, 0
+    body = '<div>' + 'Fresh content for the benchmark. ' * 200 + '</div>'
+    while time.time() < start_at:
+        time.sleep(0.001)
+    deadline = start_at + seconds
+    while time.time() < deadline:
+        try:
+            with engine.begin() as connection:
+                connection.execute(Post.__table__.insert().values(
+                    title='New post', content=body, excerpt='Fresh content.', category='blog',
+                    created_at=datetime.utcnow(), updated_at=datetime.utcnow()))
+                connection.execute(text("UPDATE post SET updated_at = :now WHERE id = :id"),
+                                   {'now': datetime.utcnow(), 'id': random.randint(1, 100)})
+                time.sleep(hold_ms / 1000)  # Work done while holding the write lock
+            writes += 1
+        except Exception:
+            errors += 1
+    engine.dispose()
+    results.put(('writer', writes, errors))
+
+
+def run_profile(name, pragmas, args):
+    directory = tempfile.mkdtemp(prefix='sqlite-bench-')
+    path = os.path.join(directory, 'bench.db')
+    seed(path, args.posts)
+    # journal_mode=WAL is persistent, so set it once up front like a deployed database would have it
+    make_engine(path, pragmas).connect().close()
+
+    results = multiprocessing.Queue()
+    start_at = time.time() + 1.0
+    processes = [multiprocessing.Process(target=reader, args=(path, pragmas, args.seconds, start_at, results))
+                 for _ in range(args.readers)]
+    if args.write_hold_ms >= 0:
+        processes.append(multiprocessing.Process(
+            target=writer, args=(path, pragmas, args.seconds, start_at, args.write_hold_ms, results)))
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = sorted(latency for kind, latency_list, _ in collected if kind == 'reader' for latency in latency_list)
+    writer_results = [(count, errors) for kind, count, errors in collected if kind == 'writer']
+    return {
+        'profile': name,
+        'pragmas': pragmas,
+        'reads_per_second': round(len(latencies) / args.seconds, 1),
+        'read_p50_ms': round(statistics.median(latencies) * 1000, 3) if latencies else None,
+        'read_p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 3) if latencies else None,
+        'read_max_ms': round(latencies[-1] * 1000, 3) if latencies else None,
+        'read_errors': sum(errors for kind, _, errors in collected if kind == 'reader'),
+        'writes': sum(count for count, _ in writer_results),
+        'write_errors': sum(errors for _, errors in writer_results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--readers', type=int, default=4, help='Reader processes (like gunicorn workers).')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each profile run.')
+    parser.add_argument('--posts', type=int, default=2000, help='Posts seeded into the database.')
+    parser.add_argument('--write-hold-ms', type=float, default=20.0,
+                        help='How long each write transaction holds the lock (-1 disables the writer).')
+    parser.add_argument('--profile', choices=sorted(PROFILES), action='append',
+                        help='Profile(s) to run; defaults to all.')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON.')
+    args = parser.parse_args()
+
+    reports = [run_profile(name, PROFILES[name], args) for name in (args.profile or sorted(PROFILES))]
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    for report in reports:
+        print(f"[{report['profile']}]")
+        for key, value in report.items():
+            if key not in ('profile', 'pragmas'):
+                print(f"  {key:>18}: {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Add composite listing indexes
+
+Revision ID: 9b1e6c3f5a27
+Revises: f4d2c8e1a9b3
+Create Date: 2026-10-18 18:20:11.402957
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b1e6c3f5a27'
+down_revision = 'f4d2c8e1a9b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The single-column indexes made SQLite pick one of them and sort the rest in a
+    # temporary B-tree; these serve the listings' filter and ORDER BY in one index.
+    # ix_post_category_created_at starts with category, so it replaces ix_post_category.
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_category')
+        batch_op.drop_index('ix_post_created_at')
+        batch_op.create_index('ix_post_category_created_at', ['category', 'created_at', 'id', 'updated_at'],
+                              unique=False)
+        batch_op.create_index('ix_post_created_at_id', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_post_missing_thumbnail', ['first_image_url'], unique=False,
+                              sqlite_where=sa.text('thumbnail_url IS NULL'),
+                              postgresql_where=sa.text('thumbnail_url IS NULL'))
+
+    with op.batch_alter_table('footer_icon', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_footer_icon_order'), ['order'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('footer_icon', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_footer_icon_order'))
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_missing_thumbnail')
+        batch_op.drop_index('ix_post_created_at_id')
+        batch_op.drop_index('ix_post_category_created_at')
+        batch_op.create_index('ix_post_created_at', ['created_at'], unique=False)
+        batch_op.create_index('ix_post_category', ['category'], unique=False)
@@ -0,0 +1,43 @@
+"""Make post.created_at NOT NULL
+
+Revision ID: a7c3e9d2b514
+Revises: ef49cc4250b8
+Create Date: 2026-10-18 21:14:52.630187
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e9d2b514'
+down_revision = 'ef49cc4250b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Listings sort and seek on (created_at, id), and keyset cursors embed created_at
+    # (see app/pagination.py), so every post needs one. Rows inserted outside the ORM
+    # may lack it: fall back to updated_at, or to now. `now` is bound as a DateTime so
+    # SQLite stores it in the ORM's format (with microseconds); timestamps compare as
+    # text there, and CURRENT_TIMESTAMP would sort inconsistently against the rest.
+    now = sa.bindparam('now', datetime.utcnow(), type_=sa.DateTime())
+    op.execute(sa.text("UPDATE post SET created_at = COALESCE(updated_at, :now) "
+                       "WHERE created_at IS NULL").bindparams(now))
+    # c5a9e3f17b2d started updated_at at created_at, which left these rows without one
+    op.execute("UPDATE post SET updated_at = created_at WHERE updated_at IS NULL")
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.alter_column('created_at',
+               existing_type=sa.DateTime(),
+               nullable=True)
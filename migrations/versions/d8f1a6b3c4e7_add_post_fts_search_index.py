@@ -0,0 +1,90 @@
+"""Add post_fts full-text search index
+
+Revision ID: d8f1a6b3c4e7
+Revises: c5a9e3f17b2d
+Create Date: 2026-10-18 13:05:19.204471
+
+"""
+import re
+from html.parser import HTMLParser
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f1a6b3c4e7'
+down_revision = 'c5a9e3f17b2d'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 200
+
+# Frozen copy of app.content.html_to_text as of this revision, so later changes to the
+# app's text extraction don't change what this migration indexes
+_VOID_ELEMENTS = frozenset(['area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen',
+                            'link', 'meta', 'param', 'source', 'track', 'wbr'])
+_SKIPPED_ELEMENTS = frozenset(['script', 'style'])
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+class _TextParser(HTMLParser):
+    """Collects visible text, skipping <script>/<style>; an end tag closes the most recent open element of that name."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chunks = []
+        self._open = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in _VOID_ELEMENTS:
+            self._open.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        pass  # <p/> opens and closes at once: no text inside it
+
+    def handle_endtag(self, tag):
+        if tag in self._open:
+            index = len(self._open) - 1 - self._open[::-1].index(tag)
+            del self._open[index:]
+
+    def handle_data(self, data):
+        text = data.strip()
+        if text and not _SKIPPED_ELEMENTS.intersection(self._open):
+            self.chunks.append(text)
+
+
+def _html_to_text(html_content):
+    if not html_content:
+        return ""
+    parser = _TextParser()
+    parser.feed(html_content)
+    parser.close()
+    return _WHITESPACE_RE.sub(' ', ' '.join(parser.chunks)).strip()
+
+
+def upgrade():
+    # FTS5 virtual tables are SQLite-only; other databases simply have no search index.
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS post_fts "
+               "USING fts5(title, body, tokenize='porter unicode61')")
+
+    # Index the existing posts, so search works right after upgrading. Read in
+    # primary-key batches, like `flask rebuild-search-index`.
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.text("SELECT id, title, content FROM post WHERE id > :last_id "
+                                    "ORDER BY id LIMIT :limit"), {'last_id': last_id, 'limit': BATCH_SIZE}).all()
+        if not rows:
+            break
+        bind.execute(sa.text("INSERT INTO post_fts (rowid, title, body) VALUES (:id, :title, :body)"),
+                     [{'id': row.id, 'title': row.title or '', 'body': _html_to_text(row.content)} for row in rows])
+        last_id = rows[-1].id
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS post_fts")
@@ -0,0 +1,43 @@
+"""Add partial unique index for the single home post
+
+Revision ID: f4d2c8e1a9b3
+Revises: e2b7d4a9f610
+Create Date: 2026-10-18 15:12:40.615023
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4d2c8e1a9b3'
+down_revision = 'e2b7d4a9f610'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Repair existing data first, or the unique index can't be created:
+    # keep the newest home post and move any others to 'blog'...
+    op.execute("""
+        UPDATE post SET category = 'blog'
+        WHERE category = 'home' AND id != (
+            SELECT id FROM post WHERE category = 'home' ORDER BY created_at DESC, id DESC LIMIT 1
+        )
+    """)
+    # ...and feature the most recent post if none is marked home (index() used to do this on every request)
+    op.execute("""
+        UPDATE post SET category = 'home'
+        WHERE id = (SELECT id FROM post ORDER BY created_at DESC, id DESC LIMIT 1)
+          AND NOT EXISTS (SELECT 1 FROM post WHERE category = 'home')
+    """)
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.create_index('ix_post_single_home', ['category'], unique=True,
+                              sqlite_where=sa.text("category = 'home'"),
+                              postgresql_where=sa.text("category = 'home'"))
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_single_home')
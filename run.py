@@ -1,4 +1,5 @@
 import os
+import click
 from app import create_app, db # Assuming db from app.extensions
 # from app.models import User, Post # Import your models for shell context if you have them
 
@@ -27,6 +28,214 @@ def init_db_command():
     db.create_all()
     print("Initialized the database.")
 
+@app.cli.command("backfill-excerpts")
+@click.option('--batch-size', default=200, show_default=True, help='Number of posts loaded and committed per batch.')
+@click.option('--all', 'regenerate_all', is_flag=True, help='Regenerate every excerpt, not just the missing ones.')
+def backfill_excerpts_command(batch_size, regenerate_all):
+    """Fill in (or regenerate) the stored Post.excerpt column."""
+    from app.models import Post
+    from app.content import get_text_excerpt, EXCERPT_SENTENCES
+
+    updated = 0
+    last_id = 0
+    while True:
+        # Walk the table by primary key so each batch is a cheap range read,
+        # and commit per batch to keep the transaction (and memory) small.
+        query = Post.query.filter(Post.id > last_id)
+        if not regenerate_all:
+            query = query.filter(Post.excerpt.is_(None))
+        batch = query.order_by(Post.id).limit(batch_size).all()
+        if not batch:
+            break
+        for post in batch:
+            post.excerpt = get_text_excerpt(post.content, EXCERPT_SENTENCES)
+        db.session.commit()
+        updated += len(batch)
+        last_id = batch[-1].id
+        db.session.expunge_all()
+        print(f"Processed {updated} posts (up to ID {last_id})...")
+    print(f"Excerpts updated for {updated} posts.")
+
+@app.cli.command("rebuild-search-index")
+@click.option('--batch-size', default=200, show_default=True, help='Number of posts read per batch.')
+def rebuild_search_index_command(batch_size):
+    """Rebuild the full-text search index (post_fts) from all posts."""
+    from app.search import rebuild_search_index
+
+    def report(indexed, last_id):
+        print(f"Indexed {indexed} posts (up to ID {last_id})...")
+
+    try:
+        total = rebuild_search_index(batch_size=batch_size, progress=report)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    print(f"Search index rebuilt with {total} posts.")
+
+@app.cli.command("regenerate-thumbnails")
+@click.option('--all', 'regenerate_all', is_flag=True, help='Recreate every thumbnail, not just the missing ones.')
+@click.option('--workers', type=int, default=None, help='Worker processes (defaults to THUMBNAIL_WORKERS).')
+def regenerate_thumbnails_command(regenerate_all, workers):
+    """Create missing thumbnails for all uploaded media in bulk."""
+    from app.thumbnails import regenerate_thumbnails
+
+    def report(done, total):
+        if done % 50 == 0 or done == total:
+            print(f"Processed {done}/{total} images...")
+
+    created, failed = regenerate_thumbnails(regenerate_all=regenerate_all, workers=workers, progress=report)
+    print(f"Thumbnails created: {created}, failed: {failed}.")
+
+@app.cli.command("check-home-post")
+@click.option('--repair', is_flag=True, help='Fix the data: keep one home post, promoting the newest post if none.')
+def check_home_post_command(repair):
+    """Check that exactly one post is marked as the home post."""
+    from app.home_post import check_home_posts
+    from app.models import Post
+
+    report = check_home_posts(repair=repair)
+    home_post_ids = report['home_post_ids']
+    has_posts = db.session.query(Post.id).first() is not None
+    if len(home_post_ids) == 1 or (not home_post_ids and not has_posts):
+        print(f"OK: home post is {home_post_ids[0] if home_post_ids else 'not set (no posts)'}.")
+        return
+    print(f"Found {len(home_post_ids)} home posts: {home_post_ids or 'none'}.")
+    if not repair:
+        raise click.ClickException("Home post invariant violated; run with --repair to fix it.")
+    if report['demoted_ids']:
+        print(f"Kept post {home_post_ids[0]}; moved posts {report['demoted_ids']} to 'blog'.")
+    if report['promoted_id']:
+        print(f"Promoted post {report['promoted_id']} to home.")
+
+@app.cli.command("show-metrics")
+def show_metrics_command():
+    """Print the metrics aggregated from METRICS_DIR, as /admin/metrics would serve them."""
+    from app.metrics import get_registry, render_metrics
+
+    registry = get_registry()
+    if registry is None:
+        raise click.ClickException("Metrics are disabled; set METRICS_ENABLED=1.")
+    print(render_metrics(registry), end='')
+
+@app.cli.command("build-assets")
+@click.option('--prune', is_flag=True, help='Delete files left in static/dist/ by earlier builds.')
+@click.option('--no-compress', is_flag=True, help='Skip the precompressed .gz/.br variants.')
+def build_assets_command(prune, no_compress):
+    """Fingerprint the static assets into static/dist/ and write its manifest."""
+    from app.assets import build_assets
+
+    result = build_assets(app.static_folder, app.config['ASSETS_PATHS'], compress=not no_compress, prune=prune)
+    print(f"Assets: {result['assets']} in manifest, {result['written']} new, "
+          f"{result['compressed']} compressed variants written, {result['pruned']} pruned.")
+    if not no_compress and not result['brotli']:
+        print("Brotli is not installed; only .gz variants were built (pip install brotli for .br).")
+    print("Restart the app (or its workers) to pick up the new manifest.")
+
+@app.cli.command("optimize-footer-icons")
+def optimize_footer_icons_command():
+    """Downscale and recompress every *_ico.png in static/img/ in place, then rebuild the footer sprite."""
+    from app.cache import bump_footer_version
+    from app.footer_icons import optimize_icon_folder
+    from app.media_library import KIND_FOOTER_ICON, record_file
+
+    img_folder = os.path.join(app.static_folder, 'img')
+    total_before = total_after = 0
+    for filename, before, after in optimize_icon_folder(img_folder, app.config.get('FOOTER_ICON_SIZE', 48)):
+        if isinstance(after, str):
+            print(f"{filename}: {after}")
+            continue
+        total_before += before
+        total_after += after
+        record_file(KIND_FOOTER_ICON, filename)  # New size and hash
+        print(f"{filename}: {before} -> {after} bytes")
+    bump_footer_version()  # Workers reload the footer and build a sprite from the new files
+    db.session.commit()
+    print(f"Footer icons: {total_before} -> {total_after} bytes.")
+
+@app.cli.command("index-media")
+@click.option('--keep-missing', is_flag=True, help='Keep index entries of files that are no longer on disk.')
+def index_media_command(keep_missing):
+    """Index uploads and footer icons on disk (hash, size, dimensions, thumbnails) and which posts use them."""
+    from app.media_library import scan_media
+
+    def report(kind, done):
+        if done % 200 == 0:
+            print(f"Scanned {done} {kind} files...")
+
+    stats = scan_media(prune=not keep_missing, progress=report)
+    for kind in ('upload', 'footer_icon'):
+        counts = stats[kind]
+        print(f"{kind}: {counts['indexed']} indexed, {counts['unchanged']} unchanged, {counts['removed']} removed.")
+    print(f"Media references rebuilt for {stats['posts_linked']} posts.")
+
+@app.cli.command("export-static")
+@click.option('--output', type=click.Path(file_okay=False), default=None,
+              help='Output directory (defaults to STATIC_EXPORT_DIR).')
+@click.option('--post', 'post_ids', type=int, multiple=True,
+              help='Only re-export what this post affects (repeatable). Exports everything by default.')
+def export_static_command(output, post_ids):
+    """Render /, the blog and portfolio pages and every post to static files for the web server."""
+    from app.models import Post
+    from app.static_export import run_export
+
+    post_categories = {}
+    for post_id in post_ids:
+        post = db.session.get(Post, post_id)
+        # A deleted post may have been in either listing
+        post_categories[post_id] = {post.category} if post else {'blog', 'portfolio'}
+    output = output or app.config['STATIC_EXPORT_DIR']
+    stats = run_export(app, post_categories, output_dir=output)
+    for error in stats['errors']:
+        print(f"Error: {error}")
+    print(f"Static export to {output}: {stats['pages']} pages written, {stats['removed']} removed, "
+          f"{stats['static_files']} static files copied in {stats['seconds']}s.")
+
+@app.cli.group("posts")
+def posts_group():
+    """Export posts to, or import them from, a directory (posts.jsonl + media/)."""
+
+def _report_transfer(stage, done, total, rate):
+    print(f"{stage}: {done}{f'/{total}' if total is not None else ''} ({rate:.0f}/s)...")
+
+@posts_group.command("export")
+@click.argument('output_dir', type=click.Path(file_okay=False))
+@click.option('--batch-size', default=500, show_default=True, help='Number of posts read per batch.')
+@click.option('--no-media', is_flag=True, help='Write posts.jsonl only, without copying the uploads.')
+def export_posts_command(output_dir, batch_size, no_media):
+    """Write every post to OUTPUT_DIR/posts.jsonl and the uploads to OUTPUT_DIR/media/."""
+    from app.post_transfer import export_posts
+
+    stats = export_posts(output_dir, batch_size=batch_size, include_media=not no_media, progress=_report_transfer)
+    print(f"Exported {stats['posts']} posts and {stats['media_copied']} media files to {output_dir} "
+          f"in {stats['seconds']}s.")
+
+@posts_group.command("import")
+@click.argument('input_dir', type=click.Path(exists=True, file_okay=False))
+@click.option('--batch-size', default=500, show_default=True, help='Number of posts inserted per transaction.')
+@click.option('--workers', type=int, default=None, help='Worker processes (defaults to THUMBNAIL_WORKERS).')
+@click.option('--no-media', is_flag=True, help='Import posts.jsonl only, without copying media/.')
+@click.option('--overwrite-media', is_flag=True, help='Replace uploads that already exist (and their thumbnails).')
+@click.option('--keep-ids', is_flag=True, help='Insert posts with their exported ids (fails on ids already in use).')
+def import_posts_command(input_dir, batch_size, workers, no_media, overwrite_media, keep_ids):
+    """Add the posts and media from INPUT_DIR (as written by `flask posts export`) to this site."""
+    from sqlalchemy.exc import IntegrityError
+    from app.post_transfer import import_posts
+
+    try:
+        stats = import_posts(input_dir, batch_size=batch_size, workers=workers, include_media=not no_media,
+                             keep_ids=keep_ids, overwrite_media=overwrite_media, progress=_report_transfer)
+    except (FileNotFoundError, IntegrityError) as e:
+        raise click.ClickException(str(e).splitlines()[0])
+    for error in stats['errors']:
+        print(f"Skipped {error}")
+    if stats['demoted_home_posts']:
+        print(f"{stats['demoted_home_posts']} home posts imported as blog posts (a site has one home post).")
+    print(f"Imported {stats['posts']} posts ({stats['skipped']} skipped), {stats['media_copied']} media files "
+          f"({stats['media_skipped']} already present), {stats['thumbnails_created']} thumbnails "
+          f"({stats['thumbnails_failed']} failed) in {stats['seconds']}s "
+          f"({stats['posts'] / max(stats['seconds'], 0.01):.0f} posts/s).")
+    if not app.config.get('STATIC_EXPORT_ON_SAVE'):
+        print("Run `flask export-static` if this site is served from a static export.")
+
 if __name__ == '__main__':
     # This block is mainly for running with `python run.py` directly.
     # `flask run` will typically use the app instance created above and respect .flaskenv.